@@ -0,0 +1,86 @@
+"""
+Benchmark the package import time and the headless figure export.
+
+The import time of the package, of the EMG class and of the plotting module is
+measured in fresh interpreters. Decomposition results of synthetic recordings are
+then exported to figure files, and the script reports the wall time of the export
+and the rendering time per figure.
+
+Usage:
+    python benchmarks/bench_export.py --recordings 8 --jobs 4 --formats png svg
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+IMPORTS = {
+    'import emg2mu': 'import emg2mu',
+    'from emg2mu import EMG': 'from emg2mu import EMG',
+    'visualization.plots': 'import emg2mu.visualization.plots',
+}
+
+
+def import_time(statement, repeats):
+    """Median time of ``statement`` in a fresh interpreter, in seconds."""
+    code = f"import time; t = time.perf_counter(); {statement}; print(time.perf_counter() - t)"
+    times = [float(subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                                  check=True).stdout) for _ in range(repeats)]
+    return np.median(times)
+
+
+def write_results(directory, recordings, units, seconds, sampling_frequency, seed):
+    from emg2mu.core.spike_train import SpikeTrain
+    from emg2mu.utils.io import save_results
+    rng = np.random.default_rng(seed)
+    frames = int(seconds * sampling_frequency)
+    for i in range(recordings):
+        rates = rng.uniform(8, 20, units)
+        spike_train = SpikeTrain.from_units(
+            [np.unique(rng.integers(0, frames, int(rate * seconds))) for rate in rates], frames)
+        save_results(os.path.join(directory, f'recording{i}_decomposed.npz'), spike_train,
+                     rng.standard_normal((frames, units)), np.arange(units), np.ones(units))
+
+
+def run(recordings, units, seconds, sampling_frequency, jobs, formats, repeats, seed):
+    for label, statement in IMPORTS.items():
+        print(f"import time {label + ':':<24}{import_time(statement, repeats) * 1e3:8.0f} ms")
+
+    from emg2mu.visualization.export import export_figures
+    with tempfile.TemporaryDirectory() as directory:
+        write_results(directory, recordings, units, seconds, sampling_frequency, seed)
+        start = time.perf_counter()
+        rows = export_figures(directory, os.path.join(directory, 'figures'), formats=formats,
+                              sampling_frequency=sampling_frequency, n_jobs=jobs, plot_individual=True)
+        elapsed = time.perf_counter() - start
+
+    failed = [row['name'] for row in rows if row['error'] is not None]
+    n_figures = sum(len(row['files']) for row in rows)
+    print(f"recordings={recordings} units={units} seconds={seconds} jobs={jobs} "
+          f"formats={','.join(formats)}")
+    print(f"export:           {n_figures} files in {elapsed:.2f} s ({len(failed)} recordings failed)")
+    print(f"per figure:       {sum(row['time'] for row in rows) / max(n_figures, 1) * 1e3:.0f} ms "
+          f"rendering, {elapsed / max(n_figures, 1) * 1e3:.0f} ms wall")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--recordings', type=int, default=8)
+    parser.add_argument('--units', type=int, default=30)
+    parser.add_argument('--seconds', type=float, default=60)
+    parser.add_argument('--sampling-frequency', type=float, default=2048)
+    parser.add_argument('--jobs', type=int, default=1)
+    parser.add_argument('--formats', nargs='+', default=['png'])
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    run(args.recordings, args.units, args.seconds, args.sampling_frequency, args.jobs,
+        args.formats, args.repeats, args.seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Benchmark the streaming decomposition throughput on CPU.
+
+A decomposition is calibrated on a synthetic recording, then the same recording is
+streamed in fixed-size chunks. The script reports the sustained throughput in
+samples/sec, the per-chunk processing time (median and 99th percentile) and the
+per-chunk latency budget (the chunk duration).
+
+Usage:
+    python benchmarks/bench_streaming.py --channels 64 --sources 20 --chunk-size 64
+"""
+
+import argparse
+import time
+import numpy as np
+from emg2mu import EMG
+
+
+def run(channels, sources, chunk_size, seconds, sampling_frequency, extension_parameter, seed):
+    rng = np.random.default_rng(seed)
+    frames = int(seconds * sampling_frequency)
+    emg_data = rng.standard_normal((frames, channels))
+
+    emg = EMG(emg_data, sampling_frequency=sampling_frequency, max_sources=sources,
+              extension_parameter=extension_parameter, max_ica_iter=20, device='cpu')
+    emg.preprocess().run_ica(method='symmetric')
+    stream = emg.create_stream(chunk_size=chunk_size)
+
+    chunk_times = []
+    start = time.perf_counter()
+    for offset in range(0, frames, chunk_size):
+        stream.process(emg_data[offset:offset + chunk_size])
+        chunk_times.append(stream.last_process_time)
+    elapsed = time.perf_counter() - start
+
+    chunk_times = np.array(chunk_times) * 1e3
+    print(f"channels={channels} sources={sources} extension={extension_parameter} "
+          f"chunk_size={chunk_size}")
+    print(f"throughput:       {frames / elapsed:,.0f} samples/sec "
+          f"({frames / elapsed / sampling_frequency:.1f}x real time)")
+    print(f"chunk time:       median {np.median(chunk_times):.3f} ms, "
+          f"p99 {np.percentile(chunk_times, 99):.3f} ms")
+    print(f"latency budget:   {stream.latency_budget * 1e3:.3f} ms per chunk")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--channels', type=int, default=64)
+    parser.add_argument('--sources', type=int, default=20)
+    parser.add_argument('--chunk-size', type=int, default=64)
+    parser.add_argument('--seconds', type=float, default=20)
+    parser.add_argument('--sampling-frequency', type=float, default=2048)
+    parser.add_argument('--extension-parameter', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    run(args.channels, args.sources, args.chunk_size, args.seconds, args.sampling_frequency,
+        args.extension_parameter, args.seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Fixtures of the benchmark suite.
+
+The benchmarks use the ``benchmark`` fixture of pytest-benchmark
+(``pip install emg2mu[benchmark]``). Without the plugin, a minimal fixture with the
+same call interface times the benchmarks and prints them, with their accuracy, at
+the end of the session.
+"""
+
+import time
+import numpy as np
+import pytest
+
+try:
+    import pytest_benchmark
+except ImportError:
+    pytest_benchmark = None
+
+_results = []
+
+
+class _Benchmark:
+    """Minimal stand-in for the pytest-benchmark fixture."""
+
+    def __init__(self, name):
+        self.name = name
+        self.extra_info = {}
+
+    def pedantic(self, target, args=(), kwargs=None, rounds=1, iterations=1, warmup_rounds=0):
+        kwargs = kwargs or {}
+        for _ in range(warmup_rounds):
+            target(*args, **kwargs)
+        times = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            for _ in range(iterations):
+                result = target(*args, **kwargs)
+            times.append((time.perf_counter() - start) / iterations)
+        _results.append((self.name, times, self.extra_info))
+        return result
+
+    def __call__(self, target, *args, **kwargs):
+        return self.pedantic(target, args, kwargs, rounds=3)
+
+
+if pytest_benchmark is None:
+    @pytest.fixture
+    def benchmark(request):
+        return _Benchmark(request.node.name)
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not _results:
+        return
+    terminalreporter.section("benchmarks")
+    for name, times, extra_info in _results:
+        info = ' '.join(f"{key}={value:.3g}" if isinstance(value, float) else f"{key}={value}"
+                        for key, value in extra_info.items())
+        terminalreporter.write_line(f"{name:<60} min {min(times):9.4f} s  "
+                                    f"median {np.median(times):9.4f} s  {info}")
+
+
+@pytest.fixture(autouse=True)
+def _no_figure_windows(monkeypatch):
+    """Build the figures of the plotting benchmarks without displaying them."""
+    import plotly.graph_objects as go
+    monkeypatch.setattr(go.Figure, 'show', lambda self, *args, **kwargs: None)
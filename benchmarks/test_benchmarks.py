@@ -0,0 +1,154 @@
+"""
+Throughput and accuracy benchmarks on synthetic hdEMG recordings.
+
+Each benchmark runs on recordings from ``emg2mu.utils.synthetic.generate_hdemg``
+across channel counts, durations and extension factors. The decomposition benchmarks
+also report how many ground-truth units were recovered (rate of agreement of at
+least ``RECOVERED_ROA``) in their ``extra_info``.
+
+Usage:
+    pytest benchmarks                       # all benchmarks
+    pytest benchmarks -k "16ch and 5s"      # a subset
+"""
+
+from functools import lru_cache
+import time
+import numpy as np
+import pytest
+import torch
+from emg2mu.core.extension import ExtendedEMG
+from emg2mu.core.ica import fastICA, symmetric_fastICA, torch_fastICA
+from emg2mu.core.preprocessing import whiten
+from emg2mu.detection.duplicate_detection import remove_duplicates, compute_silhouette_scores
+from emg2mu.utils.synthetic import generate_hdemg, match_units
+from emg2mu.visualization.plots import plot_spike_train, plot_waveforms
+
+N_UNITS = 8
+MAX_SOURCES = 16
+MAX_ITER = 30
+RECOVERED_ROA = 0.8
+
+GRIDS = {'16ch': (4, 4), '64ch': (8, 8)}
+DURATIONS = {'5s': 5.0, '20s': 20.0}
+EXTENSIONS = [4, 8]
+
+RECORDINGS = [pytest.param(grid, duration, id=f'{grid}-{duration}')
+              for grid in GRIDS for duration in DURATIONS]
+
+
+@lru_cache(maxsize=None)
+def recording(grid, duration):
+    return generate_hdemg(n_units=N_UNITS, grid_shape=GRIDS[grid], duration=DURATIONS[duration], seed=0)
+
+
+@lru_cache(maxsize=None)
+def whitened_operator(grid, duration, extension):
+    return whiten(ExtendedEMG(recording(grid, duration)['emg_data'], extension))
+
+
+@lru_cache(maxsize=None)
+def whitened(grid, duration, extension):
+    return whitened_operator(grid, duration, extension).toarray()
+
+
+@lru_cache(maxsize=None)
+def decomposition(grid, duration, extension):
+    np.random.seed(0)
+    return fastICA(whitened(grid, duration, extension), MAX_SOURCES, MAX_ITER)
+
+
+def report_accuracy(benchmark, spike_train, grid, duration):
+    roa = match_units(spike_train, recording(grid, duration)['spike_train'])['roa']
+    benchmark.extra_info['recovered_units'] = int(np.sum(roa >= RECOVERED_ROA))
+    benchmark.extra_info['mean_roa'] = float(np.mean(roa))
+
+
+@pytest.mark.parametrize('extension', EXTENSIONS)
+@pytest.mark.parametrize('grid, duration', RECORDINGS)
+def test_whiten(benchmark, grid, duration, extension):
+    emg_data = recording(grid, duration)['emg_data']
+    benchmark.pedantic(whiten, args=(ExtendedEMG(emg_data, extension),), rounds=3)
+
+
+@pytest.mark.parametrize('extension', EXTENSIONS)
+@pytest.mark.parametrize('grid, duration', RECORDINGS)
+def test_fastica(benchmark, grid, duration, extension):
+    X = whitened(grid, duration, extension)
+    np.random.seed(0)
+    _, _, spike_train = benchmark.pedantic(fastICA, args=(X, MAX_SOURCES, MAX_ITER), rounds=1)
+    report_accuracy(benchmark, spike_train, grid, duration)
+
+
+@pytest.mark.parametrize('layout', ['dense', 'lazy'])
+@pytest.mark.parametrize('extension', EXTENSIONS)
+@pytest.mark.parametrize('grid, duration', RECORDINGS)
+def test_fastica_layout(benchmark, grid, duration, extension, layout):
+    # The dense matrix (EMG within max_memory) against the lazy operators (beyond it)
+    X = whitened(grid, duration, extension) if layout == 'dense' else whitened_operator(grid, duration, extension)
+    np.random.seed(0)
+    benchmark.pedantic(fastICA, args=(X, 4, MAX_ITER), rounds=1)
+
+
+@pytest.mark.parametrize('block_size', [None, 8], ids=['block-all', 'block-8'])
+@pytest.mark.parametrize('extension', EXTENSIONS)
+@pytest.mark.parametrize('grid, duration', RECORDINGS)
+def test_symmetric_fastica(benchmark, grid, duration, extension, block_size):
+    # Compare with test_fastica: small blocks cost about as much as the deflation
+    X = whitened(grid, duration, extension)
+    np.random.seed(0)
+    _, _, spike_train = benchmark.pedantic(
+        symmetric_fastICA, args=(X, MAX_SOURCES, MAX_ITER), kwargs={'block_size': block_size}, rounds=1)
+    report_accuracy(benchmark, spike_train, grid, duration)
+
+
+@pytest.mark.parametrize('extension', EXTENSIONS)
+@pytest.mark.parametrize('grid, duration', RECORDINGS)
+def test_torch_fastica_cpu(benchmark, grid, duration, extension):
+    X = whitened(grid, duration, extension)
+    _, _, spike_train = benchmark.pedantic(
+        torch_fastICA, args=(X, MAX_SOURCES, MAX_ITER), kwargs={'device': 'cpu'}, rounds=1)
+    report_accuracy(benchmark, spike_train, grid, duration)
+
+
+@pytest.mark.parametrize('grid, duration', [pytest.param('64ch', '5s', id='64ch-5s')])
+def test_torch_batched_deflation_speedup(benchmark, grid, duration):
+    # Blocks of 16 candidates against one source at a time, same number of sources
+    X = whitened(grid, duration, EXTENSIONS[0])
+    times = {}
+    for batch_size in [1, 16]:
+        torch.manual_seed(0)
+        start = time.perf_counter()
+        _, _, spike_train = torch_fastICA(X, 2 * MAX_SOURCES, 100, device='cpu', batch_size=batch_size)
+        times[batch_size] = time.perf_counter() - start
+    benchmark.extra_info['speedup'] = times[1] / times[16]
+    report_accuracy(benchmark, spike_train, grid, duration)
+    benchmark.pedantic(lambda: None, rounds=1)
+    assert times[16] < 0.8 * times[1]
+
+
+@pytest.mark.parametrize('method', ['histogram', 'spike_times'])
+@pytest.mark.parametrize('extension', EXTENSIONS)
+@pytest.mark.parametrize('grid, duration', RECORDINGS)
+def test_remove_duplicates(benchmark, grid, duration, extension, method):
+    source, _, spike_train = decomposition(grid, duration, extension)
+    clean_spike_train, _, _ = benchmark(remove_duplicates, spike_train, source, 2048, method=method)
+    report_accuracy(benchmark, clean_spike_train, grid, duration)
+
+
+@pytest.mark.parametrize('grid, duration', RECORDINGS)
+def test_compute_silhouette_scores(benchmark, grid, duration):
+    source, _, spike_train = decomposition(grid, duration, EXTENSIONS[0])
+    benchmark(compute_silhouette_scores, spike_train, source)
+
+
+@pytest.mark.parametrize('backend', ['plotly', 'matplotlib'])
+@pytest.mark.parametrize('grid, duration', RECORDINGS)
+def test_plot_spike_train(benchmark, grid, duration, backend):
+    _, _, spike_train = decomposition(grid, duration, EXTENSIONS[0])
+    benchmark(plot_spike_train, spike_train, 2048, min_score=0, backend=backend, show=False)
+
+
+@pytest.mark.parametrize('grid, duration', RECORDINGS)
+def test_plot_waveforms(benchmark, grid, duration):
+    source, _, spike_train = decomposition(grid, duration, EXTENSIONS[0])
+    benchmark(plot_waveforms, source, spike_train, 2048, min_score=0)
@@ -15,7 +15,19 @@ Main Features:
 For more information, visit: https://github.com/neuromechanist/emg2mu
 """
 
-from .core.decomposition import EMG
 from .version import __version__
 
 __all__ = ['EMG', '__version__']
+
+
+def __getattr__(name):
+    # EMG is imported on first access so that ``import emg2mu`` (e.g. in the worker
+    # processes of the batch and export functions) does not load the numerical stack
+    if name == 'EMG':
+        from .core.decomposition import EMG
+        return EMG
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + ['EMG'])
@@ -0,0 +1,139 @@
+"""
+This module provides spike-triggered waveform extraction and statistics.
+
+The segments of a signal around the spikes of a unit are gathered with one fancy
+index into a sliding-window view of the signal, without copying the signal or
+looping over the spikes. Their mean, standard deviation and confidence interval are
+accumulated chunk by chunk with the pairwise update of Chan et al., so that the
+statistics of units with many spikes (or of many channels) never hold all segments
+in memory at once.
+
+Functions:
+    - extract_waveforms: Segments of a signal around the spikes
+    - waveform_statistics: Mean, standard deviation and confidence interval of the segments
+    - muap_statistics: Waveform statistics of every unit of a spike train
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from ..core.spike_train import as_spike_train
+
+
+def _valid_spikes(spikes, n_frames, window):
+    """Spikes whose whole window lies inside the signal."""
+    spikes = np.asarray(spikes, dtype=np.int64)
+    return spikes[(spikes >= window) & (spikes + window < n_frames)]
+
+
+def extract_waveforms(source, spikes, window):
+    """
+    Segments of a signal around the spikes.
+
+    Spikes closer than ``window`` samples to either end of the signal are skipped.
+
+    Parameters
+    ----------
+    source : numpy.ndarray
+        Signal of shape (frames,), e.g. one ICA source, or (frames, channels), e.g. the
+        EMG for multi-channel MUAPs
+    spikes : array-like
+        Spike sample indices
+    window : int
+        Half-width of the segments in samples
+
+    Returns
+    -------
+    numpy.ndarray
+        Segments of shape (spikes, 2 * window + 1), or (spikes, 2 * window + 1,
+        channels) for a multi-channel signal
+    """
+    source = np.asarray(source)
+    spikes = _valid_spikes(spikes, source.shape[0], window)
+    windows = sliding_window_view(source, 2 * window + 1, axis=0)
+    segments = windows[spikes - window]
+    # sliding_window_view puts the window axis last
+    return segments if source.ndim == 1 else np.moveaxis(segments, -1, 1)
+
+
+def waveform_statistics(source, spikes, window, chunk_size=1024):
+    """
+    Mean, standard deviation and 95% confidence interval of the segments around the spikes.
+
+    The segments are gathered and reduced ``chunk_size`` spikes at a time.
+
+    Parameters
+    ----------
+    source : numpy.ndarray
+        Signal of shape (frames,) or (frames, channels)
+    spikes : array-like
+        Spike sample indices
+    window : int
+        Half-width of the segments in samples
+    chunk_size : int, optional
+        Number of segments gathered at a time. Default = 1024
+
+    Returns
+    -------
+    dict
+        'mean' and 'std' (population) of shape (2 * window + 1[, channels]), 'ci' (half
+        width of the 95% confidence interval of the mean) and the number 'n' of segments
+    """
+    source = np.asarray(source)
+    spikes = _valid_spikes(spikes, source.shape[0], window)
+    shape = (2 * window + 1,) + source.shape[1:]
+    n, mean, scatter = 0, np.zeros(shape), np.zeros(shape)
+
+    for start in range(0, len(spikes), chunk_size):
+        segments = extract_waveforms(source, spikes[start:start + chunk_size], window)
+        n_chunk = len(segments)
+        chunk_mean = segments.mean(axis=0, dtype=np.float64)
+        chunk_scatter = np.sum((segments - chunk_mean) ** 2, axis=0)
+        n_total = n + n_chunk
+        delta = chunk_mean - mean
+        mean = mean + delta * (n_chunk / n_total)
+        scatter = scatter + chunk_scatter + delta ** 2 * (n * n_chunk / n_total)
+        n = n_total
+
+    if n == 0:
+        nan = np.full(shape, np.nan)
+        return {'mean': nan, 'std': nan, 'ci': nan, 'n': 0}
+    std = np.sqrt(scatter / n)
+    return {'mean': mean, 'std': std, 'ci': 1.96 * std / np.sqrt(n), 'n': n}
+
+
+def muap_statistics(source, spike_train, window, per_unit=True, chunk_size=1024):
+    """
+    Waveform statistics of every unit of a spike train.
+
+    Parameters
+    ----------
+    source : numpy.ndarray
+        Sources of shape (frames, units), unit k being triggered on column k, or, with
+        ``per_unit=False``, one signal of shape (frames, channels) triggered on by
+        every unit (e.g. the EMG, giving the multi-channel MUAP of every unit)
+    spike_train : SpikeTrain or numpy.ndarray
+        The spike train
+    window : int
+        Half-width of the segments in samples
+    per_unit : bool, optional
+        Whether ``source`` holds one column per unit. Default = True
+    chunk_size : int, optional
+        Number of segments gathered at a time. Default = 1024
+
+    Returns
+    -------
+    list of dict
+        The ``waveform_statistics`` of every unit
+
+    Raises
+    ------
+    ValueError
+        If ``per_unit`` is True and ``source`` does not have one column per unit
+    """
+    spike_train = as_spike_train(spike_train)
+    source = np.asarray(source)
+    if per_unit and (source.ndim != 2 or source.shape[1] != spike_train.n_units):
+        raise ValueError(f"per_unit sources must have shape (frames, {spike_train.n_units}), "
+                         f"got {source.shape}; use per_unit=False for multi-channel MUAPs")
+    return [waveform_statistics(source[:, k] if per_unit else source, spikes, window, chunk_size)
+            for k, spikes in enumerate(spike_train)]
@@ -0,0 +1,217 @@
+"""
+This module provides the convergence controller of the FastICA decompositions.
+
+The controller decides when the fixed-point iterations of a source end and when the
+extraction of further sources ends. A source has converged when its unmixing vector
+stops changing up to its sign, and has stalled when the change has not decreased for
+a number of iterations. A global iteration and time budget is shared by all sources,
+and the extraction stops early once a number of consecutive sources come out as
+duplicates of earlier sources or as low-quality sources.
+
+Classes:
+    - ConvergenceController: Stopping rules for the iterations and the extraction
+"""
+
+import time
+import numpy as np
+from ..detection.peak_classification import detect_spikes
+from ..detection.duplicate_detection import rate_of_agreement, _unit_silhouette
+
+
+class ConvergenceController:
+    """
+    Stopping rules for the FastICA iterations and the extraction of sources.
+
+    The ICA functions call ``start`` once per run, ``start_source`` and then
+    ``should_stop`` before every fixed-point iteration of a source, and ``accept``
+    with every extracted source; they stop extracting once ``exhausted`` is True.
+
+    Parameters
+    ----------
+    tolerance : float, optional
+        Convergence tolerance on 1 - |w_new . w_old|, which ignores sign flips of the
+        unit-norm unmixing vector. Default = 1e-5
+    stall_iter : int, optional
+        Number of iterations without a decrease of the change after which a source is
+        abandoned as stalled. Default = None (no stall detection)
+    max_total_iter : int, optional
+        Iteration budget shared by all sources. Default = None (no budget)
+    time_budget : float, optional
+        Time budget in seconds for the whole extraction. Default = None (no budget)
+    max_rejected : int, optional
+        Number of consecutive duplicate or low-quality sources after which the
+        extraction stops. Default = None (extract all sources)
+    min_silhouette : float, optional
+        Silhouette score below which a source counts as low quality; sources of pure
+        noise score about 0.65. Default = 0.8
+    duplicate_roa : float, optional
+        Rate of agreement with an accepted source above which a source counts as a
+        duplicate. Default = 0.5
+    min_spikes : int, optional
+        Number of spikes below which a source counts as low quality. Default = 10
+    max_lag : int, optional
+        Largest lag in samples between duplicate sources. Default = 32
+
+    Attributes
+    ----------
+    iterations : list of int
+        Number of iterations of every source of the last run
+    source_status : list of str
+        Why the iterations of every source ended: 'converged', 'stalled', 'max_iter'
+        or 'budget'
+    rejected : list of bool
+        Whether every source was rejected as duplicate or low quality (only evaluated
+        with ``max_rejected``)
+    termination : str or None
+        Why the extraction stopped early: 'iteration budget', 'time budget' or
+        'rejected sources'; None when all sources were extracted
+    """
+
+    def __init__(self, tolerance=1e-5, stall_iter=None, max_total_iter=None, time_budget=None,
+                 max_rejected=None, min_silhouette=0.8, duplicate_roa=0.5, min_spikes=10, max_lag=32):
+        self.tolerance = tolerance
+        self.stall_iter = stall_iter
+        self.max_total_iter = max_total_iter
+        self.time_budget = time_budget
+        self.max_rejected = max_rejected
+        self.min_silhouette = min_silhouette
+        self.duplicate_roa = duplicate_roa
+        self.min_spikes = min_spikes
+        self.max_lag = max_lag
+        self.start()
+
+    def params(self):
+        """
+        Parameters of the controller, e.g. for cache keys.
+
+        Returns
+        -------
+        dict
+            The constructor arguments
+        """
+        return {'tolerance': self.tolerance, 'stall_iter': self.stall_iter,
+                'max_total_iter': self.max_total_iter, 'time_budget': self.time_budget,
+                'max_rejected': self.max_rejected, 'min_silhouette': self.min_silhouette,
+                'duplicate_roa': self.duplicate_roa, 'min_spikes': self.min_spikes,
+                'max_lag': self.max_lag}
+
+    @property
+    def deterministic(self):
+        """Whether the stopping decisions do not depend on timing."""
+        return self.time_budget is None
+
+    def start(self):
+        """
+        Reset the controller for a new extraction run.
+
+        Returns
+        -------
+        self
+        """
+        self.iterations = []
+        self.source_status = []
+        self.rejected = []
+        self.termination = None
+        self.total_iter = 0
+        self._accepted_spikes = []
+        self._consecutive_rejected = 0
+        self._start_time = time.perf_counter()
+        return self
+
+    def start_source(self):
+        """
+        Reset the per-source state before the iterations of a new source (or block).
+
+        Returns
+        -------
+        None
+        """
+        self.iterations.append(0)
+        self.source_status.append('max_iter')
+        self._best_change = np.inf
+        self._since_best = 0
+
+    def should_stop(self, dot):
+        """
+        Whether the iterations of the current source should end.
+
+        Parameters
+        ----------
+        dot : float
+            Inner product of the current and the previous unit-norm unmixing vector;
+            for a block, the smallest absolute inner product of its columns
+
+        Returns
+        -------
+        bool
+            True when the source converged or stalled, or when the budget is spent;
+            otherwise the caller runs one more iteration, which is counted
+        """
+        change = abs(abs(float(dot)) - 1)
+        if change <= self.tolerance:
+            self.source_status[-1] = 'converged'
+            return True
+
+        if change < self._best_change:
+            self._best_change, self._since_best = change, 0
+        else:
+            self._since_best += 1
+        if self.stall_iter is not None and self._since_best >= self.stall_iter:
+            self.source_status[-1] = 'stalled'
+            return True
+
+        if self._budget_spent():
+            self.source_status[-1] = 'budget'
+            return True
+
+        self.iterations[-1] += 1
+        self.total_iter += 1
+        return False
+
+    def _budget_spent(self):
+        if self.max_total_iter is not None and self.total_iter >= self.max_total_iter:
+            self.termination = 'iteration budget'
+        elif self.time_budget is not None and time.perf_counter() - self._start_time >= self.time_budget:
+            self.termination = 'time budget'
+        return self.termination is not None
+
+    def accept(self, source):
+        """
+        Judge an extracted source and update the count of consecutive rejections.
+
+        Without ``max_rejected`` every source is accepted without being evaluated.
+
+        Parameters
+        ----------
+        source : numpy.ndarray
+            The extracted source signal of shape (frames,)
+
+        Returns
+        -------
+        bool
+            False if the source is a duplicate of an accepted source or of low quality
+        """
+        if self.max_rejected is None:
+            self.rejected.append(False)
+            return True
+
+        source = np.asarray(source, dtype=np.float64)
+        spikes = detect_spikes(source)[0]
+        rejected = bool(len(spikes) < self.min_spikes
+                        or _unit_silhouette(source, None, None) < self.min_silhouette
+                        or any(rate_of_agreement(spikes, accepted, max_lag=self.max_lag)[0] >= self.duplicate_roa
+                               for accepted in self._accepted_spikes))
+        if rejected:
+            self._consecutive_rejected += 1
+            if self._consecutive_rejected >= self.max_rejected and self.termination is None:
+                self.termination = 'rejected sources'
+        else:
+            self._accepted_spikes.append(spikes)
+            self._consecutive_rejected = 0
+        self.rejected.append(rejected)
+        return not rejected
+
+    @property
+    def exhausted(self):
+        """Whether the extraction of further sources should stop."""
+        return self.termination is not None or self._budget_spent()
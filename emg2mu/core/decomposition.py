@@ -2,15 +2,25 @@
 This module provides the main EMG decomposition functionality.
 """
 
+import os
+import tempfile
 import numpy as np
 import warnings
-from ..core.preprocessing import whiten, awgn
-from ..core.ica import fastICA, torch_fastICA, select_device
+from ..core.preprocessing import Whitener, awgn
+from ..core.extension import ExtendedEMG
+from ..core.convergence import ConvergenceController
+from ..core.ica import fastICA, torch_fastICA, symmetric_fastICA, select_device
+from ..core.spike_train import SpikeTrain
+from ..core.refinement import refine_separation
+from ..core.streaming import StreamingDecomposer
+from ..detection.peak_classification import find_source_peaks, classify_peaks, detect_spikes
 from ..detection.duplicate_detection import remove_duplicates, compute_silhouette_scores
-from ..utils.io import (load_mat_data, save_results, load_results,
-                       save_ica_results, load_ica_results,
-                       save_silhouette_scores, load_silhouette_scores)
-from ..visualization.plots import plot_spike_train, plot_waveforms
+from ..utils.io import (LazyRecording, load_mat_data, load_recording, save_results, load_results,
+                       save_ica_results, load_ica_results, load_whitener,
+                       save_silhouette_scores, load_silhouette_scores,
+                       _spike_train_fields, _read_spike_train)
+from ..utils.cache import StageCache, data_digest
+from ..utils.profiling import stage
 
 
 class EMG:
@@ -22,18 +32,23 @@ class EMG:
 
     Parameters
     ----------
-    data : str or numpy.ndarray
-        The path to the hdEMG data or the data array itself
+    data : str, numpy.ndarray or LazyRecording
+        The path to the hdEMG data, the data array itself, or a lazily loaded recording
+        (see ``emg2mu.utils.io.load_recording``). Paths to MAT files are read with
+        ``load_mat_data``; other paths (.npy, .h5) are opened lazily.
     data_mode : str, optional
         EMG recording mode ('monopolar' or 'bipolar'). Default = 'monopolar'
     sampling_frequency : int, optional
-        Sampling frequency of the data. Default = 2048 Hz
+        Sampling frequency of the data, used when it is not stored with the recording.
+        Default = 2048 Hz
     extension_parameter : int, optional
         Number of times to repeat data blocks. Default = 4
     max_sources : int, optional
         Maximum iterations for ICA decomposition. Default = 300
     whiten_flag : bool, optional
         Whether to whiten the data prior to ICA. Default = True
+    whiten_method : str, optional
+        Whitening method ('zca', 'zca_cor', 'pca', 'pca_cor', 'cholesky'). Default = 'zca'
     inject_noise : float, optional
         SNR for adding white noise. Default = inf (no noise)
     silhouette_threshold : float, optional
@@ -44,43 +59,115 @@ class EMG:
         Maximum ICA iterations. Default = 100
     device : str, optional
         Device for torch operations ('auto', 'cuda', 'mps', 'cpu'). Default = 'auto'
+    noise_seed : int, optional
+        Seed of the injected noise, making noisy runs reproducible (and cacheable).
+        Default = None
+    cache : StageCache or str, optional
+        Stage cache (or its directory). The results of ``preprocess``, ``run_ica``,
+        ``remove_duplicates`` and ``compute_scores`` are stored under a hash of the input
+        data and every parameter they depend on, and reused when those are unchanged.
+        Default = None (no caching)
+    dtype : numpy.dtype, optional
+        Floating-point type of the preprocessed data, sources and unmixing matrix.
+        numpy.float32 halves the memory and speeds up the matrix products, while the
+        covariance statistics are still accumulated in float64. Default = numpy.float64
+    profiler : Profiler, optional
+        Profiler recording the time and memory of every stage (preprocessing, whitening,
+        each ICA source, peak detection and classification, duplicate removal, scoring).
+        Default = None (no profiling)
+    whiten_components : int or float, optional
+        Number of principal components kept by the 'pca' and 'pca_cor' whitening, or
+        the fraction of the variance they must explain; the ICA then runs in the
+        reduced space. Default = None (keep all components)
+    whiten_solver : str, optional
+        Eigensolver of the truncated whitening ('eigh', 'eigsh' or 'randomized').
+        Default = 'eigh'
+    max_memory : int, optional
+        Largest size in bytes of the preprocessed (extended and whitened) matrix that is
+        materialised in memory; the dense matrix makes every ICA product two to three
+        times faster than the lazy delay-embedding operators, which are kept for larger
+        recordings. Lazily loaded recordings that need a dtype cast, injected noise or
+        the bipolar montage are derived chunk by chunk into memory within this budget
+        and into a temporary memory-mapped file beyond it. 0 always keeps the operators
+        (and derives into a file), None always materialises. Default = 2 GiB
     """
 
     def __init__(self, data, data_mode='monopolar', sampling_frequency=2048,
                  extension_parameter=4, max_sources=300, whiten_flag=True,
                  inject_noise=np.inf, silhouette_threshold=0.6,
                  output_file='sample_decomposed', max_ica_iter=100,
-                 device='auto'):
+                 device='auto', whiten_method='zca', noise_seed=None, cache=None, dtype=np.float64,
+                 profiler=None, whiten_components=None, whiten_solver='eigh', max_memory=2 * 1024 ** 3):
 
         # Load data
-        if isinstance(data, str):
-            self.data, self.sampling_frequency = load_mat_data(data)
+        if isinstance(data, (str, os.PathLike)) and str(data).lower().endswith('.mat'):
+            data, stored_frequency = load_mat_data(data)
+        elif isinstance(data, (str, os.PathLike)):
+            data = load_recording(data)
+            stored_frequency = data.sampling_frequency
         else:
-            self.data = data
-            self.sampling_frequency = sampling_frequency
+            stored_frequency = data.sampling_frequency if isinstance(data, LazyRecording) else None
+        self.data = data
+        self.sampling_frequency = sampling_frequency if stored_frequency is None else stored_frequency
 
         # Store parameters
         self.data_mode = data_mode
         self.extension_parameter = extension_parameter
         self.max_sources = max_sources
         self.whiten_flag = whiten_flag
+        self.whiten_method = whiten_method
+        self.whiten_components = whiten_components
+        self.whiten_solver = whiten_solver
         self.inject_noise = inject_noise
         self.silhouette_threshold = silhouette_threshold
         self.output_file = output_file
         self.max_ica_iter = max_ica_iter
-        self.device = select_device(device)
+        self.device = device
+        self.noise_seed = noise_seed
+        self.dtype = np.dtype(dtype)
+        if not np.issubdtype(self.dtype, np.floating):
+            raise ValueError(f"dtype must be a floating-point type, got {self.dtype}")
+        self.cache = StageCache(cache) if isinstance(cache, (str, os.PathLike)) else cache
+        self.profiler = profiler
+        self.max_memory = max_memory
 
         # Initialize results
+        self.array_shape = None
+        self.whitener = None
         self._preprocessed = None
         self._raw_source = None
         self._raw_spike_train = None
         self._raw_B = None
+        self.convergence = None
         self.source = None
         self.spike_train = None
         self.good_idx = None
         self.sil_score = None
+        self._data_digest = None
+        self._stage_keys = {}
+
+    @property
+    def device(self):
+        """Torch device of the 'torch' ICA; selected, and torch imported, on first use."""
+        if not self._device_selected:
+            self._device = select_device(self._device)
+            self._device_selected = True
+        return self._device
+
+    @device.setter
+    def device(self, device):
+        self._device = device
+        self._device_selected = False
+
+    def _stage_key(self, stage, parent, **params):
+        """
+        Cache key of a stage result; None without a cache or when the parent is not cacheable.
+        """
+        if self.cache is None or parent is None:
+            return None
+        return self.cache.key(stage, parent, **params)
 
-    def preprocess(self, array_shape=None):
+    def preprocess(self, array_shape=None, whitener=None):
         """
         Prepare the EMG array for decomposition.
 
@@ -88,58 +175,163 @@ class EMG:
         ----------
         array_shape : list-like, optional
             Shape of the electrode array [rows, cols]. Required for bipolar mode.
+        whitener : Whitener, optional
+            A fitted whitener to reuse, e.g. from an earlier session with the same
+            electrode grid. Default = None (fit a new one on this recording)
 
         Returns
         -------
         self
             Returns the instance itself for method chaining
         """
-        # Get data into column format if needed
-        emg = self.data
-        num_chan = min(emg.shape)
-        if num_chan != emg.shape[1]:
-            emg = emg.T
+        with stage(self.profiler, 'preprocess'):
+            self.array_shape = array_shape
 
-        # Add white noise if specified
-        if not np.isinf(self.inject_noise):
-            emg = awgn(emg, self.inject_noise)
-
-        # Create bipolar setting from monopolar data if needed
-        if self.data_mode == "bipolar":
-            if array_shape is None:
+            if self.data_mode == "bipolar" and array_shape is None:
                 raise ValueError("array_shape is required for bipolar mode")
-            for i in range(num_chan - array_shape[0]):
-                emg[:, i] = emg[:, i] - emg[:, i + array_shape[0]]
-            emg = emg[:, :-array_shape[0]]
-
-        # Extend the data
-        extended_emg = np.zeros((emg.shape[0], emg.shape[1] * (self.extension_parameter + 1)))
-        extended_emg[:, :emg.shape[1]] = emg
-        if self.extension_parameter != 0:
-            for i in range(self.extension_parameter):
-                i += 1
-                extended_emg[i:, emg.shape[1] * i: emg.shape[1] * (i + 1)] = emg[:-i, :]
-
-        # Whiten if requested
-        if self.whiten_flag:
-            self._preprocessed = whiten(extended_emg)
-        else:
-            self._preprocessed = extended_emg
 
+            emg = self.data
+            if isinstance(emg, LazyRecording):
+                # Lazy recordings are already (frames, channels) and derived chunk by chunk
+                emg = self._derive_recording(emg, array_shape)
+            else:
+                # Get data into column format if needed
+                num_chan = min(emg.shape)
+                if num_chan != emg.shape[1]:
+                    emg = emg.T
+                emg = emg.astype(self.dtype, copy=False)
+
+                # Add white noise if specified
+                if not np.isinf(self.inject_noise):
+                    emg = awgn(emg, self.inject_noise, seed=self.noise_seed)
+
+                # Create bipolar setting from monopolar data if needed
+                if self.data_mode == "bipolar":
+                    emg = emg[:, :-array_shape[0]] - emg[:, array_shape[0]:]
+
+            # Extend the data (lazily, without copying the delayed blocks)
+            extended_emg = ExtendedEMG(emg, self.extension_parameter)
+
+            # Cache key of the extended data, unless unseeded injected noise makes it random
+            data_key = None
+            if self.cache is not None and (np.isinf(self.inject_noise) or self.noise_seed is not None):
+                if self._data_digest is None:
+                    self._data_digest = data_digest(self.data)
+                data_key = self._stage_key(
+                    'extension', self._data_digest, data_mode=self.data_mode, array_shape=array_shape,
+                    inject_noise=self.inject_noise, noise_seed=self.noise_seed,
+                    extension_parameter=self.extension_parameter, dtype=self.dtype.str)
+
+            # Whiten if requested
+            if self.whiten_flag:
+                with stage(self.profiler, 'whitening', method=self.whiten_method) as record:
+                    if whitener is None:
+                        whitener_key = self._stage_key('whitener', data_key)
+                        record['cached'] = whitener_key is not None and whitener_key in self.cache
+                        whitener = self._cached_whitener(whitener_key, extended_emg)
+                    else:
+                        whitener_key = self._stage_key(
+                            'whitener', data_key, eps=whitener.eps,
+                            statistics=[data_digest(whitener.mean), data_digest(whitener._scatter)])
+                    self.whitener = whitener
+                    self._preprocessed = whitener.transform(extended_emg, method=self.whiten_method)
+                preprocess_key = self._stage_key(
+                    'preprocess', whitener_key, whiten_method=self.whiten_method,
+                    n_components=whitener.n_components, solver=whitener.solver, seed=whitener.seed)
+            else:
+                self._preprocessed = extended_emg
+                preprocess_key = self._stage_key('preprocess', data_key, whiten_flag=False)
+
+            # Materialise the lazy operators when the dense matrix fits the memory budget
+            frames, num_cols = self._preprocessed.shape
+            if self.max_memory is None or frames * num_cols * self.dtype.itemsize <= self.max_memory:
+                self._preprocessed = self._preprocessed.toarray()
+
+            self._stage_keys = {'preprocess': preprocess_key}
         return self
 
-    def run_ica(self, method='fastICA', load_path=None, save_path=None):
+    def _derive_recording(self, recording, array_shape, chunk_size=65536):
+        """
+        Cast a lazy recording to ``dtype``, add the injected noise and form the bipolar
+        montage chunk by chunk.
+
+        A memory-mapped recording that needs none of these is used in place. Otherwise
+        the result is written to an in-memory array when it fits ``max_memory``, and to
+        a temporary memory-mapped file when it does not, so that the recording is never
+        read into memory whole. The noise is drawn from the same seeded stream and
+        scaled to the same measured signal power as ``awgn``.
+        """
+        noisy = not np.isinf(self.inject_noise)
+        bipolar = self.data_mode == "bipolar"
+        if not noisy and not bipolar and recording.is_mapped(self.dtype):
+            return recording.toarray()
+
+        frames, num_chan = recording.shape
+        shape = (frames, num_chan - array_shape[0] if bipolar else num_chan)
+        if self.max_memory is None or np.prod(shape) * self.dtype.itemsize <= self.max_memory:
+            out = np.empty(shape, dtype=self.dtype)
+        else:
+            out = np.memmap(tempfile.TemporaryFile(), dtype=self.dtype, mode='w+', shape=shape)
+
+        if noisy:
+            power = sum(np.sum(np.square(chunk.astype(self.dtype, copy=False), dtype=np.float64))
+                        for chunk in recording.iter_chunks(chunk_size)) / (frames * num_chan)
+            noise_scale = np.sqrt(power / 10 ** (self.inject_noise / 10))
+            rng = np.random if self.noise_seed is None else np.random.default_rng(self.noise_seed)
+
+        for start, chunk in zip(range(0, frames, chunk_size), recording.iter_chunks(chunk_size)):
+            # Chunks of memory-mapped recordings are views of the file: no in-place updates
+            chunk = chunk.astype(self.dtype, copy=False)
+            if noisy:
+                chunk = chunk + (noise_scale * rng.standard_normal(chunk.shape)).astype(self.dtype, copy=False)
+            if bipolar:
+                chunk = chunk[:, :-array_shape[0]] - chunk[:, array_shape[0]:]
+            out[start:start + len(chunk)] = chunk
+        return out
+
+    def _cached_whitener(self, key, extended_emg):
+        """
+        Whitener fitted on the extended data, served from the cache when available.
+        """
+        cached = self.cache.load(key) if key is not None else None
+        whitener = Whitener(self.whiten_method, n_components=self.whiten_components,
+                            solver=self.whiten_solver)
+        if cached is not None:
+            whitener.n_samples = cached['n_samples'].item()
+            whitener.mean = cached['mean']
+            whitener._scatter = cached['scatter']
+            return whitener
+        whitener.fit(extended_emg)
+        if key is not None:
+            self.cache.save(key, n_samples=whitener.n_samples, mean=whitener.mean,
+                            scatter=whitener._scatter)
+        return whitener
+
+    def run_ica(self, method='fastICA', load_path=None, save_path=None, block_size=None,
+                batch_size=1, convergence=None):
         """
         Run ICA decomposition on the preprocessed data.
 
         Parameters
         ----------
         method : str, optional
-            ICA method to use ('fastICA' or 'torch'). Default = 'fastICA'
+            ICA method to use ('fastICA', 'torch' or 'symmetric'). Default = 'fastICA'
         load_path : str, optional
             Path to load pre-computed ICA results
         save_path : str, optional
             Path to save ICA results
+        block_size : int, optional
+            Number of unmixing vectors updated together by the 'symmetric' method.
+            Small blocks can be slower than 'fastICA' (see ``symmetric_fastICA``).
+            Default = None (all sources at once)
+        batch_size : int, optional
+            Number of candidate vectors advanced concurrently by the 'torch' method.
+            Default = 1 (one source at a time)
+        convergence : ConvergenceController or dict, optional
+            Stopping rules (or the parameters of a ``ConvergenceController``), e.g.
+            ``{'stall_iter': 10, 'max_rejected': 20}`` to abandon stalled sources and to
+            stop extracting after 20 consecutive duplicate or low-quality sources.
+            Default = None (sign-invariant convergence only)
 
         Returns
         -------
@@ -149,6 +341,7 @@ class EMG:
         if load_path is not None:
             try:
                 self._raw_source, self._raw_spike_train, self._raw_B = load_ica_results(load_path)
+                self._stage_keys = {'preprocess': self._stage_keys.get('preprocess')}
                 return self
             except ValueError as e:
                 warnings.warn(f"Could not load ICA results: {str(e)}. Running ICA instead.")
@@ -156,22 +349,169 @@ class EMG:
         if self._preprocessed is None:
             raise ValueError("Data must be preprocessed before running ICA")
 
-        if method == 'fastICA':
-            self._raw_source, self._raw_B, self._raw_spike_train = fastICA(
-                self._preprocessed, self.max_sources, self.max_ica_iter)
-        elif method == 'torch':
-            self._raw_source, self._raw_B, self._raw_spike_train = torch_fastICA(
-                self._preprocessed, self.max_sources, self.max_ica_iter, device=self.device)
-        else:
-            raise ValueError("method must be either 'fastICA' or 'torch'")
+        # No more sources than dimensions of the (possibly truncated) whitened space
+        max_sources = min(self.max_sources, self._preprocessed.shape[1])
+
+        if isinstance(convergence, dict):
+            convergence = ConvergenceController(**convergence)
+        self.convergence = convergence
+
+        # Time budgets make the result depend on the machine load, so it is not cached
+        ica_key = None
+        if convergence is None or convergence.deterministic:
+            ica_key = self._stage_key(
+                'ica', self._stage_keys.get('preprocess'), method=method, max_sources=max_sources,
+                max_ica_iter=self.max_ica_iter, block_size=block_size if method == 'symmetric' else None,
+                batch_size=batch_size if method == 'torch' else None,
+                convergence=None if convergence is None else convergence.params())
+        self._stage_keys = {'preprocess': self._stage_keys.get('preprocess'), 'ica': ica_key}
+        cached = self.cache.load(ica_key) if ica_key is not None else None
+
+        with stage(self.profiler, 'ica', method=method, sources=max_sources) as record:
+            record['cached'] = cached is not None
+            if cached is not None:
+                self._raw_source, self._raw_B = cached['source'], cached['B']
+                self._raw_spike_train = _read_spike_train(cached)
+            elif method == 'fastICA':
+                self._raw_source, self._raw_B, self._raw_spike_train = fastICA(
+                    self._preprocessed, max_sources, self.max_ica_iter, profiler=self.profiler,
+                    controller=convergence)
+            elif method == 'torch':
+                self._raw_source, self._raw_B, self._raw_spike_train = torch_fastICA(
+                    self._preprocessed, max_sources, self.max_ica_iter, device=self.device,
+                    batch_size=batch_size, profiler=self.profiler, controller=convergence)
+            elif method == 'symmetric':
+                self._raw_source, self._raw_B, self._raw_spike_train = symmetric_fastICA(
+                    self._preprocessed, max_sources, self.max_ica_iter, block_size=block_size,
+                    profiler=self.profiler, controller=convergence)
+            else:
+                raise ValueError("method must be one of 'fastICA', 'torch' or 'symmetric'")
+
+        if cached is None and ica_key is not None:
+            self.cache.save(ica_key, source=self._raw_source, B=self._raw_B,
+                            **_spike_train_fields(self._raw_spike_train))
 
         if save_path is not None:
             save_ica_results(save_path, self._raw_source, self._raw_spike_train, self._raw_B)
 
         return self
 
+    def apply_decomposition(self, B, whitening=None, array_shape=None):
+        """
+        Apply previously learned separation vectors to this recording.
+
+        The recording is projected through B (one pass over the lazily whitened
+        extended EMG) and the spikes are re-detected, replacing a full ICA run. The
+        results are stored like those of ``run_ica``, so ``remove_duplicates`` and
+        ``compute_scores`` can follow.
+
+        Parameters
+        ----------
+        B : numpy.ndarray or str
+            Separation vectors of shape (extended channels, sources), or the path to
+            ICA results saved with ``run_ica(save_path=...)``
+        whitening : Whitener or str, optional
+            The whitener of the recording B was learned on, or the path to one saved
+            with ``save_whitener``. B is only exactly valid in the whitened space it was
+            learned in, so the whitening method of the whitener replaces
+            ``whiten_method``. Default = None (use this recording's own preprocessing,
+            fitting a whitener if the data has not been preprocessed yet)
+        array_shape : list-like, optional
+            Shape of the electrode array [rows, cols]. Required for bipolar mode. The
+            data is preprocessed again when it differs from the shape of the last
+            ``preprocess``.
+
+        Returns
+        -------
+        self
+            Returns the instance itself for method chaining
+
+        Raises
+        ------
+        ValueError
+            If a whitener is given while whitening is disabled, or B does not match the
+            preprocessed data
+        """
+        if isinstance(B, (str, os.PathLike)):
+            _, _, B = load_ica_results(B)
+        if isinstance(whitening, (str, os.PathLike)):
+            whitening = load_whitener(whitening)
+        if whitening is not None:
+            if not self.whiten_flag:
+                raise ValueError("A whitener was given but whitening is disabled (whiten_flag=False)")
+            self.whiten_method = whitening.method
+        new_shape = array_shape is not None and (
+            self.array_shape is None or not np.array_equal(array_shape, self.array_shape))
+        if whitening is not None or self._preprocessed is None or new_shape:
+            self.preprocess(array_shape, whitener=whitening)
+
+        B = np.asarray(B, dtype=self._preprocessed.dtype)
+        if B.shape[0] != self._preprocessed.shape[1]:
+            raise ValueError(f"B has {B.shape[0]} rows but the preprocessed data has "
+                             f"{self._preprocessed.shape[1]} extended channels")
+
+        with stage(self.profiler, 'apply_decomposition', sources=B.shape[1]):
+            self._raw_B = B
+            self._raw_source = self._preprocessed @ B
+            self._raw_spike_train = SpikeTrain.from_units(
+                detect_spikes(self._raw_source, profiler=self.profiler), self._raw_source.shape[0])
+        self.source = self.spike_train = self.good_idx = self.sil_score = None
+        preprocess_key = self._stage_keys.get('preprocess')
+        self._stage_keys = {'preprocess': preprocess_key,
+                            'ica': self._stage_key('apply', preprocess_key, B=data_digest(B))}
+        return self
+
+    def refine(self, max_iter=10, min_spikes=2, keep_best=True):
+        """
+        Refine the separation vectors by spike-triggered averaging of the whitened data.
+
+        Every separation vector is re-estimated as the mean of the preprocessed
+        observations at the spikes of its source, and the spikes are re-detected, until
+        they stop changing (see ``refine_separation``). Run after ``run_ica`` or
+        ``apply_decomposition`` and before ``remove_duplicates``.
+
+        Parameters
+        ----------
+        max_iter : int, optional
+            Maximum number of refinement iterations. Default = 10
+        min_spikes : int, optional
+            Units with fewer spikes are left unchanged. Default = 2
+        keep_best : bool, optional
+            Whether to keep the original separation vector of a unit whose silhouette
+            score is lowered by the refinement. Default = True
+
+        Returns
+        -------
+        self
+            Returns the instance itself for method chaining
+        """
+        if self._raw_B is None or self._raw_source is None:
+            raise ValueError("ICA must be run before refining the separation vectors")
+
+        key = self._stage_key('refine', self._stage_keys.get('ica'), max_iter=max_iter,
+                              min_spikes=min_spikes, keep_best=keep_best)
+        self._stage_keys = {'preprocess': self._stage_keys.get('preprocess'), 'ica': key}
+        cached = self.cache.load(key) if key is not None else None
+
+        with stage(self.profiler, 'refinement', sources=self._raw_B.shape[1]) as record:
+            record['cached'] = cached is not None
+            if cached is not None:
+                self._raw_source, self._raw_B = cached['source'], cached['B']
+                self._raw_spike_train = _read_spike_train(cached)
+            else:
+                self._raw_source, self._raw_B, self._raw_spike_train = refine_separation(
+                    self._preprocessed, self._raw_B, self._raw_spike_train, self._raw_source,
+                    max_iter=max_iter, min_spikes=min_spikes, keep_best=keep_best, profiler=self.profiler)
+        self.source = self.spike_train = self.good_idx = self.sil_score = None
+
+        if cached is None and key is not None:
+            self.cache.save(key, source=self._raw_source, B=self._raw_B,
+                            **_spike_train_fields(self._raw_spike_train))
+        return self
+
     def remove_duplicates(self, min_firing_rate=4, max_firing_rate=35,
-                         max_duplicate_time_diff=0.01, num_bins=50):
+                         max_duplicate_time_diff=0.01, num_bins=50, method='histogram',
+                         roa_threshold=0.3, tolerance=0.0005, max_lag=0.01):
         """
         Remove duplicate motor units from the decomposition results.
 
@@ -185,6 +525,18 @@ class EMG:
             Maximum time difference for duplicates. Default = 0.01
         num_bins : int, optional
             Number of histogram bins. Default = 100
+        method : str, optional
+            Duplicate detector: 'histogram' (cosine distance of spike-time histograms)
+            or 'spike_times' (rate of agreement of the spike times). Default = 'histogram'
+        roa_threshold : float, optional
+            Rate of agreement above which two units are duplicates ('spike_times').
+            Default = 0.3
+        tolerance : float, optional
+            Largest spike time difference in seconds counted as a match
+            ('spike_times'). Default = 0.0005
+        max_lag : float, optional
+            Largest lag in seconds between duplicate units ('spike_times').
+            Default = 0.01
 
         Returns
         -------
@@ -194,24 +546,52 @@ class EMG:
         if self._raw_spike_train is None or self._raw_source is None:
             raise ValueError("ICA must be run before removing duplicates")
 
-        self.spike_train, self.source, self.good_idx = remove_duplicates(
-            self._raw_spike_train, self._raw_source, self.sampling_frequency,
-            min_firing_rate, max_firing_rate, max_duplicate_time_diff, num_bins)
+        key = self._stage_key(
+            'duplicates', self._stage_keys.get('ica'), sampling_frequency=self.sampling_frequency,
+            min_firing_rate=min_firing_rate, max_firing_rate=max_firing_rate,
+            max_duplicate_time_diff=max_duplicate_time_diff, num_bins=num_bins, method=method,
+            roa_threshold=roa_threshold, tolerance=tolerance, max_lag=max_lag)
+        self._stage_keys['duplicates'] = key
+        self._stage_keys.pop('scores', None)
+        cached = self.cache.load(key) if key is not None else None
+
+        with stage(self.profiler, 'duplicate_removal') as record:
+            record['cached'] = cached is not None
+            if cached is not None:
+                self.good_idx = cached['good_idx']
+                self.spike_train = _read_spike_train(cached)
+                self.source = self._raw_source[:, self.good_idx]
+                return self
 
+            self.spike_train, self.source, self.good_idx = remove_duplicates(
+                self._raw_spike_train, self._raw_source, self.sampling_frequency,
+                min_firing_rate, max_firing_rate, max_duplicate_time_diff, num_bins, method=method,
+                roa_threshold=roa_threshold, tolerance=tolerance, max_lag=max_lag)
+
+        if key is not None:
+            self.cache.save(key, good_idx=self.good_idx, **_spike_train_fields(self.spike_train))
         return self
 
-    def compute_scores(self, max_samples=1000, load_path=None, save_path=None):
+    def compute_scores(self, max_samples=None, load_path=None, save_path=None, n_jobs=1, seed=None):
         """
         Compute silhouette scores for the motor units.
 
         Parameters
         ----------
         max_samples : int, optional
-            Maximum samples for score calculation. Default = 1000
+            Maximum number of peaks per unit for score calculation. Default = None
+            (all peaks)
         load_path : str, optional
             Path to load pre-computed scores
         save_path : str, optional
             Path to save computed scores
+        n_jobs : int, optional
+            Number of worker processes for scoring; -1 uses all cores. Workers are
+            spawned, so a script using n_jobs > 1 must call it under
+            ``if __name__ == '__main__':``. Default = 1
+        seed : int, optional
+            Seed of the per-unit peak subsampling, for reproducible scores.
+            Default = None
 
         Returns
         -------
@@ -228,14 +608,78 @@ class EMG:
         if self.spike_train is None or self.source is None:
             raise ValueError("Duplicates must be removed before computing scores")
 
-        self.sil_score = compute_silhouette_scores(
-            self.spike_train, self.source, max_samples)
+        # Subsampled scores are only reproducible (and cacheable) with a seed
+        key = None
+        if max_samples is None or seed is not None:
+            key = self._stage_key('scores', self._stage_keys.get('duplicates'),
+                                  max_samples=max_samples, seed=seed)
+        cached = self.cache.load(key) if key is not None else None
+
+        with stage(self.profiler, 'scoring', n_jobs=n_jobs) as record:
+            record['cached'] = cached is not None
+            if cached is not None:
+                self.sil_score = cached['silhouette_score']
+            else:
+                self.sil_score = compute_silhouette_scores(
+                    self.spike_train, self.source, max_samples, n_jobs=n_jobs, seed=seed)
+                if key is not None:
+                    self.cache.save(key, silhouette_score=self.sil_score)
 
         if save_path is not None:
             save_silhouette_scores(save_path, self.sil_score)
 
         return self
 
+    def create_stream(self, chunk_size=64, min_score=None):
+        """
+        Create a streaming decomposer from the decomposition of this (calibration) recording.
+
+        The separation vectors, the cached whitening transform and the delay embedding
+        are applied to incoming raw chunks, and spikes are detected with the amplitude
+        thresholds of the offline peak classification of the calibration sources.
+
+        Parameters
+        ----------
+        chunk_size : int, optional
+            Maximum number of samples per streamed chunk. Default = 64
+        min_score : float, optional
+            Only stream units whose silhouette score exceeds this value (requires
+            ``compute_scores``). Default = None (all units kept by ``remove_duplicates``,
+            or all ICA sources when duplicates have not been removed)
+
+        Returns
+        -------
+        StreamingDecomposer
+            The streaming decomposer; feed it chunks of shape (frames, channels)
+        """
+        if self._raw_B is None or self._raw_source is None:
+            raise ValueError("ICA must be run before creating a stream")
+
+        units = np.arange(self._raw_B.shape[1]) if self.good_idx is None else self.good_idx
+        if min_score is not None:
+            if self.sil_score is None:
+                raise ValueError("Scores must be computed to select units by min_score")
+            units = units[self.sil_score > min_score]
+        _, pks, counts = find_source_peaks(self._raw_source[:, units])
+        _, _, threshold, spike_is_upper = classify_peaks(pks, counts)
+
+        whitening_matrix = mean = None
+        if self.whiten_flag:
+            whitening_matrix = self.whitener.whitening_matrix(self.whiten_method)
+            mean = self.whitener.mean
+
+        channel_transform = None
+        if self.data_mode == "bipolar":
+            # emg[:, :-r] - emg[:, r:] as a (channels, channels - r) matrix
+            num_chan = min(self.data.shape)
+            r = self.array_shape[0]
+            channel_transform = np.eye(num_chan, num_chan - r) - np.eye(num_chan, num_chan - r, -r)
+
+        return StreamingDecomposer(
+            self._raw_B[:, units], self.extension_parameter, threshold, spike_is_upper,
+            whitening_matrix, mean, channel_transform, chunk_size, self.sampling_frequency,
+            dtype=self.dtype)
+
     def plot(self, plot_type='spike_train', min_score=0.93, **kwargs):
         """
         Plot the decomposition results.
@@ -251,19 +695,22 @@ class EMG:
 
         Returns
         -------
-        None
+        figure or None
+            The figure with ``show=False``; None when it is shown
         """
         if self.spike_train is None:
             raise ValueError("No spike train data available to plot")
+        # Imported here so that decompositions without plots do not load plotly/matplotlib
+        from ..visualization.plots import plot_spike_train, plot_waveforms
 
         if plot_type == 'spike_train':
-            plot_spike_train(
+            return plot_spike_train(
                 self.spike_train, self.sampling_frequency,
                 self.sil_score, min_score, **kwargs)
         elif plot_type == 'waveforms':
             if self.source is None:
                 raise ValueError("No source signals available to plot waveforms")
-            plot_waveforms(
+            return plot_waveforms(
                 self.source, self.spike_train, self.sampling_frequency,
                 silhouette_scores=self.sil_score, min_score=min_score, **kwargs)
         else:
@@ -301,6 +748,7 @@ class EMG:
             Returns the instance itself for method chaining
         """
         results = load_results(file_path)
+        self._stage_keys = {'preprocess': self._stage_keys.get('preprocess')}
         self.spike_train = results['spike_train']
         self.source = results['source']
         self.good_idx = results['good_idx']
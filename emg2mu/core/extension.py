@@ -0,0 +1,381 @@
+"""
+This module provides lazy (zero-copy) operators for the extended EMG matrix.
+
+The extended matrix stacks the recording with ``extension_parameter`` delayed copies of
+itself, so materialising it multiplies the memory of the recording by the extension
+factor. The operators below only keep the raw recording and expose the products the
+decomposition needs (``X @ w``, ``X.T @ v`` and the covariance statistics). They work
+on NumPy arrays as well as on torch tensors.
+
+Classes:
+    - ExtendedEMG: Delay-embedded view of a (frames, channels) recording
+    - WhitenedEMG: Whitened view of an extended recording, (X - mean) @ W.T
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def _zeros(ref, shape):
+    """Allocate zeros on the same backend, device and dtype as ``ref``."""
+    if hasattr(ref, 'new_zeros'):
+        return ref.new_zeros(shape)
+    return np.zeros(shape, dtype=ref.dtype)
+
+
+def _as_index(index, ref):
+    """Convert a NumPy index array for use on the backend of ``ref``."""
+    if hasattr(ref, 'new_zeros'):
+        import torch
+        return torch.as_tensor(index, device=ref.device)
+    return index
+
+
+class _EMGOperator:
+    """
+    Common interface of the lazy extended-EMG operators.
+
+    Subclasses implement ``_matmul`` (X @ V), ``_rmatmul`` (X.T @ V) and ``rows``.
+    """
+
+    ndim = 2
+
+    @property
+    def T(self):
+        """Transposed operator, supporting ``X.T @ v``."""
+        return _TransposedOperator(self)
+
+    def __matmul__(self, other):
+        if other.ndim == 1:
+            return self._matmul(other[:, None])[:, 0]
+        return self._matmul(other)
+
+    def __array__(self, dtype=None, copy=None):
+        array = self.toarray()
+        return array if dtype is None else array.astype(dtype, copy=False)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def toarray(self, chunk_size=65536):
+        """
+        Materialise the operator as a dense NumPy array.
+
+        Parameters
+        ----------
+        chunk_size : int, optional
+            Number of rows gathered at a time. Default = 65536
+
+        Returns
+        -------
+        numpy.ndarray
+            The dense matrix
+        """
+        out = np.empty(self.shape, dtype=self.dtype)
+        for start in range(0, self.shape[0], chunk_size):
+            stop = min(start + chunk_size, self.shape[0])
+            out[start:stop] = self.rows(np.arange(start, stop))
+        return out
+
+    def iter_chunks(self, chunk_size=65536):
+        """
+        Iterate over dense row blocks of the operator.
+
+        Parameters
+        ----------
+        chunk_size : int, optional
+            Number of rows per block. Default = 65536
+
+        Yields
+        ------
+        numpy.ndarray
+            Dense rows ``[start, start + chunk_size)``
+        """
+        for start in range(0, self.shape[0], chunk_size):
+            yield self.rows(np.arange(start, min(start + chunk_size, self.shape[0])))
+
+
+class _TransposedOperator:
+    """Transpose of a lazy extended-EMG operator."""
+
+    ndim = 2
+
+    def __init__(self, operator):
+        self._operator = operator
+
+    @property
+    def shape(self):
+        return self._operator.shape[::-1]
+
+    @property
+    def dtype(self):
+        return self._operator.dtype
+
+    @property
+    def T(self):
+        return self._operator
+
+    def __matmul__(self, other):
+        if other.ndim == 1:
+            return self._operator._rmatmul(other[:, None])[:, 0]
+        return self._operator._rmatmul(other)
+
+    def __array__(self, dtype=None, copy=None):
+        array = self._operator.toarray().T
+        return array if dtype is None else array.astype(dtype, copy=False)
+
+
+class ExtendedEMG(_EMGOperator):
+    """
+    Lazy delay-embedded (extended) EMG matrix.
+
+    Column block ``i`` (``i = 0 .. extension_parameter``) holds the recording delayed
+    by ``i`` samples and zero-padded at the start, i.e. the same matrix that the
+    dense extension step builds, without storing it.
+
+    Parameters
+    ----------
+    emg : numpy.ndarray or torch.Tensor
+        The recording with shape (frames, channels)
+    extension_parameter : int
+        Number of delayed copies appended to the recording
+    """
+
+    def __init__(self, emg, extension_parameter):
+        self.emg = emg
+        self.extension_parameter = extension_parameter
+
+    @property
+    def shape(self):
+        frames, num_chan = self.emg.shape
+        return frames, num_chan * (self.extension_parameter + 1)
+
+    @property
+    def dtype(self):
+        return self.emg.dtype
+
+    def _window_columns(self):
+        """Extended-matrix column of every entry of a flattened sliding window."""
+        num_chan = self.emg.shape[1]
+        lag = self.extension_parameter - np.arange(self.extension_parameter + 1)
+        columns = lag[np.newaxis, :] * num_chan + np.arange(num_chan)[:, np.newaxis]
+        return columns.ravel()
+
+    def _chunks(self):
+        """Yield (start, dense rows) blocks of the extended matrix past the zero padding.
+
+        The rows are gathered from a strided sliding-window view of the recording, in
+        window order (see ``_window_columns``), so each block feeds one dense GEMM.
+        """
+        frames, num_chan = self.emg.shape
+        n_lags = self.extension_parameter + 1
+        if frames < n_lags:
+            return
+        if hasattr(self.emg, 'unfold'):
+            windows = self.emg.unfold(0, n_lags, 1)
+        else:
+            windows = sliding_window_view(self.emg, n_lags, axis=0)
+        chunk_size = max(256, 2 ** 19 // (num_chan * n_lags))
+        for start in range(0, windows.shape[0], chunk_size):
+            block = windows[start:start + chunk_size].reshape(-1, num_chan * n_lags)
+            yield start + self.extension_parameter, block
+
+    def _matmul(self, V):
+        frames, num_chan = self.emg.shape
+        head = min(self.extension_parameter, frames)
+        out = _zeros(self.emg, (frames, V.shape[1]))
+        for i in range(head):
+            out[i:head] += self.emg[:head - i] @ V[num_chan * i:num_chan * (i + 1)]
+
+        V_windows = V[_as_index(self._window_columns(), V)]
+        for start, block in self._chunks():
+            out[start:start + block.shape[0]] = block @ V_windows
+        return out
+
+    def _rmatmul(self, V):
+        frames, num_chan = self.emg.shape
+        head = min(self.extension_parameter, frames)
+        out = _zeros(self.emg, (self.shape[1], V.shape[1]))
+        for i in range(head):
+            out[num_chan * i:num_chan * (i + 1)] += self.emg[:head - i].T @ V[i:head]
+
+        acc = _zeros(self.emg, (self.shape[1], V.shape[1]))
+        for start, block in self._chunks():
+            acc += block.T @ V[start:start + block.shape[0]]
+        out[_as_index(self._window_columns(), out)] += acc
+        return out
+
+    def rows(self, idx):
+        """
+        Gather rows of the extended matrix.
+
+        Parameters
+        ----------
+        idx : numpy.ndarray
+            Row (sample) indices
+
+        Returns
+        -------
+        numpy.ndarray
+            Dense rows of shape (len(idx), extended channels)
+        """
+        idx = np.asarray(idx)
+        blocks = []
+        for i in range(self.extension_parameter + 1):
+            delayed = idx - i
+            block = np.asarray(self.emg)[np.maximum(delayed, 0)]
+            block[delayed < 0] = 0
+            blocks.append(block)
+        return np.concatenate(blocks, axis=1)
+
+    def statistics(self, chunk_size=65536):
+        """
+        Exact sample count, column means and scatter matrix of the extended matrix.
+
+        The Gram matrix of the extended matrix is block-Toeplitz up to the zero
+        padding, so it is assembled from the ``extension_parameter + 1`` lagged
+        products of the recording (accumulated chunk-wise in float64) instead of
+        a product of the extended matrix with itself.
+
+        Parameters
+        ----------
+        chunk_size : int, optional
+            Number of samples processed at a time. Default = 65536
+
+        Returns
+        -------
+        tuple
+            (n_samples, mean, scatter)
+        """
+        emg = np.asarray(self.emg)
+        frames, num_chan = emg.shape
+        R = min(self.extension_parameter, frames - 1)
+        n_blocks = self.extension_parameter + 1
+
+        lagged = np.zeros((R + 1, num_chan, num_chan))
+        for start in range(0, frames, chunk_size):
+            stop = min(start + chunk_size, frames)
+            block = np.asarray(emg[max(start - R, 0):stop], dtype=np.float64)
+            offset = max(start - R, 0)
+            for d in range(R + 1):
+                first = max(start, d)
+                lagged[d] += block[first - offset:stop - offset].T @ \
+                    block[first - d - offset:stop - d - offset]
+
+        # Block (i, j), j >= i, is the lag j - i product minus the terms that the
+        # zero padding of block i cuts off at the end of the recording
+        gram = np.zeros((num_chan * n_blocks, num_chan * n_blocks))
+        for i in range(R + 1):
+            tail = np.asarray(emg[frames - i:], dtype=np.float64)
+            for j in range(i, R + 1):
+                d = j - i
+                G = lagged[d].copy()
+                if i > 0:
+                    G -= tail.T @ np.asarray(emg[frames - i - d:frames - d], dtype=np.float64)
+                gram[num_chan * i:num_chan * (i + 1), num_chan * j:num_chan * (j + 1)] = G
+                gram[num_chan * j:num_chan * (j + 1), num_chan * i:num_chan * (i + 1)] = G.T
+
+        mean = np.zeros(num_chan * n_blocks)
+        for i in range(R + 1):
+            mean[num_chan * i:num_chan * (i + 1)] = \
+                np.sum(emg[:frames - i], axis=0, dtype=np.float64) / frames
+        scatter = gram - frames * np.outer(mean, mean)
+        return frames, mean, scatter
+
+    def to_torch(self, device='cpu', dtype=None):
+        """
+        Return the same operator backed by a torch tensor.
+
+        Parameters
+        ----------
+        device : str, optional
+            PyTorch device. Default = 'cpu'
+        dtype : torch.dtype, optional
+            Tensor dtype. Default = None (keep the NumPy dtype)
+
+        Returns
+        -------
+        ExtendedEMG
+            Operator whose products run in torch
+        """
+        import torch
+        return ExtendedEMG(torch.as_tensor(np.asarray(self.emg), device=device, dtype=dtype),
+                           self.extension_parameter)
+
+
+class WhitenedEMG(_EMGOperator):
+    """
+    Lazy whitened view of an extended EMG operator, ``(X - mean) @ W.T``.
+
+    Parameters
+    ----------
+    operator : ExtendedEMG
+        The extended recording
+    W : numpy.ndarray or torch.Tensor
+        Whitening matrix of shape (output channels, extended channels)
+    mean : numpy.ndarray or torch.Tensor
+        Column means of the extended recording
+    """
+
+    def __init__(self, operator, W, mean):
+        self.operator = operator
+        self.W = W
+        self.mean = mean
+
+    @property
+    def shape(self):
+        return self.operator.shape[0], self.W.shape[0]
+
+    @property
+    def dtype(self):
+        return self.operator.dtype
+
+    def _matmul(self, V):
+        U = self.W.T @ V
+        out = self.operator._matmul(U)
+        out -= self.mean @ U
+        return out
+
+    def _rmatmul(self, V):
+        centered = self.operator._rmatmul(V)
+        centered -= self.mean[:, None] * V.sum(0)[None, :]
+        return self.W @ centered
+
+    def rows(self, idx):
+        """
+        Gather rows of the whitened matrix.
+
+        Parameters
+        ----------
+        idx : numpy.ndarray
+            Row (sample) indices
+
+        Returns
+        -------
+        numpy.ndarray
+            Dense rows of shape (len(idx), output channels)
+        """
+        return (self.operator.rows(idx) - np.asarray(self.mean)) @ np.asarray(self.W).T
+
+    def to_torch(self, device='cpu', dtype=None):
+        """
+        Return the same operator backed by torch tensors.
+
+        Parameters
+        ----------
+        device : str, optional
+            PyTorch device. Default = 'cpu'
+        dtype : torch.dtype, optional
+            Tensor dtype. Default = None (keep the NumPy dtype)
+
+        Returns
+        -------
+        WhitenedEMG
+            Operator whose products run in torch
+        """
+        import torch
+        operator = self.operator.to_torch(device, dtype)
+        dtype = operator.dtype
+        return WhitenedEMG(operator,
+                           torch.as_tensor(np.asarray(self.W), device=device, dtype=dtype),
+                           torch.as_tensor(np.asarray(self.mean), device=device, dtype=dtype))
@@ -1,30 +1,38 @@
 """
 This module provides ICA (Independent Component Analysis) implementations for EMG signal processing.
-Includes both standard CPU-based and PyTorch-accelerated implementations.
+Includes both standard CPU-based and PyTorch-accelerated implementations. PyTorch is
+imported by the functions that use it, so the NumPy implementations do not load it.
 """
 
 from tqdm import tqdm
 import numpy as np
-from scipy.signal import find_peaks
-from sklearn.cluster import KMeans
-import torch
-import torch.nn.functional as F
+from .extension import ExtendedEMG, WhitenedEMG
+from .convergence import ConvergenceController
+from .spike_train import SpikeTrain
+from ..detection.peak_classification import detect_spikes
+from ..utils.profiling import stage
 
 
-def fastICA(extended_emg, M, max_iter, tolerance=1e-5):
+def fastICA(extended_emg, M, max_iter, tolerance=1e-5, profiler=None, controller=None):
     """
     Run the ICA decomposition using standard CPU implementation.
 
     Parameters
     ----------
-    extended_emg : numpy.ndarray
-        The preprocessed extended EMG data
+    extended_emg : numpy.ndarray, ExtendedEMG or WhitenedEMG
+        The preprocessed extended EMG data, dense or as a lazy operator
     M : int
         Maximum number of sources being decomposed by (FAST) ICA
     max_iter : int
         Maximum iterations for the (FAST) ICA decomposition
     tolerance : float
         Convergence tolerance for ICA
+    profiler : Profiler, optional
+        Profiler recording every source with its iteration count. Default = None
+    controller : ConvergenceController, optional
+        Stopping rules for the iterations and the extraction; fewer than M sources are
+        returned when it stops the extraction early. Default = None (sign-invariant
+        convergence with ``tolerance``)
 
     Returns
     -------
@@ -32,59 +40,61 @@ def fastICA(extended_emg, M, max_iter, tolerance=1e-5):
         The uncleaned sources from the ICA decomposition
     B : numpy.ndarray
         The unmixing matrix
-    spike_train : numpy.ndarray
+    spike_train : SpikeTrain
         The uncleaned spike train
     """
-    emg = extended_emg.T
-    num_chan, frames = emg.shape
-    B = np.zeros((num_chan, M))
-    spike_train = np.zeros((frames, M))
-    source = np.zeros((frames, M))
+    frames, num_chan = extended_emg.shape
+    dtype = _float_dtype(extended_emg)
+    B = np.zeros((num_chan, M), dtype=dtype)
+    source = np.zeros((frames, M), dtype=dtype)
+    controller = (ConvergenceController(tolerance) if controller is None else controller).start()
     print(f"Running ICA for {M} sources...")
 
     pbar = tqdm(range(M), desc="Processing sources", unit="source")
     for i in pbar:
-        w = []
-        w.append(np.random.randn(num_chan, 1))
-        w.append(np.random.randn(num_chan, 1))
-
-        for n in range(1, max_iter):
-            if abs(np.dot(w[n].T, w[n - 1]) - 1) > tolerance:
-                A = np.mean(2 * np.dot(w[n].T, emg))
-                w.append(emg @ ((np.dot(w[n].T, emg).T) ** 2) - A * w[n])
+        with stage(profiler, 'ica_source', source=i) as record:
+            controller.start_source()
+            w = []
+            w.append(np.random.randn(num_chan, 1).astype(dtype, copy=False))
+            w.append(np.random.randn(num_chan, 1).astype(dtype, copy=False))
+
+            for n in range(1, max_iter):
+                if controller.should_stop((w[n].T @ w[n - 1]).item()):
+                    break
+                s = extended_emg @ w[n]
+                A = np.mean(2 * s)
+                w.append(extended_emg.T @ (s ** 2) - A * w[n])
                 w[-1] = w[-1] - np.dot(np.dot(B, B.T), w[-1])
                 w[-1] = w[-1] / np.linalg.norm(w[-1])
-            else:
-                break
-
-        source[:, i] = np.dot(w[-1].T, emg)
-        pow = np.power(source[:, i], 2)
-        loc, _ = find_peaks(pow)
-        pks = pow[loc]
-        kmeans = KMeans(n_clusters=2, n_init=10).fit(pks.reshape(-1, 1))
-        idx = kmeans.labels_
-
-        if sum(idx == 0) <= sum(idx == 1):
-            spike_loc = loc[idx == 0]
-        else:
-            spike_loc = loc[idx == 1]
 
-        spike_train[spike_loc, i] = 1
-        B[:, i] = w[-1].flatten()
+            source[:, i] = (extended_emg @ w[-1])[:, 0]
+            B[:, i] = w[-1].flatten()
+            record.update(iterations=controller.iterations[-1], status=controller.source_status[-1])
         pbar.set_postfix({"source": f"{i+1}/{M}"})
+        controller.accept(source[:, i])
+        if controller.exhausted:
+            source, B = source[:, :i + 1], B[:, :i + 1]
+            print(f"Stopped after {i + 1} sources ({controller.termination})")
+            break
+
+    spike_train = SpikeTrain.from_units(detect_spikes(source, profiler=profiler), frames)
 
     print("ICA decomposition completed")
     return source, B, spike_train
 
 
-def torch_fastICA(extended_emg, M, max_iter, tolerance=1e-5, device='cuda'):
+def torch_fastICA(extended_emg, M, max_iter, tolerance=1e-5, device='cuda', batch_size=1,
+                  profiler=None, controller=None):
     """
     Run the ICA decomposition using PyTorch for GPU acceleration.
 
+    With ``batch_size > 1`` the deflation advances ``batch_size`` candidate vectors at
+    once as a single ``(num_chan, batch_size)`` tensor (see ``_torch_batched_deflation``).
+
     Parameters
     ----------
-    extended_emg : numpy.ndarray
-        The preprocessed extended EMG data
+    extended_emg : numpy.ndarray, ExtendedEMG or WhitenedEMG
+        The preprocessed extended EMG data, dense or as a lazy operator
     M : int
         Maximum number of sources being decomposed by (FAST) ICA
     max_iter : int
@@ -93,6 +103,14 @@ def torch_fastICA(extended_emg, M, max_iter, tolerance=1e-5, device='cuda'):
         Convergence tolerance for ICA
     device : str
         PyTorch device to use ('cuda', 'mps', or 'cpu')
+    batch_size : int
+        Number of candidate vectors advanced concurrently. Default = 1 (one at a time)
+    profiler : Profiler, optional
+        Profiler recording every source (or block) with its iteration count. Default = None
+    controller : ConvergenceController, optional
+        Stopping rules for the iterations and the extraction (one source at a time
+        only); fewer than M sources are returned when it stops the extraction early.
+        Default = None (sign-invariant convergence with ``tolerance``)
 
     Returns
     -------
@@ -100,49 +118,268 @@ def torch_fastICA(extended_emg, M, max_iter, tolerance=1e-5, device='cuda'):
         The uncleaned sources from the ICA decomposition
     B : numpy.ndarray
         The unmixing matrix
-    spike_train : numpy.ndarray
+    spike_train : SpikeTrain
         The uncleaned spike train
     """
-    emg = torch.tensor(extended_emg.T, dtype=torch.float32, device=device)
-    num_chan, frames = emg.shape
+    import torch
+    import torch.nn.functional as F
+
+    if batch_size > 1 and controller is not None:
+        raise ValueError("A convergence controller requires batch_size=1")
+    if isinstance(extended_emg, (ExtendedEMG, WhitenedEMG)):
+        X = extended_emg.to_torch(device, torch.float32)
+    else:
+        X = torch.as_tensor(extended_emg, dtype=torch.float32, device=device)
+    frames, num_chan = X.shape
     B = torch.zeros((num_chan, M), dtype=torch.float32, device=device)
-    spike_train = torch.zeros((frames, M), dtype=torch.float32, device=device)
     source = torch.zeros((frames, M), dtype=torch.float32, device=device)
 
     print(f"Running ICA for {M} sources...")
+    if batch_size > 1:
+        _torch_batched_deflation(X, B, max_iter, tolerance, batch_size, profiler)
+        source = (X @ B).cpu().numpy()
+        spike_train = SpikeTrain.from_units(detect_spikes(source, profiler=profiler), frames)
+        print("ICA decomposition completed")
+        return source, B.cpu().numpy(), spike_train
+
+    controller = (ConvergenceController(tolerance) if controller is None else controller).start()
     pbar = tqdm(range(M), desc="Processing sources", unit="source")
     for i in pbar:
-        w = []
-        w.append(torch.randn(num_chan, 1, device=device, dtype=torch.float32))
-        w.append(torch.randn(num_chan, 1, device=device, dtype=torch.float32))
-
-        for n in range(1, max_iter):
-            if abs(torch.matmul(w[n].T, w[n - 1]) - 1) > tolerance:
-                A = torch.mean(2 * torch.matmul(w[n].T, emg))
-                w.append(emg @ ((torch.matmul(w[n].T, emg).T) ** 2) - A * w[n])
+        with stage(profiler, 'ica_source', source=i) as record:
+            controller.start_source()
+            w = []
+            w.append(torch.randn(num_chan, 1, device=device, dtype=torch.float32))
+            w.append(torch.randn(num_chan, 1, device=device, dtype=torch.float32))
+
+            for n in range(1, max_iter):
+                if controller.should_stop(torch.matmul(w[n].T, w[n - 1]).item()):
+                    break
+                s = X @ w[n]
+                A = torch.mean(2 * s)
+                w.append(X.T @ (s ** 2) - A * w[n])
                 w[-1] = w[-1] - torch.matmul(torch.matmul(B, B.T), w[-1])
                 w[-1] = F.normalize(w[-1], p=2, dim=0)
-            else:
-                break
-
-        source[:, i] = torch.matmul(w[-1].T, emg)
-        pow = torch.pow(source[:, i], 2)
-        loc, _ = find_peaks(pow.cpu().numpy())
-        pks = pow[loc].cpu().numpy()
-        kmeans = KMeans(n_clusters=2, n_init=10).fit(pks.reshape(-1, 1))
-        idx = kmeans.labels_
-
-        if sum(idx == 1) <= sum(idx == 0):
-            spike_loc = loc[idx == 1]
-        else:
-            spike_loc = loc[idx == 0]
 
-        spike_train[spike_loc, i] = 1
-        B[:, i] = w[-1].flatten()
+            source[:, i] = (X @ w[-1])[:, 0]
+            B[:, i] = w[-1].flatten()
+            record.update(iterations=controller.iterations[-1], status=controller.source_status[-1])
         pbar.set_postfix({"source": f"{i+1}/{M}"})
+        controller.accept(source[:, i].cpu().numpy())
+        if controller.exhausted:
+            source, B = source[:, :i + 1], B[:, :i + 1]
+            print(f"Stopped after {i + 1} sources ({controller.termination})")
+            break
+
+    source = source.cpu().numpy()
+    spike_train = SpikeTrain.from_units(detect_spikes(source, profiler=profiler), frames)
+
+    print("ICA decomposition completed")
+    return source, B.cpu().numpy(), spike_train
+
+
+def _torch_batched_deflation(X, B, max_iter, tolerance, batch_size, profiler=None):
+    """
+    Fill the unmixing matrix B by deflation, advancing a block of candidates at a time.
+
+    Every candidate in a block is orthogonalised against the vectors already in B and
+    iterated with the same fixed-point update and sign-invariant stopping rule as
+    ``torch_fastICA``; the candidates of a block are decorrelated symmetrically, as in
+    ``symmetric_fastICA``, so that they do not converge to the same source. Converged
+    columns leave the block and deflate the ones still moving, so every iteration only
+    multiplies the data with the columns that are still moving. The
+    converged block is ordered by contrast and Gram-Schmidt orthogonalised (QR) before
+    being appended to B; candidates that drifted towards a stronger one in the same
+    block are discarded instead of producing duplicate vectors.
+
+    Parameters
+    ----------
+    X : torch.Tensor or WhitenedEMG
+        The extended EMG data of shape (frames, num_chan)
+    B : torch.Tensor
+        The unmixing matrix of shape (num_chan, M), filled in place
+    max_iter : int
+        Maximum iterations for each block
+    tolerance : float
+        Convergence tolerance for ICA
+    batch_size : int
+        Number of candidate vectors advanced concurrently
+    profiler : Profiler, optional
+        Profiler recording every block with its iteration count. Default = None
+
+    Returns
+    -------
+    torch.Tensor
+        The filled unmixing matrix B
+    """
+    import torch
+    import torch.nn.functional as F
+
+    num_chan, M = B.shape
+    if M > num_chan:
+        raise ValueError(f"Batched deflation can extract at most {num_chan} sources, got M={M}")
+    found = 0
+    pbar = tqdm(total=M, desc="Processing sources", unit="source")
+    while found < M:
+        with stage(profiler, 'ica_block', first_source=found) as record:
+            K = min(batch_size, M - found, num_chan - found)
+            B_prev = B[:, :found]
+            W = torch.randn(num_chan, K, device=B.device, dtype=B.dtype)
+            W = F.normalize(W - torch.matmul(B_prev, torch.matmul(B_prev.T, W)), p=2, dim=0)
+            active = torch.arange(K, device=B.device)
+            deflation = B_prev
+
+            iterations = source_iterations = 0
+            for iterations in range(1, max_iter):
+                W_active = W[:, active]
+                S = X @ W_active
+                A = torch.mean(2 * S, dim=0)
+                W_new = X.T @ (S ** 2) - A * W_active
+                W_new = W_new - torch.matmul(deflation, torch.matmul(deflation.T, W_new))
+                # Symmetric decorrelation keeps the candidates from converging to the same source
+                eigenvalues, eigenvectors = torch.linalg.eigh(W_new.T @ W_new)
+                W_new = W_new @ (eigenvectors * torch.rsqrt(torch.clamp(eigenvalues, min=1e-12))) \
+                    @ eigenvectors.T
+                # Same sign-invariant rule as ConvergenceController.should_stop
+                change = torch.abs(torch.abs(torch.sum(W_new * W_active, dim=0)) - 1)
+                W[:, active] = W_new
+                source_iterations += len(active)
+                moving = change > tolerance
+                if not bool(moving.all()):
+                    active = active[moving]
+                    if len(active) == 0:
+                        break
+                    # As in the serial deflation, the candidates still moving are deflated
+                    # against those that converged
+                    done = torch.ones(K, dtype=torch.bool, device=B.device)
+                    done[active] = False
+                    Q, R = torch.linalg.qr(W[:, done])
+                    deflation = torch.cat([B_prev, Q[:, torch.abs(torch.diagonal(R)) > 0.1]], dim=1)
+
+            # Strongest candidates keep their direction when orthogonalising within the block;
+            # candidates that collapsed onto a stronger one are dropped and re-drawn next round
+            contrast = torch.abs(torch.mean((X @ W) ** 3, dim=0))
+            W = W[:, torch.argsort(contrast, descending=True)]
+            Q, R = torch.linalg.qr(W)
+            keep = torch.abs(torch.diagonal(R)) > 0.1
+            keep[0] = True
+            Q = Q[:, keep] * torch.sign(torch.diagonal(R)[keep])
+            # Second orthogonalisation pass against B for numerical stability in float32
+            Q = Q - torch.matmul(B_prev, torch.matmul(B_prev.T, Q))
+            Q, _ = torch.linalg.qr(Q)
+            K = Q.shape[1]
+            B[:, found:found + K] = Q
+            found += K
+            record.update(iterations=iterations, source_iterations=source_iterations, sources=K)
+        pbar.update(K)
+
+    pbar.close()
+    return B
+
+
+def symmetric_fastICA(extended_emg, M, max_iter, tolerance=1e-5, block_size=None, profiler=None,
+                      controller=None):
+    """
+    Run the ICA decomposition using the symmetric (parallel) FastICA update.
+
+    Instead of extracting the sources one at a time, a block of unmixing vectors is
+    updated together with one matrix-matrix product per iteration and then jointly
+    decorrelated. Successive blocks are deflated against the vectors found before them.
+
+    Parameters
+    ----------
+    extended_emg : numpy.ndarray, ExtendedEMG or WhitenedEMG
+        The preprocessed extended EMG data, dense or as a lazy operator
+    M : int
+        Maximum number of sources being decomposed by (FAST) ICA
+    max_iter : int
+        Maximum iterations for the (FAST) ICA decomposition
+    tolerance : float
+        Convergence tolerance for ICA
+    block_size : int, optional
+        Number of unmixing vectors updated together. Every block iterates until its
+        slowest vector converges, so small blocks lose the speed-up of the matrix
+        products and can be slower than ``fastICA``; use None or blocks of a large part
+        of M, and small blocks only to bound the memory of the block products.
+        Default = None (all M at once)
+    profiler : Profiler, optional
+        Profiler recording every block with its iteration count. Default = None
+    controller : ConvergenceController, optional
+        Stopping rules for the iterations (of whole blocks) and the extraction; fewer
+        than M sources are returned when it stops the extraction early. Default = None
+        (sign-invariant convergence with ``tolerance``)
+
+    Returns
+    -------
+    source : numpy.ndarray
+        The uncleaned sources from the ICA decomposition
+    B : numpy.ndarray
+        The unmixing matrix
+    spike_train : SpikeTrain
+        The uncleaned spike train
+    """
+    frames, num_chan = extended_emg.shape
+    if M > num_chan:
+        raise ValueError(f"Symmetric FastICA can extract at most {num_chan} sources, got M={M}")
+    block_size = M if block_size is None else max(1, min(block_size, M))
+
+    dtype = _float_dtype(extended_emg)
+    B = np.zeros((num_chan, M), dtype=dtype)
+    spike_locs = []
+    source = np.zeros((frames, M), dtype=dtype)
+    controller = (ConvergenceController(tolerance) if controller is None else controller).start()
+    print(f"Running symmetric ICA for {M} sources in blocks of {block_size}...")
+
+    pbar = tqdm(range(0, M, block_size), desc="Processing blocks", unit="block")
+    for start in pbar:
+        stop = min(start + block_size, M)
+        with stage(profiler, 'ica_block', first_source=start, sources=stop - start) as record:
+            B_prev = B[:, :start]
+            W = np.random.randn(num_chan, stop - start).astype(dtype, copy=False)
+            W -= B_prev @ (B_prev.T @ W)
+            W = _symmetric_decorrelation(W)
+
+            controller.start_source()
+            dot = 0.0  # the random start has not converged
+            for _ in range(max_iter):
+                if controller.should_stop(dot):
+                    break
+                S = extended_emg @ W
+                W_new = extended_emg.T @ (S ** 2) / frames - W * np.mean(2 * S, axis=0)
+                W_new -= B_prev @ (B_prev.T @ W_new)
+                W_new = _symmetric_decorrelation(W_new)
+                dot = np.min(np.abs(np.sum(W_new * W, axis=0)))
+                W = W_new
+
+            B[:, start:stop] = W
+            source[:, start:stop] = extended_emg @ W
+            record.update(iterations=controller.iterations[-1], status=controller.source_status[-1])
+        spike_locs.extend(detect_spikes(source[:, start:stop], profiler=profiler))
+        pbar.set_postfix({"source": f"{stop}/{M}"})
+        for i in range(start, stop):
+            controller.accept(source[:, i])
+        if controller.exhausted:
+            source, B = source[:, :stop], B[:, :stop]
+            print(f"Stopped after {stop} sources ({controller.termination})")
+            break
 
     print("ICA decomposition completed")
-    return source.cpu().numpy(), B.cpu().numpy(), spike_train.cpu().numpy()
+    return source, B, SpikeTrain.from_units(spike_locs, frames)
+
+
+def _float_dtype(X):
+    """
+    Floating-point type of the ICA buffers: float32 data stays in float32.
+    """
+    return X.dtype if np.issubdtype(X.dtype, np.floating) else np.float64
+
+
+def _symmetric_decorrelation(W):
+    """
+    Symmetrically decorrelate the columns of W, i.e. W <- W (W^T W)^(-1/2).
+    """
+    s, u = np.linalg.eigh(W.T @ W)
+    s = np.clip(s, np.finfo(W.dtype).tiny, None)
+    return W @ (u * (1.0 / np.sqrt(s))) @ u.T
 
 
 def select_device(device_preference='auto'):
@@ -159,6 +396,10 @@ def select_device(device_preference='auto'):
     str
         The selected device string for torch
     """
+    if device_preference == 'cpu':
+        return 'cpu'
+    import torch
+
     if device_preference != 'auto':
         # Check for specific device and return if available, else fallback, recall select_device with 'auto'
         if device_preference == 'cuda':
@@ -4,13 +4,18 @@ This module provides preprocessing functions for EMG signal processing.
 Functions:
     - awgn: Add white Gaussian noise to a signal
     - whiten: Whiten a matrix using various methods
+
+Classes:
+    - Whitener: Whitening transform fitted from streaming mean/covariance statistics
 """
 
 import numpy as np
 import warnings
+from scipy.sparse.linalg import eigsh
+from .extension import ExtendedEMG, WhitenedEMG
 
 
-def awgn(sig, reqSNR, *args):
+def awgn(sig, reqSNR, *args, seed=None):
     """
     Add white Gaussian noise to a signal.
 
@@ -26,11 +31,14 @@ def awgn(sig, reqSNR, *args):
         or the string 'measured' to indicate that the function should measure the signal power.
         If a scalar is provided, the second argument (optional) must be either 'db' or 'linear'
         to specify the units of the signal power and SNR. If not specified, the default is 'db'.
+    seed : int, optional
+        Seed of the noise generator, for reproducible noise. Default = None (use the
+        global NumPy random state)
 
     Returns
     -------
     y : numpy.ndarray
-        The noisy signal.
+        The noisy signal, with the floating-point type of a floating-point input.
 
     Raises
     ------
@@ -92,57 +100,340 @@ def awgn(sig, reqSNR, *args):
     noisePower = sigPower / reqSNR
 
     # Add noise
+    rng = np.random if seed is None else np.random.default_rng(seed)
     if np.iscomplexobj(sig):
-        noise = np.sqrt(noisePower / 2) * (np.random.randn(*sig.shape) + 1j * np.random.randn(*sig.shape))
+        noise = np.sqrt(noisePower / 2) * (rng.standard_normal(sig.shape) + 1j * rng.standard_normal(sig.shape))
     else:
-        noise = np.sqrt(noisePower) * np.random.randn(*sig.shape)
+        noise = np.sqrt(noisePower) * rng.standard_normal(sig.shape)
+    if np.issubdtype(sig.dtype, np.inexact):
+        noise = noise.astype(sig.dtype, copy=False)
     y = sig + noise
     return y
 
 
-def whiten(X, method='zca'):
+WHITEN_METHODS = ['zca', 'zca_cor', 'pca', 'pca_cor', 'cholesky']
+WHITEN_SOLVERS = ['eigh', 'eigsh', 'randomized']
+
+
+class Whitener:
+    """
+    Whitening transform estimated from incrementally accumulated statistics.
+
+    The mean and covariance are accumulated chunk by chunk with the pairwise update
+    of Chan et al., so recordings can be fitted without holding a centred copy in
+    memory. The eigendecomposition of the covariance and the whitening matrix of every
+    method are cached, so switching methods or transforming further chunks (or other
+    sessions from the same electrode grid) does not recompute them.
+
+    With ``n_components``, the 'pca' and 'pca_cor' methods keep only the leading
+    principal components, so the whitened data and the ICA that follows live in a
+    smaller space. The 'eigsh' and 'randomized' solvers compute only those components
+    instead of the full eigendecomposition.
+
+    Parameters
+    ----------
+    method : str, optional
+        Whitening method. Must be one of 'zca', 'zca_cor', 'pca', 'pca_cor', or
+        'cholesky'. Default = 'zca'
+    eps : float, optional
+        Regularisation added to the eigenvalues. Default = 1e-5
+    chunk_size : int, optional
+        Number of samples processed at a time by ``fit`` and ``transform``.
+        Default = 65536
+    n_components : int or float, optional
+        Number of principal components to keep, or the fraction of the variance they
+        must explain when a float in (0, 1). Default = None (keep all components)
+    solver : str, optional
+        Eigensolver of the truncated decomposition: 'eigh' (full decomposition, then
+        truncated), 'eigsh' (Lanczos) or 'randomized' (randomized range finder).
+        Default = 'eigh'
+    seed : int, optional
+        Seed of the starting vectors of the 'eigsh' and 'randomized' solvers. Default = 0
+
+    Attributes
+    ----------
+    n_samples : int
+        Number of samples accumulated so far
+    mean : numpy.ndarray
+        Running mean of the data (float64)
+    """
+
+    def __init__(self, method='zca', eps=1e-5, chunk_size=65536, n_components=None, solver='eigh', seed=0):
+        if solver not in WHITEN_SOLVERS:
+            raise ValueError(f"solver must be one of {WHITEN_SOLVERS}, got {solver!r}")
+        if n_components is not None and not (
+                (isinstance(n_components, (int, np.integer)) and n_components >= 1)
+                or (isinstance(n_components, float) and 0 < n_components < 1)):
+            raise ValueError("n_components must be a positive integer or a fraction in (0, 1)")
+        self.method = method
+        self.eps = eps
+        self.chunk_size = chunk_size
+        self.n_components = n_components
+        self.solver = solver
+        self.seed = seed
+        self.n_samples = 0
+        self.mean = None
+        self._scatter = None
+        self._cache = {}
+
+    @property
+    def covariance(self):
+        """Population covariance of the accumulated data (float64)."""
+        if self.n_samples == 0:
+            raise ValueError("Whitener has not been fitted")
+        return self._scatter / self.n_samples
+
+    def partial_fit(self, X):
+        """
+        Update the mean and covariance with a chunk of data.
+
+        Parameters
+        ----------
+        X : numpy.ndarray
+            Data chunk with data examples along the first dimension
+
+        Returns
+        -------
+        self
+            Returns the instance itself for method chaining
+        """
+        X = X.reshape((-1, np.prod(X.shape[1:], dtype=int)))
+        n_chunk = X.shape[0]
+        if n_chunk == 0:
+            return self
+        chunk_mean = np.mean(X, axis=0, dtype=np.float64)
+        X_centered = np.asarray(X, dtype=np.float64) - chunk_mean
+        chunk_scatter = np.dot(X_centered.T, X_centered)
+
+        if self.n_samples == 0:
+            self.mean = chunk_mean
+            self._scatter = chunk_scatter
+        else:
+            n_total = self.n_samples + n_chunk
+            delta = chunk_mean - self.mean
+            self.mean = self.mean + delta * (n_chunk / n_total)
+            self._scatter = self._scatter + chunk_scatter + \
+                np.outer(delta, delta) * (self.n_samples * n_chunk / n_total)
+        self.n_samples += n_chunk
+        self._cache.clear()
+        return self
+
+    def fit(self, X):
+        """
+        Estimate the mean and covariance of X, chunk by chunk.
+
+        Parameters
+        ----------
+        X : numpy.ndarray or ExtendedEMG
+            Input data matrix with data examples along the first dimension. The exact
+            statistics of a lazy ExtendedEMG are computed without materialising it.
+
+        Returns
+        -------
+        self
+            Returns the instance itself for method chaining
+        """
+        self.n_samples = 0
+        self.mean = None
+        self._scatter = None
+        self._cache.clear()
+        if isinstance(X, ExtendedEMG):
+            self.n_samples, self.mean, self._scatter = X.statistics(self.chunk_size)
+            return self
+        for start in range(0, X.shape[0], self.chunk_size):
+            self.partial_fit(X[start:start + self.chunk_size])
+        return self
+
+    def _matrix(self, kind):
+        """Covariance ('cov') or correlation ('cor') matrix."""
+        Sigma = self.covariance
+        if kind == 'cor':
+            std = np.sqrt(np.diag(Sigma))
+            Sigma = Sigma / np.outer(std, std)
+        return Sigma
+
+    def _eigh(self, kind):
+        """Cached eigendecomposition (descending order) of the covariance or correlation."""
+        if kind not in self._cache:
+            eigval, eigvec = np.linalg.eigh(self._matrix(kind))
+            eigval = np.clip(eigval[::-1], 0, None)
+            self._cache[kind] = (eigvec[:, ::-1], eigval)
+        return self._cache[kind]
+
+    def _components(self, kind):
+        """
+        Cached leading eigenvectors and eigenvalues (descending order) kept by
+        ``n_components``, computed with ``solver``.
+        """
+        if self.n_components is None:
+            return self._eigh(kind)
+        key = ('components', kind)
+        if key in self._cache:
+            return self._cache[key]
+
+        Sigma = self._matrix(kind)
+        dim = Sigma.shape[0]
+        total = np.trace(Sigma)
+        if isinstance(self.n_components, float):
+            # Grow the number of computed components until they explain enough variance
+            k = min(dim, 32)
+            while True:
+                eigvec, eigval = self._leading(Sigma, k)
+                if np.sum(eigval) >= self.n_components * total or len(eigval) == dim:
+                    break
+                k = min(dim, 2 * k)
+            k = int(np.searchsorted(np.cumsum(eigval) / total, self.n_components)) + 1
+        else:
+            k = min(self.n_components, dim)
+            eigvec, eigval = self._leading(Sigma, k)
+
+        self._cache[key] = (eigvec[:, :k], eigval[:k])
+        return self._cache[key]
+
+    def _leading(self, Sigma, k):
+        """Leading eigenvectors and eigenvalues (descending order) of Sigma, at least k of them."""
+        dim = Sigma.shape[0]
+        # The partial solvers only pay off well below the full dimension
+        if self.solver == 'eigh' or 2 * k > dim:
+            eigval, eigvec = np.linalg.eigh(Sigma)
+        elif self.solver == 'eigsh':
+            v0 = np.random.default_rng(self.seed).standard_normal(dim)
+            eigval, eigvec = eigsh(Sigma, k, which='LA', v0=v0)
+        else:
+            # Randomized range finder with power iterations (Halko et al., 2011)
+            Q = np.random.default_rng(self.seed).standard_normal((dim, min(dim, k + 10)))
+            for _ in range(4):
+                Q, _ = np.linalg.qr(Sigma @ Q)
+            eigval, eigvec = np.linalg.eigh(Q.T @ Sigma @ Q)
+            eigvec = Q @ eigvec
+        order = np.argsort(eigval)[::-1]
+        return eigvec[:, order], np.clip(eigval[order], 0, None)
+
+    def whitening_matrix(self, method=None):
+        """
+        Return the (cached) whitening matrix W, such that X_hat = (X - mean) @ W.T.
+
+        Parameters
+        ----------
+        method : str, optional
+            Whitening method. Default = None (use ``self.method``)
+
+        Returns
+        -------
+        numpy.ndarray
+            The whitening matrix of shape (components, channels)
+        """
+        method = self.method if method is None else method
+        key = ('W', method)
+        if key in self._cache:
+            return self._cache[key]
+        if self.n_components is not None and method not in ['pca', 'pca_cor']:
+            raise ValueError("n_components reduces the dimension only with the 'pca' and "
+                             f"'pca_cor' methods, got {method!r}")
+
+        if method in ['zca', 'pca', 'cholesky']:
+            U, Lambda = self._components('cov')
+            if method == 'zca':
+                W = np.dot(U * (1.0 / np.sqrt(Lambda + self.eps)), U.T)
+            elif method == 'pca':
+                W = (U * (1.0 / np.sqrt(Lambda + self.eps))).T
+            else:
+                W = np.linalg.cholesky(np.dot(U * (1.0 / (Lambda + self.eps)), U.T)).T
+        elif method in ['zca_cor', 'pca_cor']:
+            G, Theta = self._components('cor')
+            inv_std = 1.0 / np.sqrt(np.diag(self.covariance))
+            if method == 'zca_cor':
+                W = np.dot(G * (1.0 / np.sqrt(Theta + self.eps)), G.T) * inv_std
+            else:
+                W = (G * (1.0 / np.sqrt(Theta + self.eps))).T * inv_std
+        else:
+            raise Exception('Whitening method not found.')
+
+        self._cache[key] = W
+        return W
+
+    def transform(self, X, method=None, out=None):
+        """
+        Whiten X chunk by chunk.
+
+        Parameters
+        ----------
+        X : numpy.ndarray or ExtendedEMG
+            Input data matrix with data examples along the first dimension
+        method : str, optional
+            Whitening method. Default = None (use ``self.method``)
+        out : numpy.ndarray, optional
+            Output array; may be X itself to whiten in place. Default = None
+
+        Returns
+        -------
+        numpy.ndarray
+            Whitened data matrix. For an ExtendedEMG input, a lazy WhitenedEMG view.
+        """
+        W = self.whitening_matrix(method)
+        if isinstance(X, ExtendedEMG):
+            return WhitenedEMG(X, W.astype(X.dtype, copy=False), self.mean.astype(X.dtype, copy=False))
+        X = X.reshape((-1, np.prod(X.shape[1:], dtype=int)))
+        dtype = X.dtype if np.issubdtype(X.dtype, np.floating) else np.float64
+        if out is None:
+            out = np.empty((X.shape[0], W.shape[0]), dtype=dtype)
+        W = W.astype(dtype, copy=False)
+        mean = self.mean.astype(dtype, copy=False)
+        for start in range(0, X.shape[0], self.chunk_size):
+            stop = start + self.chunk_size
+            out[start:stop] = np.dot(X[start:stop] - mean, W.T)
+        return out
+
+    def fit_transform(self, X, method=None, out=None):
+        """
+        Fit the whitener on X and whiten it.
+
+        Parameters
+        ----------
+        X : numpy.ndarray
+            Input data matrix with data examples along the first dimension
+        method : str, optional
+            Whitening method. Default = None (use ``self.method``)
+        out : numpy.ndarray, optional
+            Output array; may be X itself to whiten in place. Default = None
+
+        Returns
+        -------
+        numpy.ndarray
+            Whitened data matrix
+        """
+        return self.fit(X).transform(X, method=method, out=out)
+
+
+def whiten(X, method='zca', whitener=None, n_components=None, solver='eigh'):
     """
     Whitens the input matrix X using specified whitening method.
 
     Parameters
     ----------
-    X : numpy.ndarray
+    X : numpy.ndarray or ExtendedEMG
         Input data matrix with data examples along the first dimension
     method : str
         Whitening method. Must be one of 'zca', 'zca_cor', 'pca',
         'pca_cor', or 'cholesky'.
+    whitener : Whitener, optional
+        A fitted whitener to reuse instead of estimating the statistics of X
+    n_components : int or float, optional
+        Number of principal components to keep, or the fraction of the variance they
+        must explain (see ``Whitener``). Default = None (keep all components)
+    solver : str, optional
+        Eigensolver of the truncated decomposition ('eigh', 'eigsh' or 'randomized').
+        Default = 'eigh'
 
     Returns
     -------
-    X_hat : numpy.ndarray
-        Whitened data matrix
+    X_hat : numpy.ndarray or WhitenedEMG
+        Whitened data matrix (a lazy view for an ExtendedEMG input)
 
     References
     ----------
     https://gist.github.com/joelouismarino/ce239b5601fff2698895f48003f7464b
     """
-    X = X.reshape((-1, np.prod(X.shape[1:])))
-    X_centered = X - np.mean(X, axis=0)
-    Sigma = np.dot(X_centered.T, X_centered) / X_centered.shape[0]
-    W = None
-
-    if method in ['zca', 'pca', 'cholesky']:
-        U, Lambda, _ = np.linalg.svd(Sigma)
-        if method == 'zca':
-            W = np.dot(U, np.dot(np.diag(1.0 / np.sqrt(Lambda + 1e-5)), U.T))
-        elif method == 'pca':
-            W = np.dot(np.diag(1.0 / np.sqrt(Lambda + 1e-5)), U.T)
-        elif method == 'cholesky':
-            W = np.linalg.cholesky(np.dot(U, np.dot(np.diag(1.0 / (Lambda + 1e-5)), U.T))).T
-    elif method in ['zca_cor', 'pca_cor']:
-        V_sqrt = np.diag(np.std(X, axis=0))
-        P = np.dot(np.dot(np.linalg.inv(V_sqrt), Sigma), np.linalg.inv(V_sqrt))
-        G, Theta, _ = np.linalg.svd(P)
-        if method == 'zca_cor':
-            W = np.dot(np.dot(G, np.dot(np.diag(1.0 / np.sqrt(Theta + 1e-5)), G.T)), np.linalg.inv(V_sqrt))
-        elif method == 'pca_cor':
-            W = np.dot(np.dot(np.diag(1.0 / np.sqrt(Theta + 1e-5)), G.T), np.linalg.inv(V_sqrt))
-    else:
-        raise Exception('Whitening method not found.')
-
-    return np.dot(X_centered, W.T)
+    if whitener is None:
+        whitener = Whitener(method, n_components=n_components, solver=solver).fit(X)
+    return whitener.transform(X, method=method)
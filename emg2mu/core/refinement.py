@@ -0,0 +1,138 @@
+"""
+This module provides the fixed-point refinement of separation vectors after ICA.
+
+FastICA stops at the first separation vector that converges, which for weak units is
+often still contaminated by other units and noise. The refinement re-estimates every
+separation vector as the spike-triggered average of the whitened observations, i.e.
+the mean of the rows of the whitened extended EMG at the detected spike instants (the
+cumulant-kernel (CKC) update), projects the data through it and re-detects the spikes,
+until the spike instants stop changing.
+
+All units are refined together: the rows at the union of their spike instants are
+gathered once per iteration, averaged per unit with one sparse product, and projected
+with one dense product for all units that have not converged yet.
+
+Functions:
+    - refine_separation: Spike-triggered fixed-point refinement of separation vectors
+"""
+
+import numpy as np
+from scipy import sparse
+from .spike_train import SpikeTrain, as_spike_train
+from ..detection.peak_classification import detect_spikes
+from ..detection.duplicate_detection import compute_silhouette_scores
+from ..utils.profiling import stage
+
+
+def refine_separation(extended_emg, B, spike_train, source=None, max_iter=10, min_spikes=2,
+                      keep_best=True, profiler=None):
+    """
+    Refine separation vectors by spike-triggered averaging of the whitened data.
+
+    Parameters
+    ----------
+    extended_emg : numpy.ndarray, ExtendedEMG or WhitenedEMG
+        The preprocessed (whitened) extended EMG data the separation vectors apply to
+    B : numpy.ndarray
+        Separation vectors of shape (extended channels, units)
+    spike_train : SpikeTrain or numpy.ndarray
+        Spike train of the units
+    source : numpy.ndarray, optional
+        Sources of the units, ``extended_emg @ B``; only used with ``keep_best``.
+        Default = None (computed when needed)
+    max_iter : int, optional
+        Maximum number of refinement iterations. Default = 10
+    min_spikes : int, optional
+        Units with fewer spikes are left unchanged, and an update that leaves fewer
+        spikes is discarded. Default = 2
+    keep_best : bool, optional
+        Whether to keep the original separation vector of a unit whose silhouette
+        score is lowered by the refinement. Default = True
+    profiler : Profiler, optional
+        Profiler recording every iteration with its number of active units.
+        Default = None
+
+    Returns
+    -------
+    source : numpy.ndarray
+        The sources of the refined separation vectors
+    B : numpy.ndarray
+        The refined separation vectors
+    spike_train : SpikeTrain
+        The spike train of the refined sources
+    """
+    spike_train = as_spike_train(spike_train)
+    frames = extended_emg.shape[0]
+    B_initial = np.asarray(B)
+    B = B_initial.copy()
+    spikes = list(spike_train)
+    active = spike_train.counts >= min_spikes
+
+    refined = np.empty((frames, B.shape[1]), dtype=B.dtype)
+    updated = np.zeros(B.shape[1], dtype=bool)
+
+    for iteration in range(max_iter):
+        units = np.flatnonzero(active)
+        if len(units) == 0:
+            break
+        with stage(profiler, 'refine_iteration', iteration=iteration, units=len(units)):
+            W = _spike_triggered_average(extended_emg, [spikes[k] for k in units]).astype(B.dtype, copy=False)
+            # Keep the polarity of the sources
+            W *= np.where(np.sum(W * B[:, units], axis=0) < 0, -1, 1)
+            unit_source = extended_emg @ W
+            unit_spikes = detect_spikes(unit_source)
+
+            for i, k in enumerate(units):
+                if len(unit_spikes[i]) < min_spikes:
+                    active[k] = False
+                    continue
+                active[k] = not np.array_equal(unit_spikes[i], spikes[k])
+                B[:, k], refined[:, k], spikes[k] = W[:, i], unit_source[:, i], unit_spikes[i]
+                updated[k] = True
+
+    if not np.any(updated):
+        source = extended_emg @ B if source is None else np.asarray(source)
+        return source, B, spike_train
+
+    if source is None:
+        source = extended_emg @ B_initial
+    source = np.array(source, dtype=B.dtype)
+    refined_train = SpikeTrain.from_units(spikes, frames)
+    if keep_best:
+        units = np.flatnonzero(updated)
+        before = compute_silhouette_scores(spike_train.select(units), source[:, units])
+        after = compute_silhouette_scores(refined_train.select(units), refined[:, units])
+        worse = units[after < before]
+        updated[worse] = False
+        B[:, worse] = B_initial[:, worse]
+        for k in worse:
+            spikes[k] = spike_train.unit(k)
+        refined_train = SpikeTrain.from_units(spikes, frames)
+    source[:, updated] = refined[:, updated]
+    return source, B, refined_train
+
+
+def _spike_triggered_average(extended_emg, spikes):
+    """
+    Unit-norm mean of the rows of ``extended_emg`` at the spikes of every unit.
+
+    The rows at the union of all spike instants are gathered once and averaged per unit
+    with a sparse (units, spike instants) weight matrix.
+
+    Returns
+    -------
+    numpy.ndarray
+        Averages of shape (extended channels, units)
+    """
+    train = SpikeTrain.from_units(spikes, 0)
+    instants, columns = np.unique(train.indices, return_inverse=True)
+    if hasattr(extended_emg, 'rows'):
+        rows = extended_emg.rows(instants)
+    else:
+        rows = np.asarray(extended_emg)[instants]
+
+    weights = np.repeat(1.0 / np.maximum(train.counts, 1), train.counts)
+    averaging = sparse.csr_matrix((weights, columns.ravel(), train.indptr),
+                                  shape=(train.n_units, len(instants)))
+    W = np.asarray(averaging @ rows).T
+    return W / np.maximum(np.linalg.norm(W, axis=0), np.finfo(W.dtype).tiny)
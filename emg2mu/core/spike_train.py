@@ -0,0 +1,180 @@
+"""
+This module provides a compact spike-train representation for motor-unit results.
+
+A spike train is stored as the sorted spike sample indices of every unit, concatenated
+in a single int32 array with per-unit offsets (the CSR layout of a sparse
+``(frames, units)`` matrix). Dense 0/1 arrays are only built on demand.
+"""
+
+import numpy as np
+
+
+class SpikeTrain:
+    """
+    Sparse spike train of a set of motor units.
+
+    Parameters
+    ----------
+    indices : numpy.ndarray
+        Spike sample indices of all units, concatenated; sorted within every unit
+    indptr : numpy.ndarray
+        Offsets of every unit in ``indices``, of length n_units + 1
+    n_frames : int
+        Number of samples of the recording
+
+    Notes
+    -----
+    ``np.asarray(spike_train)`` returns the dense (frames, units) array, so code that
+    expects the dense layout keeps working.
+    """
+
+    def __init__(self, indices, indptr, n_frames):
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.n_frames = int(n_frames)
+
+    @classmethod
+    def from_dense(cls, dense):
+        """
+        Build a spike train from a dense (frames, units) array.
+
+        Parameters
+        ----------
+        dense : numpy.ndarray
+            Dense spike train; non-zero entries are spikes
+
+        Returns
+        -------
+        SpikeTrain
+            The sparse spike train
+        """
+        dense = np.asarray(dense)
+        if dense.ndim == 1:
+            dense = dense[:, np.newaxis]
+        unit, indices = np.nonzero(dense.T)
+        indptr = np.concatenate([[0], np.cumsum(np.bincount(unit, minlength=dense.shape[1]))])
+        return cls(indices, indptr, dense.shape[0])
+
+    @classmethod
+    def from_units(cls, spike_indices, n_frames):
+        """
+        Build a spike train from a list of per-unit spike index arrays.
+
+        Parameters
+        ----------
+        spike_indices : list of numpy.ndarray
+            Spike sample indices of every unit
+        n_frames : int
+            Number of samples of the recording
+
+        Returns
+        -------
+        SpikeTrain
+            The sparse spike train
+        """
+        spike_indices = [np.sort(np.asarray(idx, dtype=np.int64)) for idx in spike_indices]
+        counts = [len(idx) for idx in spike_indices]
+        indptr = np.concatenate([[0], np.cumsum(counts, dtype=np.int64)])
+        indices = np.concatenate(spike_indices) if spike_indices else np.zeros(0, dtype=np.int32)
+        return cls(indices, indptr, n_frames)
+
+    @property
+    def n_units(self):
+        """Number of units."""
+        return len(self.indptr) - 1
+
+    @property
+    def shape(self):
+        """Shape of the equivalent dense array, (frames, units)."""
+        return self.n_frames, self.n_units
+
+    @property
+    def counts(self):
+        """Number of spikes of every unit."""
+        return np.diff(self.indptr)
+
+    @property
+    def units(self):
+        """Unit index of every entry of ``indices``."""
+        return np.repeat(np.arange(self.n_units), self.counts)
+
+    def unit(self, k):
+        """
+        Spike sample indices of unit k.
+
+        Parameters
+        ----------
+        k : int
+            Unit index
+
+        Returns
+        -------
+        numpy.ndarray
+            Sorted spike sample indices
+        """
+        return self.indices[self.indptr[k]:self.indptr[k + 1]]
+
+    def __iter__(self):
+        for k in range(self.n_units):
+            yield self.unit(k)
+
+    def select(self, idx):
+        """
+        Return the spike train of a subset of units.
+
+        Parameters
+        ----------
+        idx : array-like
+            Unit indices or a boolean mask over the units
+
+        Returns
+        -------
+        SpikeTrain
+            Spike train of the selected units, in the given order
+        """
+        idx = np.arange(self.n_units)[np.asarray(idx)]
+        return SpikeTrain.from_units([self.unit(k) for k in np.atleast_1d(idx)], self.n_frames)
+
+    def to_dense(self, dtype=np.float64):
+        """
+        Export the spike train as a dense (frames, units) 0/1 array.
+
+        Parameters
+        ----------
+        dtype : numpy.dtype, optional
+            Data type of the dense array. Default = numpy.float64
+
+        Returns
+        -------
+        numpy.ndarray
+            The dense spike train
+        """
+        dense = np.zeros(self.shape, dtype=dtype)
+        dense[self.indices, self.units] = 1
+        return dense
+
+    def __array__(self, dtype=None, copy=None):
+        return self.to_dense(np.float64 if dtype is None else dtype)
+
+    def __repr__(self):
+        return (f"SpikeTrain(n_frames={self.n_frames}, n_units={self.n_units}, "
+                f"n_spikes={len(self.indices)})")
+
+
+def as_spike_train(spike_train):
+    """
+    Return ``spike_train`` as a SpikeTrain, converting dense arrays.
+
+    Parameters
+    ----------
+    spike_train : SpikeTrain or numpy.ndarray
+        Sparse or dense (frames, units) spike train
+
+    Returns
+    -------
+    SpikeTrain
+        The sparse spike train
+    """
+    if isinstance(spike_train, SpikeTrain):
+        return spike_train
+    return SpikeTrain.from_dense(spike_train)
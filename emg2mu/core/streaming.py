@@ -0,0 +1,182 @@
+"""
+This module provides a streaming (online) decomposition mode.
+
+A decomposition learned offline on a calibration segment is applied to incoming
+fixed-size chunks of raw EMG. The delay embedding, whitening and separation vectors
+are folded into a single projection, so each chunk costs one matrix product over a
+sliding-window view of the chunk and the last ``extension_parameter`` samples of the
+previous one. Spikes are the peaks of the squared sources that fall on the spike side
+of the amplitude threshold found by the offline peak classification.
+
+Classes:
+    - StreamingDecomposer: Applies a fitted decomposition to a stream of EMG chunks
+"""
+
+import time
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from .extension import ExtendedEMG
+
+
+class StreamingDecomposer:
+    """
+    Online motor-unit decomposition of fixed-size EMG chunks.
+
+    Parameters
+    ----------
+    B : numpy.ndarray
+        Separation vectors of shape (extended channels, units)
+    extension_parameter : int
+        Number of delayed copies used to build the extended EMG
+    threshold : numpy.ndarray
+        Squared-amplitude threshold separating spikes from noise peaks for each unit
+        (see ``classify_peaks``)
+    spike_is_upper : numpy.ndarray
+        Whether the spikes of each unit lie above (True) or below the threshold
+    whitening_matrix : numpy.ndarray, optional
+        Whitening matrix W of the extended EMG, X_hat = (X - mean) @ W.T.
+        Default = None (no whitening)
+    mean : numpy.ndarray, optional
+        Column means of the extended EMG removed by the whitening. Default = None
+    channel_transform : numpy.ndarray, optional
+        Matrix of shape (input channels, channels) applied to every incoming sample
+        before the delay embedding, e.g. a bipolar re-referencing. Default = None
+    chunk_size : int, optional
+        Maximum number of samples per chunk. Default = 64
+    sampling_frequency : float, optional
+        Sampling frequency in Hz, used for the latency budget. Default = None
+    dtype : numpy.dtype, optional
+        Floating-point type of the per-chunk products; the projection is folded in
+        float64 and then converted. Default = numpy.float64
+
+    Notes
+    -----
+    Latency: a spike at sample t is reported once sample t + 1 is available, i.e. with
+    the chunk containing t, or with the next chunk when t is the last sample of a chunk.
+    The worst-case delay from a spike to its report is therefore ``chunk_size`` samples
+    of acquisition plus the processing time of one chunk. For real-time operation the
+    processing time (``last_process_time``) must stay below the chunk duration
+    (``latency_budget``); its cost is one (chunk_size, input channels *
+    (extension_parameter + 1)) x (.., units) matrix product plus O(chunk_size * units)
+    peak tests.
+    """
+
+    def __init__(self, B, extension_parameter, threshold, spike_is_upper, whitening_matrix=None,
+                 mean=None, channel_transform=None, chunk_size=64, sampling_frequency=None,
+                 dtype=np.float64):
+        B = np.asarray(B, dtype=np.float64)
+        n_lags = extension_parameter + 1
+        projection = B if whitening_matrix is None else np.asarray(whitening_matrix).T @ B
+        self.offset = np.zeros(B.shape[1]) if mean is None else np.asarray(mean) @ projection
+
+        # Fold the channel transform into every lag block of the projection
+        num_chan = projection.shape[0] // n_lags
+        if channel_transform is not None:
+            blocks = projection.reshape(n_lags, num_chan, -1)
+            projection = np.einsum('ab,lbm->lam', np.asarray(channel_transform), blocks)
+            num_chan = projection.shape[1]
+            projection = projection.reshape(n_lags * num_chan, -1)
+
+        # Reorder the rows to match the flattened sliding windows of the raw samples
+        window_columns = ExtendedEMG(np.zeros((0, num_chan)), extension_parameter)._window_columns()
+        self.dtype = np.dtype(dtype)
+        self.projection = np.ascontiguousarray(projection[window_columns], dtype=self.dtype)
+        self.offset = self.offset.astype(self.dtype)
+
+        self.extension_parameter = extension_parameter
+        self.num_chan = num_chan
+        self.threshold = np.asarray(threshold, dtype=np.float64)
+        self.spike_is_upper = np.asarray(spike_is_upper, dtype=bool)
+        self.chunk_size = chunk_size
+        self.sampling_frequency = sampling_frequency
+        self.last_process_time = None
+        self.reset()
+
+    @property
+    def n_units(self):
+        """Number of decomposed units."""
+        return self.projection.shape[1]
+
+    @property
+    def latency_budget(self):
+        """Duration of one chunk in seconds, the per-chunk processing budget for real time."""
+        if self.sampling_frequency is None:
+            return None
+        return self.chunk_size / self.sampling_frequency
+
+    def reset(self):
+        """
+        Reset the stream state (sample history and peak lookahead).
+
+        Returns
+        -------
+        self
+            Returns the instance itself for method chaining
+        """
+        # Samples before the start of the stream are zero, as in the offline extension
+        self._buffer = np.zeros((self.extension_parameter + self.chunk_size, self.num_chan), dtype=self.dtype)
+        # Squared source values of the last two samples; inf keeps sample 0 from being a peak
+        self._tail = np.full((2, self.n_units), np.inf, dtype=self.dtype)
+        self.n_processed = 0
+        return self
+
+    def process(self, chunk):
+        """
+        Decompose the next chunk of the stream.
+
+        Parameters
+        ----------
+        chunk : numpy.ndarray
+            Raw EMG samples of shape (frames, input channels), frames <= chunk_size
+
+        Returns
+        -------
+        sample_indices : numpy.ndarray
+            Stream sample index of every detected spike, in time order
+        units : numpy.ndarray
+            Unit index of every detected spike
+        """
+        start_time = time.perf_counter()
+        chunk = np.asarray(chunk)
+        n = chunk.shape[0]
+        if n > self.chunk_size:
+            raise ValueError(f"Chunk of {n} samples exceeds chunk_size={self.chunk_size}")
+        R = self.extension_parameter
+        if n == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+        self._buffer[R:R + n] = chunk
+        windows = sliding_window_view(self._buffer[:R + n], R + 1, axis=0)
+        source = windows.reshape(n, -1) @ self.projection
+        source -= self.offset
+        self._buffer[:R] = self._buffer[n:n + R]
+
+        # Strict local maxima of the squared sources, one sample behind the newest one
+        squared = np.concatenate([self._tail, source ** 2])
+        center = squared[1:-1]
+        is_peak = (center > squared[:-2]) & (center > squared[2:])
+        is_spike = is_peak & ((center > self.threshold) == self.spike_is_upper)
+        self._tail = squared[-2:]
+
+        t, units = np.nonzero(is_spike)
+        sample_indices = self.n_processed - 1 + t
+        self.n_processed += n
+        self.last_process_time = time.perf_counter() - start_time
+        return sample_indices, units
+
+    def process_stream(self, chunks):
+        """
+        Decompose an iterable of chunks, yielding the spikes of each one.
+
+        Parameters
+        ----------
+        chunks : iterable of numpy.ndarray
+            Consecutive raw EMG chunks
+
+        Yields
+        ------
+        tuple
+            (sample_indices, units) of the spikes reported for each chunk
+        """
+        for chunk in chunks:
+            yield self.process(chunk)
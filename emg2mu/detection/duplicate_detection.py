@@ -2,20 +2,29 @@
 This module provides functions for motor unit detection and duplicate removal in EMG analysis.
 """
 
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
 import numpy as np
-from scipy.spatial.distance import cdist
 from scipy.signal import find_peaks
-from sklearn.cluster import KMeans
+from .peak_classification import two_means_1d
+from ..core.spike_train import SpikeTrain, as_spike_train
 
 
 def fast_silhouette(data, labels):
     """
     Fast silhouette score calculation for 1D data with 2 clusters.
 
+    For one-dimensional data the summed absolute distance from a point to all points
+    of a cluster follows from the cluster's sorted values and their prefix sums, so
+    every score is exact in O(n log n) time and O(n) memory, without pairwise
+    distance matrices.
+
     Parameters
     ----------
     data : numpy.ndarray
-        1D array of values
+        1D array of values, or a column vector of shape (n, 1)
     labels : numpy.ndarray
         Binary cluster labels (0 or 1)
 
@@ -24,92 +33,142 @@ def fast_silhouette(data, labels):
     float
         Mean silhouette score
     """
-    # Split data by cluster
-    cluster0 = data[labels == 0]
-    cluster1 = data[labels == 1]
+    data = np.asarray(data, dtype=np.float64).ravel()
+    labels = np.asarray(labels).ravel()
+    # Centre the data to keep the prefix sums well conditioned
+    data = data - np.mean(data) if len(data) else data
+    clusters = [np.sort(data[labels == 0]), np.sort(data[labels == 1])]
 
-    if len(cluster0) == 0 or len(cluster1) == 0:
+    if len(clusters[0]) == 0 or len(clusters[1]) == 0:
         return 0.0
 
-    # Calculate distances for each point
     scores = []
+    for own, other in [(clusters[0], clusters[1]), (clusters[1], clusters[0])]:
+        # Singleton clusters have no intra-cluster distance and are left out
+        if len(own) > 1:
+            a = _summed_abs_distances(own, own) / (len(own) - 1)  # self-distance is 0
+            b = _summed_abs_distances(own, other) / len(other)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                scores.append((b - a) / np.maximum(a, b))
 
-    # Process cluster 0
-    if len(cluster0) > 1:
-        # Vectorized intra-cluster distances for cluster 0
-        intra0 = np.abs(cluster0.reshape(-1, 1) - cluster0.reshape(1, -1))
-        a0 = np.sum(intra0, axis=1) / (len(cluster0) - 1)  # Exclude self-distance
-
-        # Vectorized inter-cluster distances to cluster 1
-        inter0 = np.abs(cluster0.reshape(-1, 1) - cluster1.reshape(1, -1))
-        b0 = np.mean(inter0, axis=1)
-
-        # Calculate scores
-        s0 = (b0 - a0) / np.maximum(a0, b0)
-        scores.extend(s0)
-
-    # Process cluster 1
-    if len(cluster1) > 1:
-        # Vectorized intra-cluster distances for cluster 1
-        intra1 = np.abs(cluster1.reshape(-1, 1) - cluster1.reshape(1, -1))
-        a1 = np.sum(intra1, axis=1) / (len(cluster1) - 1)  # Exclude self-distance
+    return np.mean(np.concatenate(scores)) if scores else 0.0
 
-        # Vectorized inter-cluster distances to cluster 0
-        inter1 = np.abs(cluster1.reshape(-1, 1) - cluster0.reshape(1, -1))
-        b1 = np.mean(inter1, axis=1)
 
-        # Calculate scores
-        s1 = (b1 - a1) / np.maximum(a1, b1)
-        scores.extend(s1)
-
-    return np.mean(scores) if scores else 0.0
+def _summed_abs_distances(points, sorted_values):
+    """
+    Sum of |p - v| over all values v, for every point p, from sorted prefix sums.
+    """
+    prefix = np.concatenate([[0.0], np.cumsum(sorted_values)])
+    k = np.searchsorted(sorted_values, points)  # number of values below each point
+    n = len(sorted_values)
+    return points * k - prefix[k] + (prefix[n] - prefix[k]) - points * (n - k)
 
 
-def compute_silhouette_scores(spike_train, source, max_samples=1000):
+def compute_silhouette_scores(spike_train, source, max_samples=None, n_jobs=1, seed=None):
     """
-    Compute silhouette scores for motor units using optimized sampling.
+    Compute silhouette scores for motor units.
+
+    By default all peaks of every source are scored, which is exact and deterministic.
+    With ``max_samples``, every unit draws its peak subsample from its own random
+    generator, spawned from ``seed``, so the scores do not depend on ``n_jobs`` or on
+    the order in which the units are processed.
 
     Parameters
     ----------
-    spike_train : numpy.ndarray
+    spike_train : SpikeTrain or numpy.ndarray
         The spike train data
     source : numpy.ndarray
         The source signals from ICA decomposition
-    max_samples : int
-        Maximum number of peaks to use for silhouette calculation
+    max_samples : int, optional
+        Maximum number of peaks to use for silhouette calculation. Default = None
+        (all peaks)
+    n_jobs : int, optional
+        Number of worker processes; -1 uses all cores. The sources are shared with the
+        workers through shared memory instead of being pickled. Workers are spawned, so
+        a script using n_jobs > 1 must call it under ``if __name__ == '__main__':``.
+        Default = 1 (serial)
+    seed : int, optional
+        Seed of the per-unit peak subsampling. Default = None (not reproducible)
 
     Returns
     -------
     numpy.ndarray
         Array of silhouette scores for each motor unit
     """
-    sil_score = np.zeros(spike_train.shape[1])
+    n_units = spike_train.shape[1]
+    seeds = np.random.SeedSequence(seed).spawn(n_units)
+    n_jobs = os.cpu_count() if n_jobs == -1 else n_jobs
+    n_jobs = max(1, min(n_jobs, n_units))
+    if n_jobs == 1:
+        return np.array([_unit_silhouette(source[:, i], max_samples, seeds[i])
+                         for i in range(n_units)])
 
-    for i in range(spike_train.shape[1]):
-        pow = np.power(source[:, i], 2)
-        loc, _ = find_peaks(pow)
-        pks = pow[loc]
+    # Unit-major copy so that every worker reads its sources contiguously
+    shm = shared_memory.SharedMemory(create=True, size=max(source[:, :n_units].nbytes, 1))
+    try:
+        shared = np.ndarray((n_units, source.shape[0]), dtype=source.dtype, buffer=shm.buf)
+        shared[:] = source[:, :n_units].T
+        tasks = np.array_split(np.arange(n_units), min(n_units, 4 * n_jobs))
+        # Spawned workers do not inherit torch thread pools or CUDA state from the parent
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(n_jobs, mp_context=context, initializer=_attach_shared_source,
+                                 initargs=(shm.name, shared.shape, shared.dtype)) as pool:
+            futures = [pool.submit(_shared_silhouettes, units, [seeds[i] for i in units], max_samples)
+                       for units in tasks]
+            sil_score = np.concatenate([future.result() for future in futures])
+        del shared
+    finally:
+        shm.close()
+        shm.unlink()
+    return sil_score
 
-        # Sample peaks if there are too many
-        if len(pks) > max_samples:
-            sample_idx = np.random.choice(len(pks), max_samples, replace=False)
-            pks = pks[sample_idx]
 
-        kmeans = KMeans(n_clusters=2, n_init=10).fit(pks.reshape(-1, 1))
-        idx = kmeans.labels_
-        sil_score[i] = fast_silhouette(pks.reshape(-1, 1), idx)
+def _unit_silhouette(unit_source, max_samples, seed):
+    """
+    Silhouette score of the two peak-amplitude clusters of one source.
+    """
+    peak_loc = find_peaks(np.power(unit_source, 2))[0]
+    pks = np.power(unit_source[peak_loc], 2)
+    if max_samples is not None and len(pks) > max_samples:
+        pks = pks[np.random.default_rng(seed).choice(len(pks), max_samples, replace=False)]
+    labels, _ = two_means_1d(pks[np.newaxis, :])
+    return fast_silhouette(pks, labels[0].astype(int))
 
-    return sil_score
+
+_shared_source = None
+
+
+def _attach_shared_source(name, shape, dtype):
+    """
+    Pool initializer: map the shared (units, frames) source array in the worker.
+    """
+    global _shared_source
+    shm = shared_memory.SharedMemory(name=name)
+    _shared_source = (shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf))
+
+
+def _shared_silhouettes(units, seeds, max_samples):
+    """
+    Worker task: silhouette scores of a group of units read from shared memory.
+    """
+    source = _shared_source[1]
+    return np.array([_unit_silhouette(source[i], max_samples, seed) for i, seed in zip(units, seeds)])
 
 
 def remove_duplicates(spike_train, source, sampling_frequency, min_firing_rate=4, max_firing_rate=35,
-                     max_duplicate_time_diff=0.01, num_bins=100):
+                     max_duplicate_time_diff=0.01, num_bins=100, method='histogram', roa_threshold=0.3,
+                     tolerance=0.0005, max_lag=0.01):
     """
     Remove duplicate motor units from decomposition results.
 
+    Two duplicate detectors are available: 'histogram' compares the spike-time
+    histograms of the units by their cosine distance, and 'spike_times' matches the
+    spike times of every pair of units within a tolerance after removing their lag
+    (see ``rate_of_agreement_matrix``), which discriminates units much better.
+
     Parameters
     ----------
-    spike_train : numpy.ndarray
+    spike_train : SpikeTrain or numpy.ndarray
         The uncleaned spike train
     source : numpy.ndarray
         The uncleaned sources from ICA decomposition
@@ -123,43 +182,319 @@ def remove_duplicates(spike_train, source, sampling_frequency, min_firing_rate=4
         Maximum time difference for considering motor units as duplicates
     num_bins : int
         Number of bins used for histogram analysis in duplicate detection
+    method : str, optional
+        Duplicate detector, 'histogram' or 'spike_times'. Default = 'histogram'
+    roa_threshold : float, optional
+        Rate of agreement above which the 'spike_times' method marks two units as
+        duplicates. Default = 0.3
+    tolerance : float, optional
+        Largest spike time difference in seconds counted as a match by the
+        'spike_times' method. Default = 0.0005
+    max_lag : float, optional
+        Largest lag in seconds between duplicate units for the 'spike_times' method.
+        Default = 0.01
 
     Returns
     -------
     tuple
-        (cleaned_spike_train, cleaned_source, good_indices)
+        (cleaned_spike_train, cleaned_source, good_indices); the cleaned spike train
+        is a SpikeTrain
     """
+    if method not in ['histogram', 'spike_times']:
+        raise ValueError(f"method must be 'histogram' or 'spike_times', got {method!r}")
+    spike_train = as_spike_train(spike_train)
     min_firing_interval = 1 / max_firing_rate  # Minimum time between firings
-    time_stamp = np.linspace(1 / sampling_frequency, spike_train.shape[0] / sampling_frequency,
-                            spike_train.shape[0])
+    time_stamp = np.linspace(1 / sampling_frequency, spike_train.n_frames / sampling_frequency,
+                            spike_train.n_frames)
 
-    firings = spike_train.sum(axis=0)
+    firings = spike_train.counts
     lower_bound_cond = np.where(firings > min_firing_rate * time_stamp[-1])[0]
     upper_bound_cond = np.where(firings < max_firing_rate * time_stamp[-1])[0]
     plausible_firings = np.intersect1d(lower_bound_cond, upper_bound_cond)
 
     # Remove spikes that are too close together
-    for k in plausible_firings:
-        spike_time_diff = np.diff(time_stamp[spike_train[:, k] == 1])
-        for t in range(len(spike_time_diff)):
-            if spike_time_diff[t] < min_firing_interval:
-                if source[t, k] < source[t + 1, k]:
-                    spike_train[t, k] = 0
-                else:
-                    spike_train[t + 1, k] = 0
-
-    # Find duplicate sources
-    duplicate_sources = []
-    for k in plausible_firings:
-        if k not in duplicate_sources:
-            for j in np.setdiff1d(plausible_firings[plausible_firings != k], duplicate_sources):
-                spike_times_1 = time_stamp[spike_train[:, k] == 1]
-                spike_times_2 = time_stamp[spike_train[:, j] == 1]
-                hist_1, _ = np.histogram(spike_times_1, bins=num_bins)
-                hist_2, _ = np.histogram(spike_times_2, bins=num_bins)
-                dist = cdist(hist_1[np.newaxis, :], hist_2[np.newaxis, :], metric='cosine')[0][0]
-                if dist < max_duplicate_time_diff:
-                    duplicate_sources.append(j)
-
-    good_idx = np.setdiff1d(plausible_firings, duplicate_sources)
-    return spike_train[:, good_idx], source[:, good_idx], good_idx
+    plausible_train = clear_refractory_violations(
+        spike_train.select(plausible_firings), source, min_firing_interval * sampling_frequency,
+        columns=plausible_firings)
+
+    if method == 'spike_times':
+        # Find duplicate sources from the rates of agreement of their spike times
+        roa = rate_of_agreement_matrix(plausible_train, int(round(tolerance * sampling_frequency)),
+                                       int(round(max_lag * sampling_frequency)))
+        is_duplicate = greedy_duplicates(np.maximum(roa, roa.T) >= roa_threshold)
+    else:
+        # Find duplicate sources from the pairwise cosine distances of their spike-time histograms
+        hist = spike_time_histograms(time_stamp[plausible_train.indices], plausible_train.units,
+                                     len(plausible_firings), num_bins)
+        dist = cosine_distance_matrix(hist)
+        is_duplicate = greedy_duplicates(dist < max_duplicate_time_diff)
+
+    good_idx = plausible_firings[~is_duplicate]
+    return plausible_train.select(~is_duplicate), source[:, good_idx], good_idx
+
+
+def clear_refractory_violations(spike_train, source, min_interval, columns=None):
+    """
+    Remove the weaker spike of every pair of spikes closer than the refractory interval.
+
+    All units are processed together on the sparse spike indices. Every pass keeps the
+    spikes whose absolute source value is the largest within their refractory window
+    and removes the other spikes of that window; the passes repeat until no violations
+    are left. The result equals keeping the spikes greedily in order of decreasing
+    amplitude, so a spike is only ever removed by a larger spike that survives.
+
+    Parameters
+    ----------
+    spike_train : SpikeTrain or numpy.ndarray
+        The spike train
+    source : numpy.ndarray
+        The source signals, whose absolute values at the spikes rank the spikes
+    min_interval : float
+        Minimum interval between two spikes of a unit, in samples
+    columns : array-like, optional
+        Column of ``source`` of every unit. Default = None (column k for unit k)
+
+    Returns
+    -------
+    SpikeTrain
+        The spike train without refractory violations
+    """
+    spike_train = as_spike_train(spike_train)
+    indices, units = spike_train.indices.astype(np.int64), spike_train.units
+    columns = units if columns is None else np.asarray(columns)[units]
+    amplitude = np.abs(source[indices, columns])
+    # Strict ranking of the spikes by amplitude; ties favour the earlier spike
+    rank = np.empty(len(indices), dtype=np.int64)
+    rank[np.lexsort((-np.arange(len(indices)), amplitude))] = np.arange(len(indices))
+
+    alive = np.arange(len(indices))
+    while True:
+        alive_indices, alive_units, r = indices[alive], units[alive], rank[alive]
+        # Too-close pairs (i, i + d) for every shift d; none at shift d means none beyond
+        pairs = []
+        for d in range(1, len(alive)):
+            close = ((alive_indices[d:] - alive_indices[:-d] < min_interval)
+                     & (alive_units[d:] == alive_units[:-d]))
+            if not np.any(close):
+                break
+            pairs.append((d, close))
+        if not pairs:
+            break
+
+        # The largest spikes of their refractory window are kept and remove their window
+        peak = np.ones(len(alive), dtype=bool)
+        for d, close in pairs:
+            peak[:-d] &= ~(close & (r[d:] > r[:-d]))
+            peak[d:] &= ~(close & (r[:-d] > r[d:]))
+        removed = np.zeros(len(alive), dtype=bool)
+        for d, close in pairs:
+            removed[d:] |= close & peak[:-d]
+            removed[:-d] |= close & peak[d:]
+        alive = alive[~removed]
+
+    counts = np.bincount(units[alive], minlength=spike_train.n_units)
+    indptr = np.concatenate([[0], np.cumsum(counts)])
+    return SpikeTrain(indices[alive], indptr, spike_train.n_frames)
+
+
+def spike_time_histograms(spike_times, unit, n_units, num_bins):
+    """
+    Histogram the spike times of every unit, each over its own first-to-last spike range.
+
+    This is equivalent to calling ``np.histogram(times, bins=num_bins)`` on every unit,
+    computed for all units in one pass.
+
+    Parameters
+    ----------
+    spike_times : numpy.ndarray
+        Spike times of all units, concatenated
+    unit : numpy.ndarray
+        Unit index of every spike time
+    n_units : int
+        Number of units
+    num_bins : int
+        Number of histogram bins
+
+    Returns
+    -------
+    numpy.ndarray
+        Spike counts of shape (n_units, num_bins)
+    """
+    spike_times = np.asarray(spike_times, dtype=np.float64)
+    first_edge = np.full(n_units, np.inf)
+    last_edge = np.full(n_units, -np.inf)
+    np.minimum.at(first_edge, unit, spike_times)
+    np.maximum.at(last_edge, unit, spike_times)
+    empty = np.isinf(first_edge)
+    first_edge[empty], last_edge[empty] = 0.0, 1.0
+    same = first_edge == last_edge
+    first_edge[same] -= 0.5
+    last_edge[same] += 0.5
+    bin_edges = np.linspace(first_edge, last_edge, num_bins + 1, axis=1)
+
+    # Same index computation (and ULP corrections at the edges) as np.histogram
+    f_indices = ((spike_times - first_edge[unit]) / (last_edge[unit] - first_edge[unit])) * num_bins
+    indices = f_indices.astype(np.intp)
+    indices[indices == num_bins] -= 1
+    decrement = spike_times < bin_edges[unit, indices]
+    indices[decrement] -= 1
+    increment = (spike_times >= bin_edges[unit, indices + 1]) & (indices != num_bins - 1)
+    indices[increment] += 1
+
+    counts = np.bincount(unit * num_bins + indices, minlength=n_units * num_bins)
+    return counts.reshape(n_units, num_bins)
+
+
+def cosine_distance_matrix(hist):
+    """
+    Pairwise cosine distances between the rows of a histogram matrix.
+
+    Parameters
+    ----------
+    hist : numpy.ndarray
+        Histograms of shape (n_units, num_bins)
+
+    Returns
+    -------
+    numpy.ndarray
+        Cosine distances of shape (n_units, n_units); NaN for empty histograms
+    """
+    hist = np.asarray(hist, dtype=np.float64)
+    norm = np.sqrt(np.sum(hist ** 2, axis=1))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dist = 1.0 - (hist @ hist.T) / np.outer(norm, norm)
+    return np.clip(dist, 0.0, 2.0)
+
+
+def greedy_duplicates(is_close):
+    """
+    Greedily mark duplicate units from a pairwise closeness matrix.
+
+    Units are visited in order; every unit that is not a duplicate itself marks all
+    other units close to it as duplicates.
+
+    Parameters
+    ----------
+    is_close : numpy.ndarray
+        Boolean matrix of shape (n_units, n_units)
+
+    Returns
+    -------
+    numpy.ndarray
+        Boolean mask of the duplicate units
+    """
+    is_close = np.array(is_close, dtype=bool)
+    np.fill_diagonal(is_close, False)
+    is_duplicate = np.zeros(is_close.shape[0], dtype=bool)
+    for k in range(is_close.shape[0]):
+        if not is_duplicate[k]:
+            is_duplicate |= is_close[k]
+    return is_duplicate
+
+
+def rate_of_agreement(spikes, reference, tolerance=1, max_lag=32):
+    """
+    Rate of agreement between two spike trains that may be offset by a constant lag.
+
+    The lag is the most common difference (within ``max_lag``) between the spikes and
+    their nearest reference spikes. Spikes within ``tolerance`` of a reference spike
+    after removing the lag are matches, each reference spike matching at most once,
+    and the rate of agreement is matches / (spikes + reference spikes - matches).
+
+    Parameters
+    ----------
+    spikes : numpy.ndarray
+        Sorted spike locations in samples
+    reference : numpy.ndarray
+        Sorted reference spike locations in samples
+    tolerance : int, optional
+        Largest spike time difference in samples counted as a match. Default = 1
+    max_lag : int, optional
+        Largest lag in samples between the two spike trains. Default = 32
+
+    Returns
+    -------
+    roa : float
+        Rate of agreement between 0 and 1
+    lag : int
+        Lag of the spikes relative to the reference in samples
+    """
+    spikes = np.asarray(spikes, dtype=np.int64)
+    reference = np.asarray(reference, dtype=np.int64)
+    if len(spikes) == 0 or len(reference) == 0:
+        return 0.0, 0
+    diff = spikes - reference[_nearest(reference, spikes)]
+    diff = diff[np.abs(diff) <= max_lag]
+    if len(diff) == 0:
+        return 0.0, 0
+    lag = int(np.bincount(diff + max_lag).argmax() - max_lag)
+    shifted = spikes - lag
+    nearest = _nearest(reference, shifted)
+    n_matched = len(np.unique(nearest[np.abs(shifted - reference[nearest]) <= tolerance]))
+    return n_matched / (len(spikes) + len(reference) - n_matched), lag
+
+
+def rate_of_agreement_matrix(spike_train, tolerance=1, max_lag=32):
+    """
+    Rate of agreement between every pair of units of a spike train.
+
+    Entry (i, j) equals ``rate_of_agreement(unit i, unit j, tolerance, max_lag)``. For
+    every reference unit j, the spikes of all units are located in unit j with one
+    ``np.searchsorted`` call and the lags and matches of all units are counted
+    together, so the cost is O(units * spikes * log(spikes)) instead of a pass over
+    the full-length recording for every pair.
+
+    Parameters
+    ----------
+    spike_train : SpikeTrain or numpy.ndarray
+        The spike train
+    tolerance : int, optional
+        Largest spike time difference in samples counted as a match. Default = 1
+    max_lag : int, optional
+        Largest lag in samples between two units. Default = 32
+
+    Returns
+    -------
+    numpy.ndarray
+        Rates of agreement of shape (units, units), with ones on the diagonal of units
+        with spikes
+    """
+    spike_train = as_spike_train(spike_train)
+    n_units = spike_train.n_units
+    indices = spike_train.indices.astype(np.int64)
+    units = spike_train.units
+    counts = spike_train.counts
+    n_lags = 2 * max_lag + 1
+    roa = np.zeros((n_units, n_units))
+
+    for j in range(n_units):
+        reference = spike_train.unit(j).astype(np.int64)
+        if len(reference) == 0:
+            continue
+        # Most common lag of every unit relative to unit j
+        diff = indices - reference[_nearest(reference, indices)]
+        valid = np.abs(diff) <= max_lag
+        lag_counts = np.bincount(units[valid] * n_lags + diff[valid] + max_lag,
+                                 minlength=n_units * n_lags).reshape(n_units, n_lags)
+        lag = lag_counts.argmax(axis=1) - max_lag
+
+        # Reference spikes matched after removing the lag, each at most once
+        shifted = indices - lag[units]
+        nearest = _nearest(reference, shifted)
+        matched = (np.abs(shifted - reference[nearest]) <= tolerance) & np.any(lag_counts, axis=1)[units]
+        pairs = np.unique(units[matched] * len(reference) + nearest[matched])
+        n_matched = np.bincount(pairs // len(reference), minlength=n_units)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            roa[:, j] = np.where(counts > 0, n_matched / (counts + len(reference) - n_matched), 0.0)
+    return roa
+
+
+def _nearest(sorted_values, points):
+    """
+    Index of the nearest sorted value to every point.
+    """
+    if len(sorted_values) == 1:
+        return np.zeros(len(points), dtype=np.int64)
+    right = np.clip(np.searchsorted(sorted_values, points), 1, len(sorted_values) - 1)
+    left = right - 1
+    return np.where(points - sorted_values[left] <= sorted_values[right] - points, left, right)
@@ -0,0 +1,180 @@
+"""
+This module provides vectorised spike detection for ICA sources.
+
+The spikes of a source are the peaks of its squared signal that fall into the smaller
+of two amplitude clusters. For one-dimensional data the optimal two-means partition is
+a split of the sorted values, so it is found exactly from prefix sums instead of
+running an iterative (and restarted) k-means per source.
+"""
+
+import numpy as np
+from scipy.signal import find_peaks
+from ..utils.profiling import stage
+
+
+def find_source_peaks(source):
+    """
+    Find the peaks of the squared sources and collect them in a padded array.
+
+    Parameters
+    ----------
+    source : numpy.ndarray
+        Source signals of shape (frames,) or (frames, M)
+
+    Returns
+    -------
+    loc : numpy.ndarray
+        Peak locations of shape (M, P), padded with -1
+    pks : numpy.ndarray
+        Squared peak amplitudes of shape (M, P), padded with NaN
+    counts : numpy.ndarray
+        Number of peaks found for each source
+    """
+    source = np.asarray(source)
+    if source.ndim == 1:
+        source = source[:, np.newaxis]
+
+    locs = [find_peaks(np.power(source[:, i], 2))[0] for i in range(source.shape[1])]
+    counts = np.array([len(loc) for loc in locs], dtype=np.int64)
+    width = counts.max() if len(counts) else 0
+
+    loc = np.full((len(locs), width), -1, dtype=np.int64)
+    pks = np.full((len(locs), width), np.nan)
+    for i, peak_loc in enumerate(locs):
+        loc[i, :counts[i]] = peak_loc
+        pks[i, :counts[i]] = np.power(source[peak_loc, i], 2)
+    return loc, pks, counts
+
+
+def two_means_1d(values, counts=None):
+    """
+    Exact two-means clustering of every row of a padded array of 1-D values.
+
+    Each row is sorted and the within-cluster sum of squares of every possible split
+    is evaluated at once from prefix sums; the split with the smallest sum is the
+    global optimum of the two-cluster k-means objective.
+
+    Parameters
+    ----------
+    values : numpy.ndarray
+        Values of shape (M, P). Only the first ``counts[i]`` entries of row i are used.
+    counts : numpy.ndarray, optional
+        Number of valid values in each row. Default = None (non-NaN entries)
+
+    Returns
+    -------
+    upper : numpy.ndarray
+        Boolean array of shape (M, P); True for values in the upper cluster
+    threshold : numpy.ndarray
+        Decision boundary (midpoint of the two centroids) of each row. NaN for rows
+        with fewer than two values.
+    """
+    values = np.atleast_2d(np.asarray(values, dtype=np.float64))
+    n_rows, width = values.shape
+    if counts is None:
+        counts = np.sum(~np.isnan(values), axis=1)
+    counts = np.asarray(counts)
+    if width == 0:
+        return np.zeros((n_rows, 0), dtype=bool), np.full(n_rows, np.nan)
+    valid = np.arange(width) < counts[:, np.newaxis]
+
+    # Sort with the padding pushed to the end of every row
+    order = np.argsort(np.where(valid, values, np.inf), axis=1, kind='stable')
+    x = np.take_along_axis(np.where(valid, values, 0.0), order, axis=1)
+
+    # Centre the rows to keep the prefix sums of squares well conditioned
+    offset = np.sum(x, axis=1) / np.maximum(counts, 1)
+    x = np.where(valid, x - offset[:, np.newaxis], 0.0)
+    cs = np.cumsum(x, axis=1)
+    cs2 = np.cumsum(x ** 2, axis=1)
+    total = cs[:, -1:]
+    total2 = cs2[:, -1:]
+
+    # Left cluster holds the k smallest values, k = 1 .. width
+    k = np.arange(1, width + 1)
+    n = counts[:, np.newaxis]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sse = (cs2 - cs ** 2 / k) + (total2 - cs2) - (total - cs) ** 2 / (n - k)
+    sse = np.where(k < n, sse, np.inf)
+
+    has_split = counts >= 2
+    split = np.where(has_split, np.argmin(sse, axis=1) + 1, width)
+
+    left_sum = cs[np.arange(n_rows), split - 1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        lower_mean = left_sum / split
+        upper_mean = (total[:, 0] - left_sum) / (counts - split)
+    threshold = np.where(has_split, (lower_mean + upper_mean) / 2 + offset, np.nan)
+
+    upper = np.zeros((n_rows, width), dtype=bool)
+    np.put_along_axis(upper, order, (k > split[:, np.newaxis]) & valid, axis=1)
+    upper &= has_split[:, np.newaxis]
+    return upper, threshold
+
+
+def classify_peaks(pks, counts):
+    """
+    Classify padded peak amplitudes into spikes and noise peaks.
+
+    The spikes are the smaller of the two amplitude clusters (the upper one on ties).
+
+    Parameters
+    ----------
+    pks : numpy.ndarray
+        Squared peak amplitudes of shape (M, P), padded with NaN
+    counts : numpy.ndarray
+        Number of valid peaks for each source
+
+    Returns
+    -------
+    spikes : numpy.ndarray
+        Boolean array of shape (M, P); True for peaks classified as spikes
+    labels : numpy.ndarray
+        Binary cluster labels of shape (M, P); 1 for the upper cluster
+    threshold : numpy.ndarray
+        Amplitude threshold separating the two clusters of each source
+    spike_is_upper : numpy.ndarray
+        Whether the spikes of each source lie above (True) or below the threshold
+    """
+    upper, threshold = two_means_1d(pks, counts)
+    n_upper = np.sum(upper, axis=1)
+    spike_is_upper = n_upper <= np.asarray(counts) - n_upper
+    valid = np.arange(pks.shape[1]) < np.asarray(counts)[:, np.newaxis]
+    spikes = np.where(spike_is_upper[:, np.newaxis], upper, ~upper & valid)
+    spikes &= (np.asarray(counts) >= 2)[:, np.newaxis]
+    return spikes, upper.astype(int), threshold, spike_is_upper
+
+
+def detect_spikes(source, chunk_size=32, profiler=None):
+    """
+    Detect the spikes of every source.
+
+    Parameters
+    ----------
+    source : numpy.ndarray
+        Source signals of shape (frames,) or (frames, M)
+    chunk_size : int, optional
+        Number of sources classified together, bounding the padded peak arrays.
+        Default = 32
+    profiler : Profiler, optional
+        Profiler recording the peak detection and classification of every chunk.
+        Default = None
+
+    Returns
+    -------
+    list of numpy.ndarray
+        Sorted spike locations for each source
+    """
+    source = np.asarray(source)
+    if source.ndim == 1:
+        source = source[:, np.newaxis]
+
+    spike_locs = []
+    with stage(profiler, 'spike_detection', sources=source.shape[1]):
+        for start in range(0, source.shape[1], chunk_size):
+            with stage(profiler, 'peak_detection', first_source=start):
+                loc, pks, counts = find_source_peaks(source[:, start:start + chunk_size])
+            with stage(profiler, 'peak_classification', first_source=start, peaks=int(counts.sum())):
+                spikes, _, _, _ = classify_peaks(pks, counts)
+            spike_locs.extend(loc[i, spikes[i]] for i in range(loc.shape[0]))
+    return spike_locs
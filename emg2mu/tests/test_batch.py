@@ -0,0 +1,105 @@
+"""
+Tests for the batch runner.
+"""
+
+import csv
+import json
+import os
+import numpy as np
+import numpy.testing as npt
+import pytest
+from emg2mu.utils.batch import load_manifest, run_batch, main
+from emg2mu.utils.io import load_results
+from emg2mu.tests.test_utils import generate_test_data
+
+
+EMG_KWARGS = {'max_sources': 4, 'max_ica_iter': 10, 'device': 'cpu'}
+
+
+def write_recordings(directory, n=2):
+    emg_data = generate_test_data()['emg_data']
+    paths = []
+    for i in range(n):
+        path = os.path.join(directory, f'session{i}.npy')
+        np.save(path, np.roll(emg_data, 50 * i, axis=0))
+        paths.append(path)
+    return paths
+
+
+def test_manifest_formats(tmp_path):
+    """Test CSV and JSON manifests with per-recording parameters."""
+    with open(tmp_path / 'manifest.csv', 'w', newline='') as f:
+        f.write('path,name,extension_parameter\nsession0.npy,,3\nsession1.npy,second,\n')
+    recordings = load_manifest(str(tmp_path / 'manifest.csv'))
+    assert [r['name'] for r in recordings] == ['session0', 'second']
+    assert recordings[0]['extension_parameter'] == 3
+    assert 'extension_parameter' not in recordings[1]
+    assert recordings[0]['path'] == str(tmp_path / 'session0.npy')
+
+    with open(tmp_path / 'manifest.json', 'w') as f:
+        json.dump({'defaults': {'sampling_frequency': 1000},
+                   'recordings': [{'path': 'session0.npy'}, {'path': 'session1.npy'}]}, f)
+    recordings = load_manifest(str(tmp_path / 'manifest.json'))
+    assert all(r['sampling_frequency'] == 1000 for r in recordings)
+
+
+def test_batch_resume(tmp_path):
+    """Test that a restarted batch skips completed stages and reproduces the results."""
+    paths = write_recordings(tmp_path) + [str(tmp_path / 'missing.npy')]
+    output_dir = str(tmp_path / 'out')
+
+    rows = run_batch(paths, output_dir, emg_kwargs=EMG_KWARGS)
+    assert [row['status'] for row in rows] == ['done', 'done', 'failed']
+    assert all(row['resumed_stages'] == '' for row in rows)
+    assert rows[0]['n_sources'] == 4
+    first = load_results(os.path.join(output_dir, 'session0_decomposed.npz'))
+
+    # A crashed run leaves the ICA checkpoint only; the restart resumes from it
+    os.remove(os.path.join(output_dir, 'session1_scores.npy'))
+    os.remove(os.path.join(output_dir, 'session1_decomposed.npz'))
+    rows = run_batch(paths, output_dir, emg_kwargs=EMG_KWARGS)
+    assert rows[0]['resumed_stages'] == 'ica;duplicates;scores'
+    assert rows[1]['resumed_stages'] == 'ica'
+    again = load_results(os.path.join(output_dir, 'session0_decomposed.npz'))
+    npt.assert_array_equal(again['source'], first['source'])
+    npt.assert_array_equal(again['silhouette_score'], first['silhouette_score'])
+
+    with open(os.path.join(output_dir, 'summary.csv'), newline='') as f:
+        summary = list(csv.DictReader(f))
+    assert [row['name'] for row in summary] == ['session0', 'session1', 'missing']
+    assert summary[2]['status'] == 'failed' and summary[2]['error']
+
+
+def test_batch_invalid_checkpoints(tmp_path):
+    """Test that unreadable or outdated ICA checkpoints are recomputed instead of reused."""
+    paths = write_recordings(tmp_path)
+    output_dir = str(tmp_path / 'out')
+    run_batch(paths, output_dir, emg_kwargs=EMG_KWARGS)
+
+    with open(os.path.join(output_dir, 'session0_ica.npz'), 'wb') as f:
+        f.write(b'not a checkpoint')
+    with pytest.warns(UserWarning, match='Could not load ICA results'):
+        rows = run_batch(paths, output_dir, emg_kwargs=EMG_KWARGS)
+    assert [row['status'] for row in rows] == ['done', 'done']
+    assert rows[0]['resumed_stages'] == '' and rows[1]['resumed_stages'] == 'ica;duplicates;scores'
+
+    # Changed parameters invalidate the checkpoints of every recording
+    rows = run_batch(paths, output_dir, emg_kwargs={**EMG_KWARGS, 'max_sources': 3})
+    assert all(row['resumed_stages'] == '' and row['n_sources'] == 3 for row in rows)
+    rows = run_batch(paths, output_dir, emg_kwargs={**EMG_KWARGS, 'max_sources': 3})
+    assert all(row['resumed_stages'] == 'ica;duplicates;scores' for row in rows)
+
+
+def test_batch_cli_parallel(tmp_path):
+    """Test the console entry point with a process pool."""
+    write_recordings(tmp_path)
+    with open(tmp_path / 'manifest.csv', 'w', newline='') as f:
+        f.write('path\nsession0.npy\nsession1.npy\n')
+    output_dir = str(tmp_path / 'out')
+
+    status = main([str(tmp_path / 'manifest.csv'), '-o', output_dir, '-j', '2',
+                   '--set', 'max_sources=3', '--set', 'max_ica_iter=10', '--set', 'device=cpu'])
+    assert status == 0
+    for name in ['session0', 'session1']:
+        assert os.path.exists(os.path.join(output_dir, f'{name}_ica.npz'))
+        assert os.path.exists(os.path.join(output_dir, f'{name}_scores.npy'))
@@ -0,0 +1,74 @@
+"""
+Tests for the stage cache.
+"""
+
+import os
+import numpy as np
+import numpy.testing as npt
+from emg2mu.core.decomposition import EMG
+from emg2mu.core.preprocessing import awgn
+from emg2mu.utils.cache import StageCache, data_digest
+from emg2mu.tests.test_utils import generate_test_data
+
+
+def run_pipeline(emg_data, cache, **kwargs):
+    emg = EMG(emg_data, max_sources=4, max_ica_iter=10, device='cpu', cache=cache, **kwargs)
+    emg.preprocess().run_ica(method='fastICA')
+    emg.remove_duplicates().compute_scores()
+    return emg
+
+
+def test_pipeline_cache_hits(tmp_path, monkeypatch):
+    """Test that cached stages are reused and that parameter changes produce new keys."""
+    emg_data = generate_test_data()['emg_data']
+    cache = StageCache(str(tmp_path))
+    first = run_pipeline(emg_data, cache)
+    assert len(os.listdir(tmp_path)) == 4
+
+    # A second run is served entirely from the cache
+    import emg2mu.core.decomposition as decomposition
+    def fail(*args, **kwargs):
+        raise AssertionError("stage recomputed")
+    for name in ['fastICA', 'remove_duplicates', 'compute_silhouette_scores']:
+        monkeypatch.setattr(decomposition, name, fail)
+    second = run_pipeline(emg_data, str(tmp_path))
+    npt.assert_array_equal(second._raw_B, first._raw_B)
+    npt.assert_array_equal(second.spike_train.to_dense(), first.spike_train.to_dense())
+    npt.assert_array_equal(second.source, first.source)
+    npt.assert_array_equal(second.sil_score, first.sil_score)
+    monkeypatch.undo()
+
+    # Changing a late parameter only recomputes the stages downstream of it
+    emg = EMG(emg_data, max_sources=4, max_ica_iter=10, device='cpu', cache=cache)
+    emg.preprocess().run_ica(method='fastICA')
+    assert emg._stage_keys == {k: first._stage_keys[k] for k in ['preprocess', 'ica']}
+    emg.remove_duplicates(num_bins=40)
+    assert emg._stage_keys['duplicates'] != first._stage_keys['duplicates']
+
+    # Unseeded noise is never cached, seeded noise is
+    assert EMG(emg_data, inject_noise=20, cache=cache).preprocess()._stage_keys['preprocess'] is None
+    assert EMG(emg_data, inject_noise=20, noise_seed=1, cache=cache).preprocess()._stage_keys['preprocess']
+
+
+def test_lru_eviction(tmp_path):
+    """Test that the least recently used results are evicted beyond max_bytes."""
+    cache = StageCache(str(tmp_path), max_bytes=2500)
+    array = np.zeros(100)
+    keys = [cache.key('stage', 'data', index=i) for i in range(3)]
+    cache.save(keys[0], array=array)
+    os.utime(cache._path(keys[0]), ns=(1, 1))
+    cache.save(keys[1], array=array)
+    os.utime(cache._path(keys[1]), ns=(2, 2))
+    cache.load(keys[0])
+    cache.save(keys[2], array=array)
+    assert keys[0] in cache and keys[2] in cache and keys[1] not in cache
+    assert cache.load(keys[1]) is None
+    assert len(set(keys)) == 3
+    assert data_digest(array) == data_digest(array.copy()) != data_digest(array + 1)
+
+
+def test_awgn_seed():
+    """Test that seeded noise injection is reproducible."""
+    signal = generate_test_data()['emg_data']
+    npt.assert_array_equal(awgn(signal, 20, seed=3), awgn(signal, 20, seed=3))
+    assert not np.array_equal(awgn(signal, 20, seed=3), awgn(signal, 20, seed=4))
@@ -6,6 +6,7 @@ import pytest
 import numpy as np
 import numpy.testing as npt
 from emg2mu.core.decomposition import EMG
+from emg2mu.core.extension import WhitenedEMG
 from emg2mu.tests.test_utils import generate_test_data
 
 
@@ -45,6 +46,35 @@ def test_emg_preprocessing():
     emg = EMG(data=test_data['emg_data'], whiten_flag=False)
     emg.preprocess()
     assert emg._preprocessed is not None
+    assert emg.whitener is None
+
+    # Test reusing a fitted whitener with another method
+    emg = EMG(data=test_data['emg_data'])
+    emg.preprocess()
+    whitener = emg.whitener
+    emg.whiten_method = 'pca'
+    emg.preprocess(whitener=whitener)
+    assert emg.whitener is whitener
+    npt.assert_allclose(np.cov(emg._preprocessed.T, bias=True),
+                        np.eye(emg._preprocessed.shape[1]), atol=1e-2)
+
+
+def test_preprocessing_memory_budget():
+    """Test that the preprocessed matrix is dense within the memory budget and lazy beyond it."""
+    emg_data = generate_test_data()['emg_data']
+    dense = EMG(emg_data, extension_parameter=3).preprocess()
+    lazy = EMG(emg_data, extension_parameter=3, max_memory=0).preprocess()
+    assert isinstance(dense._preprocessed, np.ndarray)
+    assert isinstance(lazy._preprocessed, WhitenedEMG)
+    npt.assert_allclose(lazy._preprocessed.toarray(), dense._preprocessed)
+
+    unwhitened = EMG(emg_data, extension_parameter=3, whiten_flag=False, max_memory=None).preprocess()
+    assert isinstance(unwhitened._preprocessed, np.ndarray)
+
+    B = np.random.default_rng(0).standard_normal((dense._preprocessed.shape[1], 4))
+    npt.assert_allclose(lazy._preprocessed @ B, dense._preprocessed @ B, atol=1e-10)
+    npt.assert_allclose(lazy._preprocessed.T @ (lazy._preprocessed @ B),
+                        dense._preprocessed.T @ (dense._preprocessed @ B), rtol=1e-8)
 
 
 def test_emg_ica():
@@ -64,6 +94,11 @@ def test_emg_ica():
     assert emg._raw_spike_train.shape[1] == 4
     assert emg._raw_B.shape[1] == 4
 
+    # Test symmetric implementation
+    emg.run_ica(method='symmetric', block_size=2)
+    assert emg._raw_source.shape[1] == 4
+    assert emg._raw_B.shape[1] == 4
+
     # Test PyTorch implementation if available
     try:
         emg.run_ica(method='torch')
@@ -84,6 +119,9 @@ def test_duplicate_removal():
     assert emg.source is not None
     assert emg.good_idx is not None
 
+    emg.remove_duplicates(method='spike_times')
+    assert emg.spike_train.shape[1] == emg.source.shape[1] == len(emg.good_idx)
+
 
 def test_silhouette_scores():
     """Test silhouette score computation."""
@@ -137,6 +175,56 @@ def test_save_load():
             os.remove(output_file)
 
 
+def test_apply_decomposition(tmp_path):
+    """Test applying stored separation vectors and whitening to a recording."""
+    from emg2mu.utils.io import save_whitener
+    test_data = generate_test_data()
+    emg = EMG(data=test_data['emg_data'], max_sources=4, max_ica_iter=10)
+    emg.preprocess()
+    emg.run_ica(save_path=tmp_path / 'ica.npz')
+    save_whitener(tmp_path / 'whitener.npz', emg.whitener)
+
+    # Applying the calibration decomposition to the same recording reproduces it
+    applied = EMG(data=test_data['emg_data'])
+    applied.apply_decomposition(tmp_path / 'ica.npz', whitening=tmp_path / 'whitener.npz')
+    npt.assert_allclose(applied._raw_source, emg._raw_source, atol=1e-8)
+    npt.assert_array_equal(applied._raw_spike_train, emg._raw_spike_train)
+
+    # A new trial from the same grid is processed without running ICA
+    trial = EMG(data=test_data['emg_data'][::-1].copy())
+    trial.apply_decomposition(emg._raw_B, whitening=emg.whitener).remove_duplicates()
+    assert trial._raw_source.shape == (test_data['emg_data'].shape[0], 4)
+    assert trial.whitener is emg.whitener
+
+    with pytest.raises(ValueError):
+        trial.apply_decomposition(emg._raw_B[:-1])
+
+
+def test_apply_decomposition_preprocessing():
+    """Test the whitening method, disabled whitening and array shape of applied decompositions."""
+    emg_data = generate_test_data()['emg_data']
+    calibration = EMG(emg_data, whiten_method='pca', max_sources=4, max_ica_iter=10)
+    calibration.preprocess().run_ica()
+
+    # The method comes from the whitener, not from the instance
+    applied = EMG(emg_data, whiten_method='zca').apply_decomposition(
+        calibration._raw_B, whitening=calibration.whitener)
+    assert applied.whiten_method == 'pca'
+    npt.assert_allclose(applied._raw_source, calibration._raw_source, atol=1e-8)
+
+    with pytest.raises(ValueError, match='whitening is disabled'):
+        EMG(emg_data, whiten_flag=False).apply_decomposition(
+            calibration._raw_B, whitening=calibration.whitener)
+
+    # A new electrode layout preprocesses the data again
+    num_chan = emg_data.shape[1]
+    bipolar = EMG(emg_data, data_mode='bipolar', whiten_flag=False, extension_parameter=1)
+    bipolar.apply_decomposition(np.ones((2 * (num_chan - 2), 1)), array_shape=[2, num_chan // 2])
+    bipolar.apply_decomposition(np.ones((2 * (num_chan - 1), 1)), array_shape=[1, num_chan])
+    assert bipolar.array_shape == [1, num_chan]
+    assert bipolar._preprocessed.shape[1] == 2 * (num_chan - 1)
+
+
 def test_error_handling():
     """Test error handling in EMG class."""
     test_data = generate_test_data()
@@ -181,3 +269,46 @@ def test_bipolar_mode():
     array_shape = [2, 4]  # 2 rows, 4 columns
     emg.preprocess(array_shape=array_shape)
     assert emg._preprocessed is not None
+
+
+def test_run_ica_convergence_budget():
+    """Test that run_ica accepts convergence rules and returns fewer sources on a budget."""
+    emg = EMG(generate_test_data()['emg_data'], max_sources=6, max_ica_iter=50, device='cpu')
+    emg.preprocess().run_ica(convergence={'max_total_iter': 5})
+    assert emg.convergence.termination == 'iteration budget'
+    assert emg._raw_B.shape[1] < 6 and emg._raw_source.shape[1] == emg._raw_B.shape[1]
+    emg.remove_duplicates()
+
+
+def test_float32_pipeline():
+    """Test that a float32 EMG keeps its dtype through every stage and the stream."""
+    emg_data = generate_test_data()['emg_data']
+    emg = EMG(emg_data, max_sources=4, max_ica_iter=10, inject_noise=20, noise_seed=0,
+              dtype=np.float32, device='cpu')
+    emg.preprocess()
+    assert emg._preprocessed.dtype == np.float32
+    for method in ['fastICA', 'symmetric', 'torch']:
+        emg.run_ica(method=method)
+        assert emg._raw_source.dtype == np.float32 and emg._raw_B.dtype == np.float32
+    emg.remove_duplicates().compute_scores()
+    assert emg.source.dtype == np.float32
+
+    stream = emg.create_stream()
+    assert stream.projection.dtype == np.float32
+    stream.process(emg_data[:stream.chunk_size])
+
+    with pytest.raises(ValueError):
+        EMG(emg_data, dtype=np.int32)
+
+
+def test_truncated_whitening_pipeline():
+    """Test that the ICA runs in the truncated whitened space."""
+    emg = EMG(generate_test_data()['emg_data'], max_sources=50, max_ica_iter=10, device='cpu',
+              whiten_method='pca', whiten_components=12, whiten_solver='randomized')
+    emg.preprocess()
+    assert emg._preprocessed.shape[1] == 12
+    emg.run_ica()
+    assert emg._raw_B.shape == (12, 12)
+    assert np.all(np.isfinite(emg._raw_source))
+    stream = emg.remove_duplicates().create_stream()
+    assert stream.projection.shape[0] == (emg.extension_parameter + 1) * emg.data.shape[1]
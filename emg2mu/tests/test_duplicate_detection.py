@@ -0,0 +1,188 @@
+"""
+Tests for the duplicate detection module.
+"""
+
+import numpy as np
+import numpy.testing as npt
+import pytest
+from scipy.spatial.distance import cdist
+from emg2mu.core.spike_train import SpikeTrain
+from emg2mu.detection.duplicate_detection import (remove_duplicates, spike_time_histograms,
+                                                  cosine_distance_matrix, compute_silhouette_scores,
+                                                  fast_silhouette, clear_refractory_violations,
+                                                  rate_of_agreement, rate_of_agreement_matrix)
+
+
+def generate_duplicated_units(n_frames=20480, n_units=12, seed=0):
+    """Generate spike trains where some units are jittered copies of others."""
+    rng = np.random.default_rng(seed)
+    spike_train = np.zeros((n_frames, n_units))
+    for k in range(n_units):
+        if k % 3 == 2:
+            # Copy of the previous unit, shifted by a few samples
+            spike_train[:, k] = np.roll(spike_train[:, k - 1], rng.integers(1, 5))
+        else:
+            spike_idx = np.cumsum(rng.integers(100, 300, size=n_frames // 100))
+            spike_train[spike_idx[spike_idx < n_frames], k] = 1
+    source = rng.standard_normal((n_frames, n_units))
+    return spike_train, source
+
+
+def reference_duplicates(spike_train, plausible_firings, time_stamp, num_bins, threshold):
+    """Pairwise reference implementation of the histogram duplicate detection."""
+    duplicate_sources = []
+    for k in plausible_firings:
+        if k not in duplicate_sources:
+            for j in np.setdiff1d(plausible_firings[plausible_firings != k], duplicate_sources):
+                hist_1, _ = np.histogram(time_stamp[spike_train[:, k] == 1], bins=num_bins)
+                hist_2, _ = np.histogram(time_stamp[spike_train[:, j] == 1], bins=num_bins)
+                dist = cdist(hist_1[np.newaxis, :], hist_2[np.newaxis, :], metric='cosine')[0][0]
+                if dist < threshold:
+                    duplicate_sources.append(j)
+    return np.setdiff1d(plausible_firings, duplicate_sources)
+
+
+def test_spike_time_histograms_match_numpy():
+    """Test the one-pass histograms against np.histogram for every unit."""
+    rng = np.random.default_rng(1)
+    times = [np.sort(rng.uniform(0, 10, rng.integers(1, 200))) for _ in range(6)]
+    times.append(np.array([3.0, 3.0]))
+    times.append(np.array([]))
+    unit = np.concatenate([np.full(len(t), k) for k, t in enumerate(times)])
+
+    hist = spike_time_histograms(np.concatenate(times), unit, len(times), 50)
+
+    for k, t in enumerate(times):
+        npt.assert_array_equal(hist[k], np.histogram(t, bins=50)[0])
+
+
+def test_cosine_distance_matrix():
+    """Test the pairwise distances against scipy's cdist."""
+    hist = np.random.default_rng(2).integers(0, 5, size=(7, 20))
+    npt.assert_allclose(cosine_distance_matrix(hist), cdist(hist, hist, metric='cosine'),
+                        atol=1e-12)
+
+
+def test_remove_duplicates_matches_reference():
+    """Test that the vectorised detection keeps the same units as the pairwise loop."""
+    spike_train, source = generate_duplicated_units()
+    sampling_frequency = 2048
+    time_stamp = np.linspace(1 / sampling_frequency, spike_train.shape[0] / sampling_frequency,
+                             spike_train.shape[0])
+
+    cleaned, cleaned_source, good_idx = remove_duplicates(
+        spike_train.copy(), source, sampling_frequency, max_duplicate_time_diff=0.01,
+        num_bins=50)
+
+    plausible = np.arange(spike_train.shape[1])
+    expected = reference_duplicates(spike_train, plausible, time_stamp, 50, 0.01)
+    npt.assert_array_equal(good_idx, expected)
+    assert cleaned.shape[1] == cleaned_source.shape[1] == len(good_idx)
+    assert len(good_idx) == 8
+
+
+def test_clear_refractory_violations():
+    """Test the vectorised cleanup against greedy selection by amplitude."""
+    rng = np.random.default_rng(4)
+    n_frames, min_interval = 3000, 12
+    units = [np.unique(rng.integers(0, n_frames, size)) for size in [0, 5, 300, 600]]
+    source = rng.standard_normal((n_frames, 6))
+    columns = np.array([5, 0, 3, 1])
+
+    cleaned = clear_refractory_violations(SpikeTrain.from_units(units, n_frames), source, min_interval,
+                                          columns=columns)
+
+    for k, spikes in enumerate(units):
+        kept = []
+        for i in np.argsort(-np.abs(source[spikes, columns[k]])):
+            if all(abs(spikes[i] - spikes[j]) >= min_interval for j in kept):
+                kept.append(i)
+        npt.assert_array_equal(cleaned.unit(k), np.sort(spikes[kept]))
+
+    # The larger spike of a pair is kept, by its sample position
+    pair = SpikeTrain.from_units([[100, 105]], n_frames)
+    source = np.zeros((n_frames, 1))
+    source[105] = -2.0
+    source[100] = 1.0
+    npt.assert_array_equal(clear_refractory_violations(pair, source, 10).unit(0), [105])
+
+
+def test_rate_of_agreement_matrix():
+    """Test the all-pairs rates of agreement against the pairwise function."""
+    spike_train, _ = generate_duplicated_units(n_units=9)
+    spike_train = SpikeTrain.from_dense(spike_train)
+    spike_train = SpikeTrain.from_units(list(spike_train) + [np.array([], dtype=np.int64)],
+                                        spike_train.n_frames)
+
+    roa = rate_of_agreement_matrix(spike_train, tolerance=1, max_lag=8)
+
+    expected = np.array([[rate_of_agreement(a, b, 1, 8)[0] for b in spike_train] for a in spike_train])
+    npt.assert_allclose(roa, expected)
+    # The shifted copies agree fully with their originals
+    assert np.all(roa[[2, 5, 8], [1, 4, 7]] == 1.0)
+
+
+def test_remove_duplicates_spike_times():
+    """Test the spike-time duplicate detector."""
+    spike_train, source = generate_duplicated_units()
+
+    _, cleaned_source, good_idx = remove_duplicates(spike_train, source, 2048, method='spike_times',
+                                                    tolerance=0.0005, max_lag=0.003)
+
+    npt.assert_array_equal(good_idx, [k for k in range(12) if k % 3 != 2])
+    assert cleaned_source.shape[1] == len(good_idx)
+    with pytest.raises(ValueError):
+        remove_duplicates(spike_train, source, 2048, method='invalid')
+
+
+def test_parallel_silhouette_scores_reproducible():
+    """Test that seeded scores are reproducible and independent of the number of workers."""
+    spike_train, source = generate_duplicated_units()
+
+    serial = compute_silhouette_scores(spike_train, source, max_samples=200, seed=3)
+    parallel = compute_silhouette_scores(spike_train, source, max_samples=200, n_jobs=3, seed=3)
+
+    assert serial.shape == (spike_train.shape[1],)
+    npt.assert_array_equal(serial, parallel)
+    npt.assert_array_equal(serial, compute_silhouette_scores(spike_train, source, 200, seed=3))
+
+
+def reference_silhouette(data, labels):
+    """Mean silhouette from the full pairwise distance matrices (singletons excluded)."""
+    scores = []
+    for own, other in [(data[labels == 0], data[labels == 1]), (data[labels == 1], data[labels == 0])]:
+        if len(own) > 1:
+            a = np.abs(own[:, None] - own[None, :]).sum(axis=1) / (len(own) - 1)
+            b = np.abs(own[:, None] - other[None, :]).mean(axis=1)
+            scores.extend((b - a) / np.maximum(a, b))
+    return np.mean(scores)
+
+
+def test_fast_silhouette_matches_pairwise():
+    """Test the prefix-sum silhouette against the pairwise distance computation."""
+    rng = np.random.default_rng(4)
+    for n in [3, 10, 1000]:
+        data = rng.gamma(2, size=n) * 100 + 1e4
+        labels = (data > np.median(data)).astype(int)
+        labels[0] = 1 - labels[0]
+        npt.assert_allclose(fast_silhouette(data, labels), reference_silhouette(data, labels),
+                            rtol=1e-12)
+
+    assert fast_silhouette(np.array([1.0, 2.0]), np.array([0, 1])) == 0.0
+    assert fast_silhouette(np.array([1.0, 2.0]), np.array([1, 1])) == 0.0
+
+
+def test_fast_silhouette_column_vector():
+    """Test that a column vector of shape (n, 1) gives the score of the 1-D data."""
+    rng = np.random.default_rng(5)
+    data = np.concatenate([rng.normal(0, 1, 50), rng.normal(10, 1, 20)])
+    labels = (data > 5).astype(int)
+    assert fast_silhouette(data.reshape(-1, 1), labels) == fast_silhouette(data, labels)
+
+
+def test_silhouette_scores_use_all_peaks():
+    """Test that scoring all peaks is deterministic without a seed."""
+    spike_train, source = generate_duplicated_units()
+    scores = compute_silhouette_scores(spike_train, source)
+    npt.assert_array_equal(scores, compute_silhouette_scores(spike_train, source))
+    assert np.all((scores >= -1) & (scores <= 1))
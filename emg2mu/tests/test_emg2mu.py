@@ -1,4 +1,6 @@
 import os.path as op
+import subprocess
+import sys
 import numpy.testing as npt
 import emg2mu as ece
 import numpy as np
@@ -73,3 +75,14 @@ def test_spikeTrain_plot_spike_length():
     emg.plot(plot_type='spike_train', spike_length=0.005)
     emg.plot(plot_type='spike_train', spike_length=0.02)
     # Add assertions to verify the plot if needed
+
+
+def test_lazy_imports():
+    """
+    Test that importing the package and EMG does not load torch or the plotting libraries.
+    """
+    code = ("import sys, emg2mu; from emg2mu import EMG; "
+            "print(','.join(m for m in ['torch', 'plotly', 'matplotlib.pyplot'] if m in sys.modules))")
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                            cwd=op.dirname(ece.__path__[0]))
+    assert result.stdout.strip() == ''
@@ -0,0 +1,38 @@
+"""
+Tests for the headless figure export.
+"""
+
+import os
+import numpy as np
+import pytest
+from emg2mu.core.spike_train import SpikeTrain
+from emg2mu.utils.io import save_results
+from emg2mu.visualization.export import export_figures
+
+
+def write_results(directory, n=2):
+    rng = np.random.default_rng(0)
+    for i in range(n):
+        spike_train = SpikeTrain.from_units([np.arange(50 + i, 1950, 40), np.arange(70, 1950, 60)], 2000)
+        save_results(os.path.join(directory, f'session{i}_decomposed.npz'), spike_train,
+                     rng.standard_normal((2000, 2)), np.arange(2), np.array([0.95, 0.97]))
+
+
+def test_export_figures(tmp_path):
+    """Test the export of every figure and format of a results directory."""
+    write_results(tmp_path)
+    output_dir = str(tmp_path / 'figures')
+
+    rows = export_figures(str(tmp_path), output_dir, formats=('png', 'svg', 'html'))
+    assert [row['name'] for row in rows] == ['session0', 'session1']
+    assert all(row['error'] is None and len(row['files']) == 6 for row in rows)
+    for plot_type in ['spike_train', 'waveforms']:
+        for fmt in ['png', 'svg', 'html']:
+            assert os.path.getsize(os.path.join(output_dir, f'session1_{plot_type}.{fmt}')) > 0
+
+    # A failing recording is reported without stopping the export
+    rows = export_figures([str(tmp_path / 'missing.npz')], output_dir, plot_types=('spike_train',))
+    assert rows[0]['error'] is not None and rows[0]['files'] == []
+
+    with pytest.raises(ValueError):
+        export_figures(str(tmp_path), output_dir, formats=('gif',))
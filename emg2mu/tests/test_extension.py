@@ -0,0 +1,81 @@
+"""
+Tests for the lazy extended-EMG operators.
+"""
+
+import pytest
+import numpy as np
+import numpy.testing as npt
+import torch
+from emg2mu.core.extension import ExtendedEMG, WhitenedEMG
+from emg2mu.core.preprocessing import Whitener, whiten
+from emg2mu.core.ica import fastICA
+from emg2mu.tests.test_utils import generate_test_data
+
+
+def dense_extension(emg, extension_parameter):
+    """Reference dense extension, as built by the original preprocessing step."""
+    extended = np.zeros((emg.shape[0], emg.shape[1] * (extension_parameter + 1)))
+    extended[:, :emg.shape[1]] = emg
+    for i in range(1, extension_parameter + 1):
+        extended[i:, emg.shape[1] * i:emg.shape[1] * (i + 1)] = emg[:-i, :]
+    return extended
+
+
+@pytest.mark.parametrize('extension_parameter', [0, 1, 4, 12])
+def test_extended_products(extension_parameter):
+    """Test X @ w, X.T @ v, rows and statistics against the dense matrix."""
+    emg = generate_test_data()['emg_data'][:300]
+    X = dense_extension(emg, extension_parameter)
+    op = ExtendedEMG(emg, extension_parameter)
+    rng = np.random.default_rng(0)
+    w = rng.standard_normal((X.shape[1], 3))
+    v = rng.standard_normal((X.shape[0], 3))
+
+    assert op.shape == X.shape
+    npt.assert_allclose(op.toarray(), X)
+    npt.assert_allclose(op @ w, X @ w, atol=1e-10)
+    npt.assert_allclose(op @ w[:, 0], X @ w[:, 0], atol=1e-10)
+    npt.assert_allclose(op.T @ v, X.T @ v, atol=1e-10)
+    npt.assert_allclose(op.rows([0, 2, 299]), X[[0, 2, 299]])
+
+    n_samples, mean, scatter = op.statistics(chunk_size=64)
+    assert n_samples == X.shape[0]
+    npt.assert_allclose(mean, X.mean(axis=0), atol=1e-12)
+    npt.assert_allclose(scatter / n_samples, np.cov(X.T, bias=True), atol=1e-10)
+
+
+def test_whitened_operator():
+    """Test that whitening a lazy operator matches whitening the dense matrix."""
+    emg = generate_test_data()['emg_data']
+    op = ExtendedEMG(emg, 4)
+    Z = whiten(op)
+    Z_dense = whiten(dense_extension(emg, 4))
+    rng = np.random.default_rng(1)
+    w = rng.standard_normal((Z.shape[1], 2))
+    v = rng.standard_normal((Z.shape[0], 2))
+
+    assert isinstance(Z, WhitenedEMG)
+    npt.assert_allclose(np.asarray(Z), Z_dense, atol=1e-8)
+    npt.assert_allclose(Z @ w, Z_dense @ w, atol=1e-8)
+    npt.assert_allclose(Z.T @ v, Z_dense.T @ v, atol=1e-8)
+
+    # The same products in torch
+    Z_torch = Z.to_torch('cpu', torch.float64)
+    npt.assert_allclose((Z_torch @ torch.as_tensor(w)).numpy(), Z_dense @ w, atol=1e-8)
+    npt.assert_allclose((Z_torch.T @ torch.as_tensor(v)).numpy(), Z_dense.T @ v, atol=1e-8)
+
+    # A whitener fitted on the operator has the exact statistics of the dense matrix
+    whitener = Whitener().fit(op)
+    npt.assert_allclose(whitener.covariance, np.cov(dense_extension(emg, 4).T, bias=True),
+                        atol=1e-10)
+
+
+def test_fastica_accepts_operator():
+    """Test that FastICA runs on a lazy operator without materialising it."""
+    emg = generate_test_data()['emg_data']
+    Z = whiten(ExtendedEMG(emg, 2))
+
+    source, B, spike_train = fastICA(Z, 3, 10)
+
+    assert source.shape == (emg.shape[0], 3)
+    npt.assert_allclose(source, np.asarray(Z) @ B, atol=1e-8)
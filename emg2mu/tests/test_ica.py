@@ -6,7 +6,10 @@ import pytest
 import numpy as np
 import numpy.testing as npt
 import torch
-from emg2mu.core.ica import fastICA, torch_fastICA, select_device
+from emg2mu.core.ica import fastICA, torch_fastICA, symmetric_fastICA, select_device
+from emg2mu.core.convergence import ConvergenceController
+from emg2mu.core.preprocessing import whiten
+from emg2mu.core.spike_train import SpikeTrain
 from emg2mu.tests.test_utils import generate_test_data
 
 
@@ -27,10 +30,10 @@ def test_fastica():
     # Check data types
     assert isinstance(source, np.ndarray)
     assert isinstance(B, np.ndarray)
-    assert isinstance(spike_train, np.ndarray)
+    assert isinstance(spike_train, SpikeTrain)
 
     # Check spike train values are binary
-    assert np.all(np.unique(spike_train) == np.array([0, 1]))
+    assert np.all(np.unique(spike_train.to_dense()) == np.array([0, 1]))
 
 
 def test_torch_fastica():
@@ -61,10 +64,10 @@ def test_torch_fastica():
         # Check data types
         assert isinstance(source, np.ndarray)
         assert isinstance(B, np.ndarray)
-        assert isinstance(spike_train, np.ndarray)
+        assert isinstance(spike_train, SpikeTrain)
 
         # Check spike train values are binary
-        assert np.all(np.unique(spike_train) == np.array([0, 1]))
+        assert np.all(np.unique(spike_train.to_dense()) == np.array([0, 1]))
 
 
 def test_device_selection():
@@ -132,7 +135,94 @@ def test_torch_fastica_consistency():
 
     # Compare spike counts with relaxed tolerance
     npt.assert_allclose(
-        np.sort(np.sum(cpu_spikes, axis=0)),
-        np.sort(np.sum(torch_spikes, axis=0)),
+        np.sort(cpu_spikes.counts),
+        np.sort(torch_spikes.counts),
         rtol=0.3  # Increased tolerance for more reliable testing
     )
+
+
+def test_symmetric_fastica():
+    """Test the symmetric (block-parallel) FastICA implementation."""
+    test_data = generate_test_data()
+    emg_data = test_data['emg_data']
+
+    for block_size in [None, 3]:
+        source, B, spike_train = symmetric_fastICA(emg_data, 6, 50, block_size=block_size)
+
+        assert source.shape == (emg_data.shape[0], 6)
+        assert B.shape == (emg_data.shape[1], 6)
+        assert spike_train.shape == (emg_data.shape[0], 6)
+
+        # Unmixing vectors are orthonormal across blocks
+        npt.assert_allclose(B.T @ B, np.eye(6), atol=1e-6)
+
+    with pytest.raises(ValueError):
+        symmetric_fastICA(emg_data, emg_data.shape[1] + 1, 10)
+
+
+def test_symmetric_fastica_convergence():
+    """Test symmetric FastICA separation of simple mixed signals."""
+    t = np.linspace(0, 10, 1000)
+    S = np.c_[np.sin(2 * np.pi * t), np.sign(np.sin(3 * np.pi * t))]
+    X = np.dot(S, np.array([[1, 1], [0.5, 2]]).T)
+
+    source, _, _ = symmetric_fastICA(X, 2, 200)
+
+    corr_matrix = np.abs(np.corrcoef(source.T, S.T))[:2, 2:]
+    assert np.all(np.max(corr_matrix, axis=1) > 0.85)
+
+
+def test_torch_fastica_batched():
+    """Test the batched multi-start deflation mode of torch_fastICA."""
+    test_data = generate_test_data()
+    emg_data = test_data['emg_data']
+
+    source, B, spike_train = torch_fastICA(emg_data, 6, 50, device='cpu', batch_size=4)
+
+    assert source.shape == (emg_data.shape[0], 6)
+    assert B.shape == (emg_data.shape[1], 6)
+    assert spike_train.shape == (emg_data.shape[0], 6)
+
+    # Vectors within and across blocks are orthonormal
+    npt.assert_allclose(B.T @ B, np.eye(6), atol=1e-3)
+    npt.assert_allclose(source, emg_data @ B, rtol=1e-3, atol=1e-3)
+
+    with pytest.raises(ValueError):
+        torch_fastICA(emg_data, emg_data.shape[1] + 1, 10, device='cpu', batch_size=4)
+
+
+def test_convergence_controller():
+    """Test sign-invariant convergence, stall detection and the iteration budget."""
+    controller = ConvergenceController(tolerance=1e-5, stall_iter=3, max_total_iter=8).start()
+    controller.start_source()
+    assert controller.should_stop(-1.0)
+    assert controller.source_status == ['converged']
+
+    controller.start_source()
+    assert not any(controller.should_stop(dot) for dot in [0.5, 0.9, 0.8, 0.8])
+    assert controller.should_stop(0.7)
+    assert controller.source_status[-1] == 'stalled' and controller.iterations[-1] == 4
+    assert not controller.exhausted
+
+    controller.start_source()
+    stops = [controller.should_stop(0.1 * k) for k in range(1, 6)]
+    assert stops == [False] * 4 + [True]
+    assert controller.source_status[-1] == 'budget' and controller.total_iter == 8
+    assert controller.exhausted and controller.termination == 'iteration budget'
+
+
+def test_fastica_early_stop():
+    """Test that the extraction stops after consecutive rejected sources or a spent budget."""
+    noise = whiten(np.random.default_rng(0).standard_normal((4000, 16)))
+    controller = ConvergenceController(max_rejected=3)
+    source, B, spike_train = fastICA(noise, 10, 50, controller=controller)
+    assert source.shape == (4000, 3) and B.shape == (16, 3) and spike_train.shape == (4000, 3)
+    assert controller.termination == 'rejected sources' and all(controller.rejected)
+
+    controller = ConvergenceController(max_total_iter=30)
+    source, B, _ = symmetric_fastICA(noise, 8, 50, block_size=2, controller=controller)
+    assert B.shape[1] < 8 and controller.total_iter == 30
+    assert controller.termination == 'iteration budget'
+
+    with pytest.raises(ValueError):
+        torch_fastICA(noise, 4, 10, device='cpu', batch_size=2, controller=controller)
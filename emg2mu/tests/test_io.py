@@ -0,0 +1,103 @@
+"""
+Tests for the lazy recording loader.
+"""
+
+import pytest
+import numpy as np
+import numpy.testing as npt
+from emg2mu import EMG
+from emg2mu.utils.io import LazyRecording, load_recording, load_mat_data
+from emg2mu.tests.test_utils import generate_test_data
+
+
+def write_v73_mat(file_path, emg_data, sampling_frequency, **dataset_kwargs):
+    """Write a MATLAB v7.3-style file: an HDF5 file with a MAT header and a cell 'Data'."""
+    h5py = pytest.importorskip('h5py')
+    with h5py.File(file_path, 'w', userblock_size=512) as f:
+        # MATLAB stores arrays column-major, i.e. transposed in HDF5
+        cell = f.create_dataset('#refs#/a', data=emg_data.T, **dataset_kwargs)
+        refs = f.create_dataset('Data', (1, 1), dtype=h5py.ref_dtype)
+        refs[0, 0] = cell.ref
+        f['SamplingFrequency'] = np.array([[sampling_frequency]], dtype=float)
+    header = b'MATLAB 7.3 MAT-file'.ljust(116) + b'\x00' * 8 + b'\x00\x02' + b'IM'
+    with open(file_path, 'r+b') as f:
+        f.write(header)
+
+
+def test_npy_selection_and_chunks(tmp_path):
+    """Test memory-mapped .npy loading with channel/time selection and chunked iteration."""
+    emg_data = generate_test_data()['emg_data']
+    np.save(tmp_path / 'emg.npy', emg_data)
+
+    recording = load_recording(tmp_path / 'emg.npy', sampling_frequency=100)
+    assert recording.shape == emg_data.shape
+    assert isinstance(recording.toarray(), np.memmap)
+    npt.assert_array_equal(recording[10:20, 3], emg_data[10:20, 3])
+    npt.assert_array_equal(recording[[5, 2, 7]], emg_data[[5, 2, 7]])
+
+    view = recording.select(channels=[4, 1, 6], time_range=(1, 5)).select(channels=[2, 0])
+    expected = emg_data[100:500][:, [6, 4]]
+    assert view.shape == expected.shape
+    npt.assert_array_equal(np.asarray(view), expected)
+    npt.assert_array_equal(np.concatenate(list(view.iter_chunks(64))), expected)
+
+    with pytest.raises(ValueError):
+        load_recording(tmp_path / 'emg.npy', time_range=(0, 1))
+
+
+def test_raw_binary(tmp_path):
+    """Test memory-mapped raw binary recordings of interleaved samples."""
+    emg_data = (generate_test_data()['emg_data'] * 1000).astype(np.int16)
+    emg_data.tofile(tmp_path / 'emg.bin')
+
+    recording = load_recording(tmp_path / 'emg.bin', 2048, num_channels=emg_data.shape[1],
+                               dtype=np.int16)
+    npt.assert_array_equal(recording.toarray(), emg_data)
+    assert recording.toarray(np.float32).dtype == np.float32
+
+    with pytest.raises(ValueError):
+        load_recording(tmp_path / 'emg.bin')
+
+
+@pytest.mark.parametrize('dataset_kwargs', [{}, {'chunks': True, 'compression': 'gzip'}])
+def test_mat_v73(tmp_path, dataset_kwargs):
+    """Test MATLAB v7.3 loading, memory-mapped or through chunked HDF5 reads."""
+    emg_data = generate_test_data()['emg_data']
+    write_v73_mat(tmp_path / 'emg.mat', emg_data, 2048, **dataset_kwargs)
+
+    data, sampling_frequency = load_mat_data(tmp_path / 'emg.mat')
+    assert isinstance(data, LazyRecording)
+    assert sampling_frequency == 2048
+    npt.assert_array_equal(data.toarray(), emg_data)
+    npt.assert_array_equal(data.select(channels=[0, 5])[100:200], emg_data[100:200, [0, 5]])
+
+
+def test_emg_from_lazy_recording(tmp_path):
+    """Test that EMG decomposes a lazily loaded recording like the in-memory array."""
+    emg_data = generate_test_data()['emg_data']
+    np.save(tmp_path / 'emg.npy', emg_data)
+
+    emg = EMG(str(tmp_path / 'emg.npy'), sampling_frequency=1000, extension_parameter=2)
+    assert isinstance(emg.data, LazyRecording)
+    assert emg.sampling_frequency == 1000
+    emg.preprocess()
+
+    reference = EMG(emg_data, sampling_frequency=1000, extension_parameter=2).preprocess()
+    w = np.random.randn(emg._preprocessed.shape[1])
+    npt.assert_allclose(emg._preprocessed @ w, reference._preprocessed @ w)
+
+
+def test_emg_derives_lazy_recording_by_chunks(tmp_path, monkeypatch):
+    """Test that cast, noise and bipolar montage of a lazy recording never read it whole."""
+    emg_data = generate_test_data()['emg_data']
+    write_v73_mat(tmp_path / 'emg.mat', emg_data, 2048, chunks=True)
+    monkeypatch.setattr(LazyRecording, 'toarray', lambda *args, **kwargs: pytest.fail('read whole'))
+    params = dict(data_mode='bipolar', inject_noise=20, noise_seed=3, dtype=np.float32,
+                  extension_parameter=2, max_memory=0)
+
+    emg = EMG(str(tmp_path / 'emg.mat'), **params).preprocess(array_shape=[2, 4])
+    derived = emg._preprocessed.operator.emg
+    assert isinstance(derived, np.memmap) and derived.dtype == np.float32
+
+    reference = EMG(emg_data, **params).preprocess(array_shape=[2, 4])
+    npt.assert_allclose(derived, reference._preprocessed.operator.emg, rtol=1e-5, atol=1e-5)
@@ -0,0 +1,80 @@
+"""
+Tests for the peak classification module.
+"""
+
+import numpy as np
+import numpy.testing as npt
+from scipy.signal import find_peaks
+from emg2mu.detection.peak_classification import (find_source_peaks, two_means_1d,
+                                                  classify_peaks, detect_spikes)
+from emg2mu.tests.test_utils import generate_test_data
+
+
+def brute_force_split(values):
+    """Return the size of the upper cluster of the optimal 1-D two-means split."""
+    x = np.sort(values)
+    sse = [np.sum((x[:k] - x[:k].mean()) ** 2) + np.sum((x[k:] - x[k:].mean()) ** 2)
+           for k in range(1, len(x))]
+    return len(x) - (np.argmin(sse) + 1)
+
+
+def test_two_means_matches_brute_force():
+    """Test that the prefix-sum split is the exact two-means optimum for every row."""
+    rng = np.random.default_rng(0)
+    rows = [np.concatenate([rng.gamma(1, 1, rng.integers(2, 50)),
+                            rng.normal(8, 1, rng.integers(0, 10))]) for _ in range(50)]
+    counts = np.array([len(r) for r in rows])
+    values = np.full((len(rows), counts.max()), np.nan)
+    for i, r in enumerate(rows):
+        values[i, :counts[i]] = r
+
+    upper, threshold = two_means_1d(values, counts)
+
+    for i, r in enumerate(rows):
+        assert upper[i].sum() == brute_force_split(r)
+        # The threshold separates the two clusters
+        npt.assert_array_equal(upper[i, :counts[i]], r > threshold[i])
+    assert not np.any(upper[~(np.arange(values.shape[1]) < counts[:, np.newaxis])])
+
+
+def test_two_means_degenerate_rows():
+    """Test rows with fewer than two values have no split."""
+    values = np.array([[1.0, np.nan, np.nan], [np.nan, np.nan, np.nan], [1.0, 2.0, 10.0]])
+    upper, threshold = two_means_1d(values)
+
+    assert not upper[:2].any()
+    assert np.isnan(threshold[:2]).all()
+    npt.assert_array_equal(upper[2], [False, False, True])
+
+
+def test_find_source_peaks():
+    """Test padded peak collection against scipy's find_peaks."""
+    source = generate_test_data()['emg_data'][:, :3]
+    loc, pks, counts = find_source_peaks(source)
+
+    for i in range(3):
+        expected, _ = find_peaks(source[:, i] ** 2)
+        npt.assert_array_equal(loc[i, :counts[i]], expected)
+        npt.assert_allclose(pks[i, :counts[i]], source[expected, i] ** 2)
+        assert np.all(loc[i, counts[i]:] == -1)
+
+
+def test_detect_spikes():
+    """Test that spikes are the smaller, high-amplitude peak cluster."""
+    rng = np.random.default_rng(1)
+    source = 0.1 * rng.standard_normal((4000, 3))
+    true_spikes = np.sort(rng.choice(np.arange(5, 3995), 40, replace=False))
+    true_spikes = true_spikes[np.r_[True, np.diff(true_spikes) > 2]]
+    source[true_spikes] += 5
+
+    spike_locs = detect_spikes(source, chunk_size=2)
+
+    assert len(spike_locs) == 3
+    for locs in spike_locs:
+        npt.assert_array_equal(locs, true_spikes)
+
+    _, pks, counts = find_source_peaks(source)
+    spikes, labels, threshold, spike_is_upper = classify_peaks(pks, counts)
+    assert spike_is_upper.all()
+    npt.assert_array_equal(spikes, labels.astype(bool))
+    assert np.all(threshold > 1) and np.all(threshold < 25)
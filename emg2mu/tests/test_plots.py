@@ -0,0 +1,80 @@
+"""
+Tests for the visualization module.
+"""
+
+import matplotlib
+import numpy as np
+import numpy.testing as npt
+import pytest
+from emg2mu.core.spike_train import SpikeTrain
+from emg2mu.visualization.plots import plot_spike_train, plot_waveforms, raster_coordinates
+
+matplotlib.use('Agg')
+
+
+def test_raster_coordinates():
+    """Test the NaN-separated raster coordinates, row order, range and decimation."""
+    spike_train = SpikeTrain.from_units([[10, 20], [], [5, 6, 7, 400]], 1000)
+
+    x, y, rows = raster_coordinates(spike_train, order=[2, 0, 1], spike_height=0.5)
+    assert len(x) == len(y) == 3 * 6
+    assert np.all(np.isnan(x[2::3])) and np.all(np.isnan(y[2::3]))
+    npt.assert_array_equal(x[0::3], [10, 20, 5, 6, 7, 400])
+    npt.assert_array_equal(rows, [1, 1, 0, 0, 0, 0])
+    npt.assert_array_equal(y[1::3] - y[0::3], 0.5)
+
+    # Units missing from the order are left out
+    x, y, rows = raster_coordinates(spike_train, order=[2, 0])
+    npt.assert_array_equal(x[0::3], [10, 20, 5, 6, 7, 400])
+    npt.assert_array_equal(rows, [1, 1, 0, 0, 0, 0])
+    x, _, rows = raster_coordinates(spike_train, order=[0])
+    npt.assert_array_equal(x[0::3], [10, 20])
+    npt.assert_array_equal(rows, [0, 0])
+
+    x, _, rows = raster_coordinates(spike_train, sampling_frequency=100, x_range=(0, 1))
+    npt.assert_array_equal(x[0::3], [0.1, 0.2, 0.05, 0.06, 0.07])
+
+    # Spikes of a unit in the same of 10 bins are drawn once
+    x, _, rows = raster_coordinates(spike_train, resolution=10)
+    npt.assert_array_equal(x[0::3], [10, 5, 400])
+    npt.assert_array_equal(rows, [0, 2, 2])
+
+
+def test_plot_spike_train_backends():
+    """Test the WebGL and matplotlib rasters."""
+    rng = np.random.default_rng(0)
+    spike_train = SpikeTrain.from_dense(rng.random((2000, 6)) > 0.97)
+
+    fig = plot_spike_train(spike_train, 2048, min_score=0, show=False)
+    assert len(fig.data) == 6 and all(trace.type == 'scattergl' for trace in fig.data)
+    assert sum(len(trace.x) for trace in fig.data) == 3 * len(spike_train.indices)
+
+    fig = plot_spike_train(spike_train, 2048, min_score=0, color_plot=False, show=False)
+    assert len(fig.data) == 1
+
+    fig = plot_spike_train(spike_train, 2048, min_score=0, backend='matplotlib', show=False)
+    assert len(fig.axes[0].lines) == 6
+
+    # A shown figure is not returned, so that notebooks render it once
+    assert plot_spike_train(spike_train, 2048, min_score=0, backend='matplotlib') is None
+
+    with pytest.raises(ValueError):
+        plot_spike_train(spike_train, 2048, backend='bokeh', show=False)
+
+
+def test_plot_waveforms_overlay():
+    """Test that the individual spikes of a unit are drawn as one trace."""
+    rng = np.random.default_rng(1)
+    spike_train = SpikeTrain.from_units([np.arange(50, 1950, 40), np.arange(70, 1950, 60)], 2000)
+    source = rng.standard_normal((2000, 2))
+
+    fig = plot_waveforms(source, spike_train, 2048, plot_individual=True, show=False)
+    overlays = [trace for trace in fig.data if trace.type == 'scattergl']
+    assert len(overlays) == 2
+    assert np.sum(np.isnan(np.asarray(overlays[0].y, dtype=float))) == spike_train.counts[0]
+
+    fig = plot_waveforms(source, spike_train, 2048, plot_individual=True, n_cols=3,
+                         backend='matplotlib', show=False)
+    assert len(fig.axes) == 3 and not fig.axes[2].axison
+    assert len(fig.axes[0].lines) == 2 and len(fig.axes[0].collections) == 1
+    assert plot_waveforms(source, spike_train, 2048, backend='matplotlib') is None
@@ -0,0 +1,102 @@
+"""
+Tests for the preprocessing module.
+"""
+
+import pytest
+import numpy as np
+import numpy.testing as npt
+from emg2mu.core.preprocessing import Whitener, whiten, awgn, WHITEN_METHODS, WHITEN_SOLVERS
+from emg2mu.tests.test_utils import generate_test_data
+from emg2mu.utils.io import save_whitener, load_whitener
+
+
+@pytest.mark.parametrize('method', WHITEN_METHODS)
+def test_whiten_identity_covariance(method):
+    """Test that every whitening method produces (near) identity covariance."""
+    emg_data = generate_test_data()['emg_data'] + 5
+    X_hat = whiten(emg_data, method=method)
+
+    npt.assert_allclose(X_hat.mean(axis=0), 0, atol=1e-10)
+    npt.assert_allclose(np.cov(X_hat.T, bias=True), np.eye(emg_data.shape[1]), atol=1e-3)
+
+
+def test_whitener_streaming_statistics():
+    """Test that chunked accumulation matches the full-batch mean and covariance."""
+    emg_data = generate_test_data()['emg_data'] * 100 + 1e3
+    whitener = Whitener(chunk_size=77).fit(emg_data)
+
+    assert whitener.n_samples == emg_data.shape[0]
+    npt.assert_allclose(whitener.mean, emg_data.mean(axis=0))
+    npt.assert_allclose(whitener.covariance, np.cov(emg_data.T, bias=True), rtol=1e-10)
+
+    # Manual partial fits in uneven chunks give the same statistics
+    partial = Whitener()
+    for chunk in np.array_split(emg_data, [10, 11, 500]):
+        partial.partial_fit(chunk)
+    npt.assert_allclose(partial.covariance, whitener.covariance, rtol=1e-10)
+
+
+def test_whitener_transform_in_place_and_cache():
+    """Test in-place chunked transform and reuse of the cached whitening matrix."""
+    emg_data = generate_test_data()['emg_data']
+    whitener = Whitener(chunk_size=100).fit(emg_data)
+    expected = whiten(emg_data)
+
+    X = emg_data.copy()
+    result = whitener.transform(X, out=X)
+    assert result is X
+    npt.assert_allclose(X, expected, atol=1e-10)
+
+    assert whitener.whitening_matrix() is whitener.whitening_matrix('zca')
+    pca = whitener.transform(emg_data, method='pca')
+    npt.assert_allclose(np.cov(pca.T, bias=True), np.eye(emg_data.shape[1]), atol=1e-3)
+
+    with pytest.raises(Exception):
+        whitener.transform(emg_data, method='invalid')
+    with pytest.raises(ValueError):
+        Whitener().covariance
+
+
+@pytest.mark.parametrize('solver', WHITEN_SOLVERS)
+def test_truncated_whitening(solver, tmp_path):
+    """Test that truncated whitening keeps the leading components with every solver."""
+    rng = np.random.default_rng(0)
+    # 60 channels of mostly low-rank data
+    emg_data = rng.standard_normal((5000, 6)) @ rng.standard_normal((6, 60)) + 0.01 * rng.standard_normal((5000, 60))
+    full = Whitener('pca').fit(emg_data)
+
+    whitener = Whitener('pca', n_components=6, solver=solver).fit(emg_data)
+    X_hat = whitener.transform(emg_data)
+    assert X_hat.shape == (5000, 6)
+    npt.assert_allclose(np.cov(X_hat.T, bias=True), np.eye(6), atol=1e-3)
+    # Same components as the full decomposition, up to their signs
+    npt.assert_allclose(np.abs(whitener.whitening_matrix()), np.abs(full.whitening_matrix()[:6]), atol=1e-6)
+
+    # A variance fraction selects the number of components
+    fraction = Whitener('pca_cor', n_components=0.99, solver=solver).fit(emg_data)
+    assert fraction.whitening_matrix().shape == (6, 60)
+
+    with pytest.raises(ValueError):
+        whitener.whitening_matrix('zca')
+
+    save_whitener(tmp_path / 'whitener.npz', whitener)
+    loaded = load_whitener(tmp_path / 'whitener.npz')
+    assert (loaded.n_components, loaded.solver, loaded.seed) == (6, solver, 0)
+    npt.assert_allclose(loaded.transform(emg_data), X_hat)
+
+
+def test_whitener_invalid_truncation():
+    """Test the validation of the truncation parameters."""
+    with pytest.raises(ValueError):
+        Whitener('pca', solver='svd')
+    with pytest.raises(ValueError):
+        Whitener('pca', n_components=1.5)
+    with pytest.raises(ValueError):
+        Whitener('pca', n_components=0)
+
+
+def test_awgn_dtype():
+    """Test that awgn keeps the floating-point type of its input."""
+    signal = np.random.randn(1000, 4).astype(np.float32)
+    assert awgn(signal, 20, seed=0).dtype == np.float32
+    assert awgn(signal.astype(np.float64), 20, seed=0).dtype == np.float64
@@ -0,0 +1,69 @@
+"""
+Tests for the stage profiler.
+"""
+
+import json
+import numpy as np
+from emg2mu.core.decomposition import EMG
+from emg2mu.utils.profiling import Profiler, stage
+from emg2mu.tests.test_utils import generate_test_data
+
+
+def test_nested_stages():
+    """Test record fields, nesting, allocation peaks and hooks."""
+    seen = []
+    profiler = Profiler(hooks=[seen.append])
+    with profiler.stage('outer', run=1):
+        with profiler.stage('inner') as record:
+            data = np.ones(1_000_000)
+            record['iterations'] = 3
+        del data
+        with stage(None, 'ignored') as record:
+            record['iterations'] = 1
+
+    inner, outer = profiler.records
+    assert [r['name'] for r in seen] == ['inner', 'outer']
+    assert inner['parent'] == 'outer' and inner['depth'] == 1 and inner['iterations'] == 3
+    assert outer['parent'] is None and outer['run'] == 1
+    assert inner['peak_alloc_bytes'] >= 8_000_000
+    assert outer['peak_alloc_bytes'] >= inner['peak_alloc_bytes']
+    assert outer['wall_time'] >= inner['wall_time'] >= 0
+    assert outer['peak_rss_bytes'] is None or outer['peak_rss_bytes'] > 0
+
+
+def test_stages_without_reset_peak(monkeypatch):
+    """Test the allocation peaks where tracemalloc.reset_peak is missing (Python 3.8)."""
+    monkeypatch.delattr('tracemalloc.reset_peak')
+    profiler = Profiler()
+    with profiler.stage('outer'):
+        data = np.ones(1_000_000)
+        del data
+        with profiler.stage('inner'):
+            small = np.ones(10_000)
+        del small
+
+    inner, outer = profiler.records
+    assert 80_000 <= inner['peak_alloc_bytes'] < 8_000_000
+    assert outer['peak_alloc_bytes'] >= 8_000_000
+
+
+def test_emg_profiling(tmp_path):
+    """Test that the EMG pipeline reports every stage and exports the records."""
+    profiler = Profiler(trace_memory=False)
+    emg = EMG(generate_test_data()['emg_data'], max_sources=3, max_ica_iter=10,
+              device='cpu', profiler=profiler)
+    emg.preprocess().run_ica().remove_duplicates().compute_scores()
+
+    summary = profiler.summary()
+    for name in ['preprocess', 'whitening', 'ica', 'ica_source', 'spike_detection',
+                 'peak_detection', 'peak_classification', 'duplicate_removal', 'scoring']:
+        assert name in summary
+    assert summary['ica_source']['calls'] == 3
+    assert all(r['parent'] == 'ica' and 0 <= r['iterations'] < 10 for r in profiler.select('ica_source'))
+
+    columns = profiler.to_dict()
+    assert len(columns['name']) == len(profiler.records)
+    assert columns['peak_alloc_bytes'] == [None] * len(profiler.records)
+    profiler.to_json(str(tmp_path / 'profile.json'))
+    with open(tmp_path / 'profile.json') as f:
+        assert [r['name'] for r in json.load(f)] == columns['name']
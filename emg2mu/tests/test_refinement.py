@@ -0,0 +1,71 @@
+"""
+Tests for the refinement of separation vectors.
+"""
+
+import numpy as np
+import numpy.testing as npt
+import pytest
+from emg2mu.core.decomposition import EMG
+from emg2mu.core.extension import ExtendedEMG
+from emg2mu.core.ica import fastICA
+from emg2mu.core.preprocessing import whiten
+from emg2mu.core.refinement import refine_separation
+from emg2mu.detection.duplicate_detection import compute_silhouette_scores
+from emg2mu.utils.synthetic import generate_hdemg
+
+
+@pytest.fixture(scope='module')
+def decomposition():
+    recording = generate_hdemg(n_units=12, grid_shape=(4, 4), duration=10.0, snr=5, seed=1)
+    X = whiten(ExtendedEMG(recording['emg_data'], 8))
+    np.random.seed(0)
+    source, B, spike_train = fastICA(X, 8, 4)
+    return recording, X, source, B, spike_train
+
+
+def test_refine_separation(decomposition):
+    """Test that refinement raises the silhouette scores and keeps unit-norm vectors."""
+    _, X, source, B, spike_train = decomposition
+    refined_source, refined_B, refined_train = refine_separation(X, B, spike_train, source)
+
+    assert refined_B.shape == B.shape and refined_train.shape == spike_train.shape
+    npt.assert_allclose(np.linalg.norm(refined_B, axis=0), 1, rtol=1e-6)
+    npt.assert_allclose(refined_source, X @ refined_B, atol=1e-8)
+
+    before = compute_silhouette_scores(spike_train, source)
+    after = compute_silhouette_scores(refined_train, refined_source)
+    assert np.all(after >= before - 1e-12)
+    assert np.mean(after) > np.mean(before)
+
+    # The lazy operator and the dense matrix give the same refinement
+    _, dense_B, _ = refine_separation(X.toarray(), B, spike_train, source)
+    npt.assert_allclose(dense_B, refined_B, atol=1e-8)
+
+
+def test_refine_separation_no_spikes(decomposition):
+    """Test that units without enough spikes are left unchanged."""
+    _, X, source, B, spike_train = decomposition
+    refined_source, refined_B, refined_train = refine_separation(X, B, spike_train, source, min_spikes=10 ** 6)
+    npt.assert_array_equal(refined_B, B)
+    npt.assert_array_equal(refined_train.indices, spike_train.indices)
+
+
+def test_emg_refine(decomposition, tmp_path):
+    """Test the refinement stage of the EMG class and its cache."""
+    recording = decomposition[0]
+    emg = EMG(recording['emg_data'], max_sources=4, max_ica_iter=4, extension_parameter=8,
+              cache=str(tmp_path))
+    with pytest.raises(ValueError):
+        emg.refine()
+
+    np.random.seed(0)
+    emg.preprocess().run_ica()
+    B = emg._raw_B
+    emg.refine(max_iter=5)
+    assert emg._raw_B.shape == B.shape
+    emg.remove_duplicates().compute_scores()
+
+    cached = EMG(recording['emg_data'], max_sources=4, max_ica_iter=4, extension_parameter=8,
+                 cache=str(tmp_path))
+    cached.preprocess().run_ica().refine(max_iter=5)
+    npt.assert_array_equal(cached._raw_B, emg._raw_B)
@@ -0,0 +1,62 @@
+"""
+Tests for the sparse spike-train representation.
+"""
+
+import numpy as np
+import numpy.testing as npt
+from emg2mu.core.spike_train import SpikeTrain, as_spike_train
+from emg2mu.utils.io import save_results, load_results, save_ica_results, load_ica_results
+
+
+def generate_dense_spike_train(n_frames=2000, n_units=6, seed=0):
+    rng = np.random.default_rng(seed)
+    dense = (rng.random((n_frames, n_units)) > 0.97).astype(float)
+    dense[:, 2] = 0  # a unit without spikes
+    return dense
+
+
+def test_dense_round_trip():
+    """Test conversion between the dense and sparse layouts."""
+    dense = generate_dense_spike_train()
+    spike_train = SpikeTrain.from_dense(dense)
+
+    assert spike_train.shape == dense.shape
+    npt.assert_array_equal(spike_train.counts, dense.sum(axis=0))
+    npt.assert_array_equal(spike_train.to_dense(), dense)
+    npt.assert_array_equal(np.asarray(spike_train), dense)
+    for k in range(dense.shape[1]):
+        npt.assert_array_equal(spike_train.unit(k), np.where(dense[:, k] == 1)[0])
+
+    units = [np.where(dense[:, k])[0] for k in range(dense.shape[1])]
+    npt.assert_array_equal(SpikeTrain.from_units(units, dense.shape[0]).to_dense(), dense)
+    assert as_spike_train(spike_train) is spike_train
+
+
+def test_select():
+    """Test unit selection by index and boolean mask."""
+    dense = generate_dense_spike_train()
+    spike_train = SpikeTrain.from_dense(dense)
+
+    npt.assert_array_equal(spike_train.select([4, 0]).to_dense(), dense[:, [4, 0]])
+    mask = np.array([True, False, True, False, True, True])
+    npt.assert_array_equal(spike_train.select(mask).to_dense(), dense[:, mask])
+    assert spike_train.select(np.zeros(6, dtype=bool)).shape == (dense.shape[0], 0)
+
+
+def test_io_round_trip(tmp_path):
+    """Test saving and loading sparse spike trains, including legacy dense files."""
+    dense = generate_dense_spike_train()
+    source = np.random.randn(*dense.shape)
+    good_idx = np.arange(dense.shape[1])
+
+    save_results(tmp_path / 'results.npz', SpikeTrain.from_dense(dense), source, good_idx)
+    results = load_results(tmp_path / 'results.npz')
+    assert isinstance(results['spike_train'], SpikeTrain)
+    npt.assert_array_equal(results['spike_train'].to_dense(), dense)
+
+    save_ica_results(tmp_path / 'ica.npz', source, dense, np.eye(3))
+    _, spike_train, _ = load_ica_results(tmp_path / 'ica.npz')
+    npt.assert_array_equal(spike_train.to_dense(), dense)
+
+    np.savez(tmp_path / 'legacy.npz', spike_train=dense, source=source, good_idx=good_idx)
+    npt.assert_array_equal(load_results(tmp_path / 'legacy.npz')['spike_train'].to_dense(), dense)
@@ -0,0 +1,62 @@
+"""
+Tests for the streaming decomposition mode.
+"""
+
+import pytest
+import numpy as np
+import numpy.testing as npt
+from emg2mu.core.decomposition import EMG
+from emg2mu.detection.peak_classification import detect_spikes
+from emg2mu.tests.test_utils import generate_test_data
+
+
+def stream_spike_train(stream, emg_data, chunk_size):
+    """Stream a recording chunk by chunk and collect the spikes of every unit."""
+    events = [stream.process(emg_data[start:start + chunk_size])
+              for start in range(0, emg_data.shape[0], chunk_size)]
+    sample_indices = np.concatenate([e[0] for e in events])
+    units = np.concatenate([e[1] for e in events])
+    return [np.sort(sample_indices[units == k]) for k in range(stream.n_units)]
+
+
+@pytest.mark.parametrize('data_mode, whiten_flag', [('monopolar', True), ('monopolar', False),
+                                                    ('bipolar', True)])
+def test_stream_matches_offline(data_mode, whiten_flag):
+    """Test that streaming the calibration recording reproduces the offline spike detection."""
+    emg_data = generate_test_data()['emg_data']
+    emg = EMG(emg_data, data_mode=data_mode, max_sources=4, max_ica_iter=20,
+              extension_parameter=3, whiten_flag=whiten_flag)
+    emg.preprocess(array_shape=[2, 4]).run_ica()
+
+    stream = emg.create_stream(chunk_size=37)
+    assert stream.n_units == 4
+    assert stream.latency_budget == 37 / emg.sampling_frequency
+
+    streamed = stream_spike_train(stream, emg_data, 37)
+    for expected, spikes in zip(detect_spikes(emg._raw_source), streamed):
+        npt.assert_array_equal(spikes, expected)
+
+    # A reset stream with another chunk partition gives the same events
+    stream.reset()
+    chunks = stream_spike_train(stream, emg_data, 11)
+    for a, b in zip(streamed, chunks):
+        npt.assert_array_equal(a, b)
+
+    with pytest.raises(ValueError):
+        stream.process(emg_data[:38])
+
+
+def test_stream_unit_selection():
+    """Test streaming only the units kept after duplicate removal and scoring."""
+    emg = EMG(generate_test_data()['emg_data'], max_sources=4, max_ica_iter=10)
+    with pytest.raises(ValueError):
+        emg.create_stream()
+
+    emg.preprocess().run_ica()
+    emg.good_idx = np.array([1, 3])
+    assert emg.create_stream().n_units == 2
+    with pytest.raises(ValueError):
+        emg.create_stream(min_score=0.5)
+
+    emg.sil_score = np.array([0.9, 0.4])
+    assert emg.create_stream(min_score=0.5).n_units == 1
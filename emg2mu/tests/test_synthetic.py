@@ -0,0 +1,43 @@
+"""
+Tests for the synthetic hdEMG generator.
+"""
+
+import numpy as np
+import numpy.testing as npt
+from emg2mu.core.spike_train import SpikeTrain
+from emg2mu.utils.synthetic import generate_hdemg, gamma_spike_trains, match_units
+
+
+def test_generate_hdemg():
+    """Test the shapes, reproducibility and noise of generated recordings."""
+    recording = generate_hdemg(n_units=3, grid_shape=(4, 5), duration=2.0, snr=np.inf, seed=1)
+    assert recording['emg_data'].shape == (4096, 20)
+    assert recording['spike_train'].shape == (4096, 3)
+    assert recording['muaps'].shape[0] == 3 and recording['muaps'].shape[2] == 20
+    npt.assert_array_equal(generate_hdemg(n_units=3, grid_shape=(4, 5), duration=2.0, snr=np.inf,
+                                          seed=1)['emg_data'], recording['emg_data'])
+
+    noisy = generate_hdemg(n_units=3, grid_shape=(4, 5), duration=2.0, snr=10, seed=1)
+    noise_power = np.mean((noisy['emg_data'] - recording['emg_data']) ** 2)
+    npt.assert_allclose(10 * np.log10(np.mean(recording['emg_data'] ** 2) / noise_power), 10, atol=0.5)
+
+
+def test_gamma_spike_trains():
+    """Test firing rates and inter-spike interval variability."""
+    rng = np.random.default_rng(0)
+    spike_train = gamma_spike_trains([10, 25], 2048 * 60, isi_cv=0.2, rng=rng)
+    rates = spike_train.counts / 60
+    npt.assert_allclose(rates, [10, 25], rtol=0.1)
+    isi = np.diff(spike_train.unit(0))
+    npt.assert_allclose(np.std(isi) / np.mean(isi), 0.2, atol=0.05)
+
+
+def test_match_units():
+    """Test matching of shifted, partially wrong spike trains to the ground truth."""
+    truth = SpikeTrain.from_units([np.arange(100, 10000, 200), np.arange(150, 10000, 300)], 10000)
+    shifted = truth.unit(0)[:40] + 5
+    decomposed = SpikeTrain.from_units([np.array([7]), np.sort(shifted)], 10000)
+    result = match_units(decomposed, truth)
+    npt.assert_array_equal(result['match'], [1, -1])
+    assert result['lag'][0] == 5
+    npt.assert_allclose(result['roa'], [40 / 50, 0])
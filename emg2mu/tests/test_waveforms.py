@@ -0,0 +1,60 @@
+"""
+Tests for the waveform analysis module.
+"""
+
+import numpy as np
+import numpy.testing as npt
+import pytest
+from emg2mu.analysis.waveforms import extract_waveforms, waveform_statistics, muap_statistics
+from emg2mu.core.spike_train import SpikeTrain
+
+
+def test_extract_waveforms():
+    """Test the gathered segments against slicing, skipping spikes near the edges."""
+    rng = np.random.default_rng(0)
+    emg = rng.standard_normal((500, 3))
+    spikes = np.array([2, 5, 100, 250, 494, 495])
+
+    segments = extract_waveforms(emg[:, 0], spikes, 5)
+    npt.assert_array_equal(segments, [emg[s - 5:s + 6, 0] for s in [5, 100, 250, 494]])
+
+    segments = extract_waveforms(emg, spikes, 5)
+    assert segments.shape == (4, 11, 3)
+    npt.assert_array_equal(segments[1], emg[95:106])
+
+
+def test_waveform_statistics():
+    """Test the chunked statistics against the statistics of all segments."""
+    rng = np.random.default_rng(1)
+    emg = rng.standard_normal((5000, 4))
+    spikes = np.sort(rng.choice(np.arange(10, 4990), 700, replace=False))
+    segments = extract_waveforms(emg, spikes, 8)
+
+    stats = waveform_statistics(emg, spikes, 8, chunk_size=64)
+    assert stats['n'] == 700
+    npt.assert_allclose(stats['mean'], segments.mean(axis=0))
+    npt.assert_allclose(stats['std'], segments.std(axis=0))
+    npt.assert_allclose(stats['ci'], 1.96 * segments.std(axis=0) / np.sqrt(700))
+
+    empty = waveform_statistics(emg[:, 0], [1, 4999], 8)
+    assert empty['n'] == 0 and np.all(np.isnan(empty['mean']))
+
+
+def test_muap_statistics():
+    """Test per-unit statistics on the sources and multi-channel MUAPs on the EMG."""
+    rng = np.random.default_rng(2)
+    spike_train = SpikeTrain.from_units([[50, 150, 250], [100, 300]], 400)
+    sources = rng.standard_normal((400, 2))
+    emg = rng.standard_normal((400, 6))
+
+    per_source = muap_statistics(sources, spike_train, 4)
+    npt.assert_allclose(per_source[1]['mean'], (sources[96:105, 1] + sources[296:305, 1]) / 2)
+    assert [stats['mean'].shape for stats in muap_statistics(emg, spike_train, 4, per_unit=False)] \
+        == [(9, 6), (9, 6)]
+    with pytest.raises(ValueError):
+        muap_statistics(emg, spike_train, 4)
+
+    # An EMG with as many channels as units gives multi-channel MUAPs with per_unit=False
+    square = emg[:, :2]
+    muaps = muap_statistics(square, spike_train, 4, per_unit=False)
+    npt.assert_allclose(muaps[1]['mean'], (square[96:105] + square[296:305]) / 2)
@@ -0,0 +1,325 @@
+"""
+This module provides a batch driver for decomposing many recordings.
+
+Every recording of a manifest runs through preprocess/ICA, duplicate removal and
+scoring. Each stage writes a checkpoint into the output directory with the existing
+I/O helpers, and a restarted batch resumes from the last completed stage of every
+recording whose ICA method and EMG parameters are unchanged. Recordings are
+processed in a pool of worker processes and a summary table of timings and unit
+counts is written when the batch finishes.
+
+Functions:
+    - load_manifest: Read a CSV or JSON manifest of recordings
+    - process_recording: Decompose one recording, resuming from its checkpoints
+    - write_summary: Write the per-recording summary table
+    - run_batch: Decompose all recordings of a manifest
+    - main: Console entry point (``emg2mu-batch``)
+"""
+
+import argparse
+import ast
+import csv
+import json
+import multiprocessing
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from ..core.decomposition import EMG
+from .cache import StageCache
+from .io import save_ica_results, save_results, save_silhouette_scores
+
+SUMMARY_FIELDS = ['name', 'path', 'status', 'resumed_stages', 'n_sources', 'n_units', 'n_good_units',
+                  'time_ica', 'time_duplicates', 'time_scores', 'time_total', 'error']
+
+
+def _parse_value(value):
+    """Interpret a manifest string as a Python literal when possible."""
+    try:
+        return ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        return value
+
+
+def load_manifest(file_path):
+    """
+    Read a manifest of recordings.
+
+    A CSV manifest has a ``path`` column and optional ``name`` and EMG parameter
+    columns (e.g. ``sampling_frequency``, ``extension_parameter``); empty cells use the
+    batch defaults. A JSON manifest is a list of such objects, or an object with a
+    ``recordings`` list and optional ``defaults`` applied to every recording.
+
+    Parameters
+    ----------
+    file_path : str
+        Path to the .csv or .json manifest
+
+    Returns
+    -------
+    list of dict
+        One entry per recording, with at least ``path`` and ``name``
+
+    Raises
+    ------
+    ValueError
+        If the manifest format is unknown or an entry has no path
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    base_dir = os.path.dirname(os.path.abspath(file_path))
+    if extension == '.csv':
+        with open(file_path, newline='') as f:
+            entries = [{key: _parse_value(value) for key, value in row.items() if value not in ('', None)}
+                       for row in csv.DictReader(f)]
+    elif extension == '.json':
+        with open(file_path) as f:
+            manifest = json.load(f)
+        if isinstance(manifest, dict):
+            defaults = manifest.get('defaults', {})
+            entries = [{**defaults, **entry} for entry in manifest.get('recordings', [])]
+        else:
+            entries = manifest
+    else:
+        raise ValueError(f"Manifest must be a .csv or .json file, got {file_path}")
+
+    recordings = []
+    for entry in entries:
+        if 'path' not in entry:
+            raise ValueError(f"Manifest entry without a path: {entry}")
+        entry = dict(entry)
+        # Relative paths are relative to the manifest
+        entry['path'] = os.path.join(base_dir, str(entry['path']))
+        recordings.append(entry)
+    return _name_recordings(recordings)
+
+
+def _name_recordings(recordings):
+    """Give every recording a unique name, used as the prefix of its checkpoints."""
+    named, seen = [], set()
+    for entry in recordings:
+        entry = {'path': entry} if isinstance(entry, (str, os.PathLike)) else dict(entry)
+        entry['path'] = os.fspath(entry['path'])
+        name = str(entry.get('name') or os.path.splitext(os.path.basename(entry['path']))[0])
+        if name in seen:
+            raise ValueError(f"Duplicate recording name '{name}' in manifest; set unique names")
+        seen.add(name)
+        entry['name'] = name
+        named.append(entry)
+    return named
+
+
+def _checkpoint(save_function, file_path, *args):
+    """Write a checkpoint through a temporary file so an interrupted write is never reused."""
+    root, extension = os.path.splitext(file_path)
+    tmp_path = f"{root}.tmp{extension}"
+    save_function(tmp_path, *args)
+    os.replace(tmp_path, file_path)
+
+
+def _write_key(file_path, key):
+    """Store the key of the parameters a checkpoint was computed with."""
+    with open(file_path, 'w') as f:
+        f.write(key)
+
+
+def _read_key(file_path):
+    """Key stored next to a checkpoint, or None without one."""
+    try:
+        with open(file_path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def process_recording(entry, output_dir, method='fastICA', emg_kwargs=None, resume=True):
+    """
+    Decompose one recording stage by stage, resuming from existing checkpoints.
+
+    Parameters
+    ----------
+    entry : dict
+        Manifest entry with ``path``, ``name`` and optional EMG parameters
+    output_dir : str
+        Directory of the checkpoints
+    method : str, optional
+        ICA method passed to ``EMG.run_ica``. Default = 'fastICA'
+    emg_kwargs : dict, optional
+        Default EMG parameters, overridden by the entry. Default = None
+    resume : bool, optional
+        Whether to reuse the checkpoints of completed stages. Default = True
+
+    Returns
+    -------
+    dict
+        Summary row of the recording (see ``SUMMARY_FIELDS``)
+    """
+    name = entry['name']
+    row = {'name': name, 'path': entry['path'], 'status': 'done', 'resumed_stages': ''}
+    ica_file = os.path.join(output_dir, f'{name}_ica.npz')
+    results_file = os.path.join(output_dir, f'{name}_decomposed.npz')
+    scores_file = os.path.join(output_dir, f'{name}_scores.npy')
+    key_file = os.path.join(output_dir, f'{name}_ica.key')
+    resumed = []
+    start = time.perf_counter()
+    try:
+        params = {**(emg_kwargs or {}), **{k: v for k, v in entry.items() if k not in ('path', 'name')}}
+        emg = EMG(entry['path'], **params)
+        # The checkpoints are only reused by a run with the same ICA method and parameters
+        key = StageCache.key('batch', entry['path'], method=method, **params)
+
+        stage_start = time.perf_counter()
+        if resume and os.path.exists(ica_file) and _read_key(key_file) == key:
+            try:
+                emg.run_ica(load_path=ica_file)
+            except ValueError:
+                pass  # Unreadable checkpoint (run_ica warned); recomputed below
+            if emg._raw_B is not None:
+                resumed.append('ica')
+        if emg._raw_B is None:
+            emg.preprocess()
+            emg.run_ica(method=method)
+            _checkpoint(save_ica_results, ica_file, emg._raw_source, emg._raw_spike_train, emg._raw_B)
+            _checkpoint(_write_key, key_file, key)
+        row['time_ica'] = time.perf_counter() - stage_start
+
+        stage_start = time.perf_counter()
+        if resume and 'ica' in resumed and os.path.exists(results_file):
+            emg.load(results_file)
+            resumed.append('duplicates')
+        else:
+            emg.remove_duplicates()
+            _checkpoint(save_results, results_file, emg.spike_train, emg.source, emg.good_idx)
+        row['time_duplicates'] = time.perf_counter() - stage_start
+
+        stage_start = time.perf_counter()
+        if resume and 'duplicates' in resumed and os.path.exists(scores_file):
+            emg.compute_scores(load_path=scores_file)
+            resumed.append('scores')
+        else:
+            emg.compute_scores()
+            _checkpoint(save_silhouette_scores, scores_file, emg.sil_score)
+            _checkpoint(save_results, results_file, emg.spike_train, emg.source, emg.good_idx,
+                        emg.sil_score)
+        row['time_scores'] = time.perf_counter() - stage_start
+
+        row['n_sources'] = emg._raw_B.shape[1]
+        row['n_units'] = emg.spike_train.shape[1]
+        row['n_good_units'] = int((emg.sil_score > emg.silhouette_threshold).sum())
+    except Exception as e:
+        row['status'] = 'failed'
+        row['error'] = f"{type(e).__name__}: {e}"
+        traceback.print_exc()
+    row['resumed_stages'] = ';'.join(resumed)
+    row['time_total'] = time.perf_counter() - start
+    return row
+
+
+def write_summary(file_path, rows):
+    """
+    Write the batch summary table as CSV.
+
+    Parameters
+    ----------
+    file_path : str
+        Path of the CSV file
+    rows : list of dict
+        Summary rows returned by ``process_recording``
+
+    Returns
+    -------
+    None
+    """
+    with open(file_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_FIELDS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({key: (f'{value:.3f}' if isinstance(value, float) else value)
+                             for key, value in row.items()})
+
+
+def run_batch(manifest, output_dir, n_jobs=1, method='fastICA', emg_kwargs=None, resume=True):
+    """
+    Decompose every recording of a manifest with resumable per-stage checkpoints.
+
+    Parameters
+    ----------
+    manifest : str or list
+        Path to a CSV/JSON manifest (see ``load_manifest``), or a list of recording
+        paths or manifest entries
+    output_dir : str
+        Directory of the checkpoints and of ``summary.csv``
+    n_jobs : int, optional
+        Number of recordings processed concurrently in worker processes; -1 uses all
+        cores. Workers are spawned, so a script using n_jobs > 1 must call it under
+        ``if __name__ == '__main__':``. Default = 1 (in the calling process)
+    method : str, optional
+        ICA method passed to ``EMG.run_ica``. Default = 'fastICA'
+    emg_kwargs : dict, optional
+        EMG parameters shared by all recordings; manifest entries override them.
+        Default = None
+    resume : bool, optional
+        Whether to skip the stages whose checkpoints already exist. Default = True
+
+    Returns
+    -------
+    list of dict
+        Summary row of every recording, in manifest order
+    """
+    if isinstance(manifest, (str, os.PathLike)):
+        recordings = load_manifest(os.fspath(manifest))
+    else:
+        recordings = _name_recordings(manifest)
+    os.makedirs(output_dir, exist_ok=True)
+
+    n_jobs = os.cpu_count() if n_jobs == -1 else n_jobs
+    n_jobs = max(1, min(n_jobs, len(recordings)))
+    args = (output_dir, method, emg_kwargs, resume)
+    if n_jobs == 1:
+        rows = [process_recording(entry, *args) for entry in recordings]
+    else:
+        # Spawned workers do not inherit torch/CUDA state from the parent
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(n_jobs, mp_context=context) as pool:
+            futures = [pool.submit(process_recording, entry, *args) for entry in recordings]
+            rows = [future.result() for future in futures]
+
+    write_summary(os.path.join(output_dir, 'summary.csv'), rows)
+    return rows
+
+
+def main(argv=None):
+    """
+    Console entry point: ``emg2mu-batch manifest.csv --output-dir results --jobs 8``.
+    """
+    parser = argparse.ArgumentParser(
+        description="Decompose the hdEMG recordings of a manifest with resumable checkpoints.")
+    parser.add_argument('manifest', help="CSV or JSON manifest of recordings")
+    parser.add_argument('-o', '--output-dir', default='emg2mu_batch',
+                        help="Directory of the checkpoints and summary (default: emg2mu_batch)")
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help="Number of recordings processed concurrently; -1 for all cores")
+    parser.add_argument('--method', default='fastICA', choices=['fastICA', 'torch', 'symmetric'],
+                        help="ICA method (default: fastICA)")
+    parser.add_argument('--no-resume', action='store_true',
+                        help="Recompute all stages, ignoring existing checkpoints")
+    parser.add_argument('--set', action='append', default=[], metavar='KEY=VALUE',
+                        help="EMG parameter for all recordings, e.g. --set max_sources=100")
+    args = parser.parse_args(argv)
+
+    emg_kwargs = {}
+    for item in args.set:
+        key, sep, value = item.partition('=')
+        if not sep:
+            parser.error(f"--set expects KEY=VALUE, got '{item}'")
+        emg_kwargs[key] = _parse_value(value)
+
+    rows = run_batch(args.manifest, args.output_dir, args.jobs, args.method, emg_kwargs,
+                     resume=not args.no_resume)
+    failed = [row['name'] for row in rows if row['status'] != 'done']
+    print(f"Processed {len(rows)} recordings ({len(failed)} failed); "
+          f"summary written to {os.path.join(args.output_dir, 'summary.csv')}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,194 @@
+"""
+This module provides a content-addressed on-disk cache for pipeline stages.
+
+Every stage result is stored under a key that hashes the key of the stage it was
+computed from together with all parameters of the stage, starting from a digest of
+the input data. A changed input or parameter therefore yields a new key instead of a
+stale result, and stages whose inputs are unchanged are served from the cache. The
+cache directory is bounded in size by least-recently-used eviction.
+
+Classes:
+    - StageCache: Size-bounded LRU cache of stage results keyed by content hashes
+
+Functions:
+    - data_digest: Content hash of an array or lazily loaded recording
+"""
+
+import hashlib
+import json
+import os
+import numpy as np
+
+
+def _hasher():
+    return hashlib.blake2b(digest_size=20)
+
+
+def data_digest(data, chunk_size=65536):
+    """
+    Content hash of an array, read chunk by chunk.
+
+    Parameters
+    ----------
+    data : numpy.ndarray or LazyRecording
+        The data to hash
+    chunk_size : int, optional
+        Number of rows hashed at a time. Default = 65536
+
+    Returns
+    -------
+    str
+        Hexadecimal digest of the dtype, shape and values of the data
+    """
+    h = _hasher()
+    h.update(f"{np.dtype(data.dtype).str}{tuple(data.shape)}".encode())
+    if hasattr(data, 'iter_chunks'):
+        chunks = data.iter_chunks(chunk_size)
+    else:
+        data = np.asarray(data)
+        chunks = (data[start:start + chunk_size] for start in range(0, max(len(data), 1), chunk_size))
+    for chunk in chunks:
+        h.update(np.ascontiguousarray(chunk).data)
+    return h.hexdigest()
+
+
+class StageCache:
+    """
+    On-disk cache of pipeline stage results with LRU eviction.
+
+    Results are stored as NPZ files named by their key. Reading a result refreshes its
+    modification time, and writing one evicts the least recently used results until
+    the directory fits into ``max_bytes``.
+
+    Parameters
+    ----------
+    directory : str
+        Cache directory, created if needed
+    max_bytes : int, optional
+        Maximum total size of the cached results in bytes. Default = 2 GiB
+    """
+
+    def __init__(self, directory, max_bytes=2 * 1024 ** 3):
+        self.directory = os.fspath(directory)
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def key(stage, parent, **params):
+        """
+        Key of a stage result.
+
+        Parameters
+        ----------
+        stage : str
+            Name of the stage
+        parent : str
+            Key of the stage the result is computed from, or a data digest
+        **params : dict
+            Every parameter the result depends on
+
+        Returns
+        -------
+        str
+            Hexadecimal key
+        """
+        h = _hasher()
+        h.update(json.dumps([stage, parent, params], sort_keys=True, default=_encode).encode())
+        return f"{stage}-{h.hexdigest()}"
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.npz")
+
+    def __contains__(self, key):
+        return os.path.exists(self._path(key))
+
+    def load(self, key):
+        """
+        Load a cached result.
+
+        Parameters
+        ----------
+        key : str
+            Key of the result
+
+        Returns
+        -------
+        dict or None
+            The stored arrays, or None on a cache miss
+        """
+        path = self._path(key)
+        try:
+            with np.load(path) as data:
+                result = {name: data[name] for name in data.files}
+        except (OSError, ValueError):
+            return None
+        os.utime(path)
+        return result
+
+    def save(self, key, **arrays):
+        """
+        Store a result and evict least recently used results beyond ``max_bytes``.
+
+        Parameters
+        ----------
+        key : str
+            Key of the result
+        **arrays : dict
+            Arrays to store
+
+        Returns
+        -------
+        None
+        """
+        path = self._path(key)
+        tmp_path = os.path.join(self.directory, f"{key}.{os.getpid()}.tmp.npz")
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def evict(self):
+        """
+        Remove least recently used results until the cache fits into ``max_bytes``.
+
+        Returns
+        -------
+        None
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.npz') and not name.endswith('.tmp.npz'):
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        """
+        Remove every cached result.
+
+        Returns
+        -------
+        None
+        """
+        for name in os.listdir(self.directory):
+            if name.endswith('.npz'):
+                os.remove(os.path.join(self.directory, name))
+
+
+def _encode(value):
+    """JSON encoding of NumPy values in stage parameters."""
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return repr(value)
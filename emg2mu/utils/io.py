@@ -2,8 +2,46 @@
 This module provides I/O utility functions for EMG data handling.
 """
 
+import os
 import numpy as np
 import scipy.io as sio
+from ..core.spike_train import SpikeTrain, as_spike_train
+from ..core.preprocessing import Whitener
+
+try:
+    import h5py
+except ImportError:  # HDF5 / MATLAB v7.3 support is optional
+    h5py = None
+
+
+def _spike_train_fields(spike_train):
+    """
+    Return the NPZ fields storing a spike train in its sparse layout.
+    """
+    spike_train = as_spike_train(spike_train)
+    return {
+        'spike_indices': spike_train.indices,
+        'spike_indptr': spike_train.indptr,
+        'spike_n_frames': spike_train.n_frames
+    }
+
+
+def _has_spike_train(data):
+    """
+    Check whether an NPZ file holds a sparse or (legacy) dense spike train.
+    """
+    return 'spike_train' in data or all(
+        key in data for key in ['spike_indices', 'spike_indptr', 'spike_n_frames'])
+
+
+def _read_spike_train(data):
+    """
+    Read a spike train from an NPZ file, converting legacy dense spike trains.
+    """
+    if 'spike_indices' in data:
+        return SpikeTrain(data['spike_indices'], data['spike_indptr'],
+                          data['spike_n_frames'].item())
+    return SpikeTrain.from_dense(data['spike_train'])
 
 
 def load_mat_data(file_path):
@@ -29,6 +67,13 @@ def load_mat_data(file_path):
     """
     try:
         emg_file = sio.loadmat(file_path)
+    except NotImplementedError:
+        # MATLAB v7.3 files are HDF5 containers that scipy cannot read
+        recording = load_recording(file_path)
+        return recording, recording.sampling_frequency
+    except Exception as e:
+        raise ValueError(f"Error loading MAT file: {str(e)}")
+    try:
         data = emg_file['Data'][0, 0]
         sampling_frequency = emg_file['SamplingFrequency'].item()
         return data, sampling_frequency
@@ -36,6 +81,299 @@ def load_mat_data(file_path):
         raise ValueError(f"Error loading MAT file: {str(e)}")
 
 
+class LazyRecording:
+    """
+    Lazily evaluated (frames, channels) view of an EMG recording stored on disk.
+
+    Samples are only read when they are indexed, iterated over or converted to an
+    array. Memory-mapped sources (``.npy``, raw binary and contiguous HDF5 datasets)
+    are read through the OS page cache, so a full-recording selection is returned as
+    a memory-mapped array without an eager read.
+
+    Parameters
+    ----------
+    data : numpy.ndarray, numpy.memmap or h5py.Dataset
+        The stored 2-D array
+    sampling_frequency : float, optional
+        Sampling frequency of the recording in Hz. Default = None (unknown)
+    time_axis : int, optional
+        Axis of ``data`` that holds the samples (MATLAB v7.3 files store the
+        recording transposed). Default = 0
+    channels : array-like, optional
+        Channel indices to keep. Default = None (all channels)
+    time_range : tuple, optional
+        (start, stop) of the selection in seconds; requires ``sampling_frequency``.
+        Default = None (the whole recording)
+    """
+
+    def __init__(self, data, sampling_frequency=None, time_axis=0, channels=None, time_range=None):
+        self.data = data
+        self.sampling_frequency = sampling_frequency
+        self.time_axis = time_axis
+        self.channels = None
+        self.start = 0
+        self.stop = data.shape[time_axis]
+        if channels is not None or time_range is not None:
+            self._restrict(channels, time_range)
+
+    def _restrict(self, channels, time_range):
+        """Narrow the channel and time selection in place (relative to the current one)."""
+        if channels is not None:
+            channels = np.arange(self.shape[1])[np.asarray(channels)]
+            self.channels = channels if self.channels is None else self.channels[channels]
+        if time_range is not None:
+            if self.sampling_frequency is None:
+                raise ValueError("time_range requires a known sampling_frequency")
+            start, stop = (int(round(t * self.sampling_frequency)) for t in time_range)
+            n_frames = self.shape[0]
+            start, stop = min(max(start, 0), n_frames), min(max(stop, 0), n_frames)
+            if stop <= start:
+                raise ValueError(f"time_range {time_range} selects no samples")
+            self.start, self.stop = self.start + start, self.start + stop
+
+    @property
+    def shape(self):
+        num_chan = self.data.shape[1 - self.time_axis] if self.channels is None else len(self.channels)
+        return self.stop - self.start, num_chan
+
+    @property
+    def dtype(self):
+        return self.data.dtype
+
+    @property
+    def ndim(self):
+        return 2
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __repr__(self):
+        return (f"LazyRecording(shape={self.shape}, dtype={self.dtype}, "
+                f"sampling_frequency={self.sampling_frequency})")
+
+    def select(self, channels=None, time_range=None):
+        """
+        Return a lazy sub-selection of the recording.
+
+        Parameters
+        ----------
+        channels : array-like, optional
+            Channel indices (or a boolean mask) relative to the current selection
+        time_range : tuple, optional
+            (start, stop) in seconds relative to the start of the current selection
+
+        Returns
+        -------
+        LazyRecording
+            The selected view; no samples are read
+        """
+        view = LazyRecording(self.data, self.sampling_frequency, self.time_axis)
+        view.channels, view.start, view.stop = self.channels, self.start, self.stop
+        view._restrict(channels, time_range)
+        return view
+
+    def _read(self, start, stop):
+        """Read samples [start, stop) of the selection as a (frames, channels) array."""
+        start, stop = self.start + start, self.start + stop
+        if self.time_axis == 0:
+            block = np.asarray(self.data[start:stop])
+        else:
+            block = np.asarray(self.data[:, start:stop]).T
+        if self.channels is not None:
+            block = block[:, self.channels]
+        return block
+
+    def __getitem__(self, key):
+        rows, cols = key if isinstance(key, tuple) else (key, slice(None))
+        n_frames = self.shape[0]
+        if isinstance(rows, slice) and (rows.step is None or rows.step > 0):
+            start, stop, step = rows.indices(n_frames)
+            block = self._read(start, max(start, stop))[::step]
+        else:
+            idx = np.arange(n_frames)[rows]
+            if np.ndim(idx) == 0:
+                return self._read(idx, idx + 1)[0][cols]
+            if len(idx) == 0:
+                block = self._read(0, 0)
+            else:
+                block = self._read(idx.min(), idx.max() + 1)[idx - idx.min()]
+        return block[:, cols]
+
+    def iter_chunks(self, chunk_size=65536):
+        """
+        Iterate over the selection in blocks of samples.
+
+        Parameters
+        ----------
+        chunk_size : int, optional
+            Number of samples per block. Default = 65536
+
+        Yields
+        ------
+        numpy.ndarray
+            Samples ``[start, start + chunk_size)`` with shape (frames, channels)
+        """
+        for start in range(0, self.shape[0], chunk_size):
+            yield self._read(start, min(start + chunk_size, self.shape[0]))
+
+    def is_mapped(self, dtype=None):
+        """
+        Whether ``toarray(dtype)`` returns a view of the stored array without reading it.
+
+        Parameters
+        ----------
+        dtype : numpy.dtype, optional
+            Data type of the array. Default = None (the stored dtype)
+
+        Returns
+        -------
+        bool
+            True for a whole-channel selection of a memory-mapped (or in-memory) array
+            stored with ``dtype``
+        """
+        dtype = self.dtype if dtype is None else np.dtype(dtype)
+        return isinstance(self.data, np.ndarray) and self.channels is None and dtype == self.dtype
+
+    def toarray(self, dtype=None, chunk_size=65536):
+        """
+        Return the selection as a NumPy array.
+
+        A whole-channel selection of a memory-mapped source is returned as a
+        memory-mapped view without reading it; otherwise the samples are read chunk
+        by chunk into a preallocated array.
+
+        Parameters
+        ----------
+        dtype : numpy.dtype, optional
+            Data type of the array. Default = None (the stored dtype)
+        chunk_size : int, optional
+            Number of samples read at a time. Default = 65536
+
+        Returns
+        -------
+        numpy.ndarray
+            The (frames, channels) samples
+        """
+        dtype = self.dtype if dtype is None else np.dtype(dtype)
+        if self.is_mapped(dtype):
+            if self.time_axis == 0:
+                return self.data[self.start:self.stop]
+            return self.data[:, self.start:self.stop].T
+        out = np.empty(self.shape, dtype=dtype)
+        for start in range(0, self.shape[0], chunk_size):
+            stop = min(start + chunk_size, self.shape[0])
+            out[start:stop] = self._read(start, stop)
+        return out
+
+    def __array__(self, dtype=None, copy=None):
+        return self.toarray(dtype)
+
+
+def _time_axis(shape):
+    """Guess the sample axis of a stored 2-D recording (the longer one)."""
+    return int(np.argmax(shape))
+
+
+def _open_hdf5(file_path, dataset):
+    """
+    Open an HDF5 (or MATLAB v7.3) recording as a memory map or an h5py dataset.
+    """
+    if h5py is None:
+        raise ImportError("Reading HDF5 / MATLAB v7.3 files requires h5py: "
+                          "pip install emg2mu[hdf5]")
+    emg_file = h5py.File(file_path, 'r')
+    if dataset not in emg_file:
+        raise ValueError(f"Dataset '{dataset}' not found in {file_path}")
+    data = emg_file[dataset]
+    # MATLAB stores cell arrays (as in the Hyser 'Data' field) as object references
+    if data.dtype == h5py.ref_dtype:
+        data = emg_file[data[()].flat[0]]
+
+    sampling_frequency = None
+    if 'SamplingFrequency' in emg_file:
+        sampling_frequency = emg_file['SamplingFrequency'][()].item()
+
+    offset = data.id.get_offset()
+    if data.chunks is None and data.compression is None and offset is not None:
+        # Contiguous uncompressed datasets are mapped directly, bypassing h5py reads
+        data = np.memmap(file_path, dtype=data.dtype, mode='r', offset=offset, shape=data.shape)
+        emg_file.close()
+    return data, sampling_frequency
+
+
+def load_recording(file_path, sampling_frequency=None, channels=None, time_range=None,
+                   dataset='Data', num_channels=None, dtype=np.float64):
+    """
+    Open an EMG recording lazily, without reading it into memory.
+
+    Supported inputs are NumPy ``.npy`` files (memory-mapped), HDF5 files and
+    MATLAB v7.3 ``.mat`` files (memory-mapped when the dataset is stored contiguous
+    and uncompressed, otherwise read chunk-wise through h5py), older ``.mat`` files
+    (read eagerly by scipy) and raw binary files of interleaved samples.
+
+    Parameters
+    ----------
+    file_path : str
+        Path to the recording
+    sampling_frequency : float, optional
+        Sampling frequency in Hz. Default = None (read from the file when stored)
+    channels : array-like, optional
+        Channel indices to keep. Default = None (all channels)
+    time_range : tuple, optional
+        (start, stop) of the selection in seconds. Default = None (whole recording)
+    dataset : str, optional
+        Name of the HDF5 / MAT variable holding the recording. Default = 'Data'
+    num_channels : int, optional
+        Number of channels of a raw binary file (required for raw binary files)
+    dtype : numpy.dtype, optional
+        Sample type of a raw binary file. Default = numpy.float64
+
+    Returns
+    -------
+    LazyRecording
+        Lazy (frames, channels) view of the recording
+
+    Raises
+    ------
+    ValueError
+        If the file cannot be opened or required information is missing
+    """
+    file_path = os.fspath(file_path)
+    extension = os.path.splitext(file_path)[1].lower()
+    stored_frequency = None
+    time_axis = None
+
+    if extension == '.npy':
+        data = np.load(file_path, mmap_mode='r')
+    elif extension in ['.h5', '.hdf5'] or (extension == '.mat' and h5py is not None
+                                           and h5py.is_hdf5(file_path)):
+        data, stored_frequency = _open_hdf5(file_path, dataset)
+    elif extension == '.mat':
+        try:
+            emg_file = sio.loadmat(file_path)
+        except NotImplementedError:
+            raise ImportError("Reading MATLAB v7.3 files requires h5py: pip install emg2mu[hdf5]")
+        data = emg_file[dataset]
+        if data.dtype == object:
+            data = data.flat[0]
+        if 'SamplingFrequency' in emg_file:
+            stored_frequency = emg_file['SamplingFrequency'].item()
+    else:
+        if num_channels is None:
+            raise ValueError("num_channels is required for raw binary recordings")
+        data = np.memmap(file_path, dtype=dtype, mode='r')
+        data = data[:len(data) // num_channels * num_channels].reshape(-1, num_channels)
+        time_axis = 0
+
+    if data.ndim != 2:
+        raise ValueError(f"Expected a 2-D recording, got shape {data.shape}")
+    if sampling_frequency is None:
+        sampling_frequency = stored_frequency
+    if time_axis is None:
+        time_axis = _time_axis(data.shape)
+    return LazyRecording(data, sampling_frequency, time_axis, channels, time_range)
+
+
 def save_results(file_path, spike_train, source, good_idx, silhouette_score=None):
     """
     Save decomposition results to a NPZ file.
@@ -44,8 +382,8 @@ def save_results(file_path, spike_train, source, good_idx, silhouette_score=None
     ----------
     file_path : str
         Path to save the results
-    spike_train : numpy.ndarray
-        The spike train data
+    spike_train : SpikeTrain or numpy.ndarray
+        The spike train data, stored in its sparse layout
     source : numpy.ndarray
         The source signals
     good_idx : numpy.ndarray
@@ -58,9 +396,9 @@ def save_results(file_path, spike_train, source, good_idx, silhouette_score=None
     None
     """
     save_dict = {
-        'spike_train': spike_train,
         'source': source,
-        'good_idx': good_idx
+        'good_idx': good_idx,
+        **_spike_train_fields(spike_train)
     }
     if silhouette_score is not None:
         save_dict['silhouette_score'] = silhouette_score
@@ -81,7 +419,7 @@ def load_results(file_path):
     -------
     dict
         Dictionary containing the loaded results with keys:
-        - spike_train
+        - spike_train (SpikeTrain)
         - source
         - good_idx
         - silhouette_score (if available)
@@ -94,7 +432,10 @@ def load_results(file_path):
     try:
         data = np.load(file_path)
         results = {}
-        for key in ['spike_train', 'source', 'good_idx']:
+        if not _has_spike_train(data):
+            raise ValueError("Required field 'spike_train' not found in results file")
+        results['spike_train'] = _read_spike_train(data)
+        for key in ['source', 'good_idx']:
             if key not in data:
                 raise ValueError(f"Required field '{key}' not found in results file")
             results[key] = data[key]
@@ -118,8 +459,8 @@ def save_ica_results(file_path, source, spike_train, B):
         Path to save the ICA results
     source : numpy.ndarray
         The source signals from ICA
-    spike_train : numpy.ndarray
-        The spike train data
+    spike_train : SpikeTrain or numpy.ndarray
+        The spike train data, stored in its sparse layout
     B : numpy.ndarray
         The unmixing matrix
 
@@ -127,7 +468,7 @@ def save_ica_results(file_path, source, spike_train, B):
     -------
     None
     """
-    np.savez(file_path, source=source, spike_train=spike_train, B=B)
+    np.savez(file_path, source=source, B=B, **_spike_train_fields(spike_train))
 
 
 def load_ica_results(file_path):
@@ -144,7 +485,7 @@ def load_ica_results(file_path):
     tuple
         (source, spike_train, B)
         - source: The source signals from ICA
-        - spike_train: The spike train data
+        - spike_train: The spike train data (SpikeTrain)
         - B: The unmixing matrix
 
     Raises
@@ -154,13 +495,75 @@ def load_ica_results(file_path):
     """
     try:
         data = np.load(file_path)
-        if not all(key in data for key in ['source', 'spike_train', 'B']):
+        if not all(key in data for key in ['source', 'B']) or not _has_spike_train(data):
             raise ValueError("Missing required fields in ICA results file")
-        return data['source'], data['spike_train'], data['B']
+        return data['source'], _read_spike_train(data), data['B']
     except Exception as e:
         raise ValueError(f"Error loading ICA results file: {str(e)}")
 
 
+def save_whitener(file_path, whitener):
+    """
+    Save the statistics of a fitted whitener to a NPZ file.
+
+    Parameters
+    ----------
+    file_path : str
+        Path to save the whitener
+    whitener : Whitener
+        The fitted whitener
+
+    Returns
+    -------
+    None
+    """
+    if whitener.n_samples == 0:
+        raise ValueError("Whitener has not been fitted")
+    truncation = {key: value for key, value in [('n_components', whitener.n_components),
+                                                ('seed', whitener.seed)] if value is not None}
+    np.savez(file_path, method=whitener.method, eps=whitener.eps, chunk_size=whitener.chunk_size,
+             solver=whitener.solver, n_samples=whitener.n_samples, mean=whitener.mean,
+             scatter=whitener._scatter, **truncation)
+
+
+def load_whitener(file_path):
+    """
+    Load a whitener saved with ``save_whitener``.
+
+    Parameters
+    ----------
+    file_path : str
+        Path to the whitener file
+
+    Returns
+    -------
+    Whitener
+        The fitted whitener
+
+    Raises
+    ------
+    ValueError
+        If the file cannot be loaded or required fields are missing
+    """
+    try:
+        data = np.load(file_path)
+        if not all(key in data for key in ['method', 'eps', 'n_samples', 'mean', 'scatter']):
+            raise ValueError("Missing required fields in whitener file")
+        whitener = Whitener(data['method'].item(), data['eps'].item())
+        if 'chunk_size' in data:
+            whitener.chunk_size = data['chunk_size'].item()
+        if 'solver' in data:
+            whitener.solver = data['solver'].item()
+            whitener.n_components = data['n_components'].item() if 'n_components' in data else None
+            whitener.seed = data['seed'].item() if 'seed' in data else None
+        whitener.n_samples = data['n_samples'].item()
+        whitener.mean = data['mean']
+        whitener._scatter = data['scatter']
+        return whitener
+    except Exception as e:
+        raise ValueError(f"Error loading whitener file: {str(e)}")
+
+
 def save_silhouette_scores(file_path, scores):
     """
     Save silhouette scores to a NPY file.
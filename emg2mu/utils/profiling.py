@@ -0,0 +1,273 @@
+"""
+This module provides per-stage timing and memory instrumentation.
+
+A ``Profiler`` records one entry per executed stage with its wall time, CPU time,
+peak traced allocation and the peak resident set size of the process, together with
+stage metadata such as iteration counts. Stages nest, so the ICA stage contains one
+entry per extracted source. Records are exported as JSON or as a column dictionary
+(``pandas.DataFrame(profiler.to_dict())``), and hooks receive every record as soon as
+its stage completes, e.g. to forward it to a monitoring system.
+
+Classes:
+    - Profiler: Collects stage records and dispatches them to hooks
+
+Functions:
+    - stage: Profile a stage on an optional profiler
+"""
+
+import json
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+RECORD_FIELDS = ['name', 'parent', 'depth', 'start', 'wall_time', 'cpu_time',
+                 'peak_alloc_bytes', 'peak_rss_bytes']
+
+
+def _peak_rss():
+    """Peak resident set size of the process in bytes, or None where unavailable."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class Profiler:
+    """
+    Per-stage timing and memory profiler.
+
+    Each record holds the stage ``name``, the name of the enclosing stage (``parent``)
+    and the nesting ``depth``, the ``start`` offset and ``wall_time`` in seconds, the
+    ``cpu_time`` of the process (all threads) in seconds, the ``peak_alloc_bytes``
+    allocated on top of the memory in use when the stage started (NumPy allocations
+    included), the ``peak_rss_bytes`` of the process when the stage ended, and any
+    metadata of the stage, e.g. ``iterations``.
+
+    Parameters
+    ----------
+    trace_memory : bool, optional
+        Whether to trace allocations with ``tracemalloc`` while a stage runs. Tracing
+        slows down allocation-heavy code; without it ``peak_alloc_bytes`` is None.
+        Default = True
+    hooks : list of callable, optional
+        Functions called with every completed record. Default = None
+    """
+
+    def __init__(self, trace_memory=True, hooks=None):
+        self.trace_memory = trace_memory
+        self.hooks = list(hooks or [])
+        self.records = []
+        self._stack = []
+        self._origin = time.perf_counter()
+        self._started_tracing = False
+        # Traced bytes dropped by clear_traces where tracemalloc.reset_peak is missing
+        self._traced_offset = 0
+
+    def _traced_memory(self):
+        """Current and peak traced memory, including the bytes of cleared traces."""
+        current, peak = tracemalloc.get_traced_memory()
+        return current + self._traced_offset, peak + self._traced_offset
+
+    def _reset_peak(self):
+        """Reset the traced peak to the current traced memory."""
+        if hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+        else:
+            # Python < 3.9: clearing the traces also resets the peak; the cleared bytes
+            # are kept as an offset so that readings before and after stay comparable
+            self._traced_offset += tracemalloc.get_traced_memory()[0]
+            tracemalloc.clear_traces()
+
+    def add_hook(self, hook):
+        """
+        Register a function called with every completed record.
+
+        Parameters
+        ----------
+        hook : callable
+            Function taking the record dictionary
+
+        Returns
+        -------
+        callable
+            The hook, so that this method can be used as a decorator
+        """
+        self.hooks.append(hook)
+        return hook
+
+    @contextmanager
+    def stage(self, name, **metadata):
+        """
+        Profile the enclosed block as a stage.
+
+        Parameters
+        ----------
+        name : str
+            Name of the stage
+        **metadata : dict
+            Values stored with the record, e.g. the index of a source
+
+        Yields
+        ------
+        dict
+            The record of the stage; entries added to it (e.g. ``iterations``) are kept
+        """
+        record = {'name': name, 'parent': self._stack[-1]['record']['name'] if self._stack else None,
+                  'depth': len(self._stack), **metadata}
+        frame = {'record': record, 'alloc_start': 0, 'alloc_peak': 0}
+
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracing = True
+                self._traced_offset = 0
+            current, peak = self._traced_memory()
+            # Keep the peak reached so far by the enclosing stage before resetting it
+            if self._stack:
+                self._stack[-1]['alloc_peak'] = max(self._stack[-1]['alloc_peak'], peak)
+            self._reset_peak()
+            frame['alloc_start'] = frame['alloc_peak'] = current
+
+        self._stack.append(frame)
+        start_wall, start_cpu = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        finally:
+            wall_time = time.perf_counter() - start_wall
+            cpu_time = time.process_time() - start_cpu
+            self._stack.pop()
+
+            peak_alloc = None
+            if self.trace_memory and tracemalloc.is_tracing():
+                frame['alloc_peak'] = max(frame['alloc_peak'], self._traced_memory()[1])
+                peak_alloc = frame['alloc_peak'] - frame['alloc_start']
+                if self._stack:
+                    self._stack[-1]['alloc_peak'] = max(self._stack[-1]['alloc_peak'], frame['alloc_peak'])
+                elif self._started_tracing:
+                    tracemalloc.stop()
+                    self._started_tracing = False
+
+            record.update(start=start_wall - self._origin, wall_time=wall_time, cpu_time=cpu_time,
+                          peak_alloc_bytes=peak_alloc, peak_rss_bytes=_peak_rss())
+            self.records.append(record)
+            for hook in self.hooks:
+                hook(record)
+
+    def select(self, name):
+        """
+        Records of the stages with the given name.
+
+        Parameters
+        ----------
+        name : str
+            Name of the stage
+
+        Returns
+        -------
+        list of dict
+            Matching records in completion order
+        """
+        return [record for record in self.records if record['name'] == name]
+
+    def summary(self):
+        """
+        Totals per stage name.
+
+        Returns
+        -------
+        dict
+            For every stage name, the number of calls, the summed wall and CPU times,
+            the largest peak allocation and the summed iterations (where recorded)
+        """
+        totals = {}
+        for record in self.records:
+            total = totals.setdefault(record['name'], {'calls': 0, 'wall_time': 0.0, 'cpu_time': 0.0,
+                                                       'peak_alloc_bytes': None})
+            total['calls'] += 1
+            total['wall_time'] += record['wall_time']
+            total['cpu_time'] += record['cpu_time']
+            if record['peak_alloc_bytes'] is not None:
+                total['peak_alloc_bytes'] = max(total['peak_alloc_bytes'] or 0, record['peak_alloc_bytes'])
+            if 'iterations' in record:
+                total['iterations'] = total.get('iterations', 0) + record['iterations']
+        return totals
+
+    def to_dict(self):
+        """
+        Records as a column dictionary, e.g. for ``pandas.DataFrame``.
+
+        Returns
+        -------
+        dict
+            One list per field; fields missing from a record are None
+        """
+        fields = list(RECORD_FIELDS)
+        for record in self.records:
+            fields.extend(key for key in record if key not in fields)
+        return {field: [record.get(field) for record in self.records] for field in fields}
+
+    def to_json(self, file_path=None):
+        """
+        Export the records as JSON.
+
+        Parameters
+        ----------
+        file_path : str, optional
+            File to write the JSON to. Default = None (only return it)
+
+        Returns
+        -------
+        str
+            JSON list of the records
+        """
+        text = json.dumps(self.records, indent=2, default=_encode)
+        if file_path is not None:
+            with open(file_path, 'w') as f:
+                f.write(text)
+        return text
+
+    def reset(self):
+        """
+        Discard all records.
+
+        Returns
+        -------
+        None
+        """
+        self.records = []
+        self._origin = time.perf_counter()
+
+
+def stage(profiler, name, **metadata):
+    """
+    Profile a stage on ``profiler``, or do nothing when it is None.
+
+    Parameters
+    ----------
+    profiler : Profiler or None
+        The profiler
+    name : str
+        Name of the stage
+    **metadata : dict
+        Values stored with the record
+
+    Returns
+    -------
+    context manager
+        Yields the stage record (a scratch dictionary without a profiler)
+    """
+    if profiler is None:
+        return nullcontext({})
+    return profiler.stage(name, **metadata)
+
+
+def _encode(value):
+    """JSON encoding of NumPy scalars in stage metadata."""
+    return value.item() if hasattr(value, 'item') else repr(value)
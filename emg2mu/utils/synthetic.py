@@ -0,0 +1,208 @@
+"""
+This module provides a synthetic hdEMG generator with known ground truth.
+
+Every motor unit has a spatially localised action potential (MUAP) template on an
+electrode grid and fires as a gamma renewal process. The recording is the sum of the
+MUAP templates convolved with the spike trains, with white noise added by ``awgn``.
+The ground-truth spike trains allow decompositions to be scored by their rate of
+agreement with the true units.
+
+Functions:
+    - muap_templates: Spatio-temporal MUAP templates on an electrode grid
+    - gamma_spike_trains: Gamma renewal spike trains with given firing rates
+    - generate_hdemg: Synthetic hdEMG recording with ground-truth spike trains
+    - match_units: Rate of agreement of decomposed units with ground-truth units
+"""
+
+import numpy as np
+from scipy.signal import fftconvolve
+from ..core.preprocessing import awgn
+from ..core.spike_train import SpikeTrain, as_spike_train
+from ..detection.duplicate_detection import rate_of_agreement
+
+
+def muap_templates(n_units, grid_shape=(8, 8), sampling_frequency=2048, duration=0.015, rng=None):
+    """
+    Spatio-temporal MUAP templates on an electrode grid.
+
+    Each unit has a territory centre on the grid. Its waveform on an electrode is a
+    biphasic (first Hermite-Rodriguez) pulse whose amplitude decays with the distance
+    from the centre, and that is delayed and widened with distance to mimic the
+    propagation along the muscle fibres.
+
+    Parameters
+    ----------
+    n_units : int
+        Number of motor units
+    grid_shape : tuple, optional
+        Electrode grid as (rows, cols). Default = (8, 8)
+    sampling_frequency : float, optional
+        Sampling frequency in Hz. Default = 2048
+    duration : float, optional
+        Template duration in seconds. Default = 0.015
+    rng : numpy.random.Generator, optional
+        Random generator. Default = None (a fresh generator)
+
+    Returns
+    -------
+    numpy.ndarray
+        Templates of shape (n_units, samples, channels), channels in row-major grid order
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    rows, cols = np.meshgrid(np.arange(grid_shape[0]), np.arange(grid_shape[1]), indexing='ij')
+    length = max(int(round(duration * sampling_frequency)) | 1, 3)
+    t = (np.arange(length) - length // 2) / sampling_frequency
+
+    templates = np.empty((n_units, length, grid_shape[0] * grid_shape[1]))
+    for unit in range(n_units):
+        centre = rng.uniform([0, 0], [grid_shape[0] - 1, grid_shape[1] - 1])
+        spread = rng.uniform(1.0, 2.5)
+        amplitude = rng.uniform(0.5, 2.0)
+        width = rng.uniform(0.6e-3, 1.5e-3)
+        distance = np.hypot(rows - centre[0], cols - centre[1]).ravel()
+
+        delay = distance * 0.25e-3
+        scale = width * (1 + 0.1 * distance)
+        x = (t[:, np.newaxis] - delay) / scale
+        gain = amplitude * np.exp(-distance ** 2 / (2 * spread ** 2))
+        templates[unit] = gain * -x * np.exp(-x ** 2 / 2)
+    return templates
+
+
+def gamma_spike_trains(firing_rates, frames, sampling_frequency=2048, isi_cv=0.15, rng=None):
+    """
+    Gamma renewal spike trains with given mean firing rates.
+
+    Parameters
+    ----------
+    firing_rates : array-like
+        Mean firing rate of every unit in Hz
+    frames : int
+        Number of samples
+    sampling_frequency : float, optional
+        Sampling frequency in Hz. Default = 2048
+    isi_cv : float, optional
+        Coefficient of variation of the inter-spike intervals; 1 gives a Poisson
+        process. Default = 0.15
+    rng : numpy.random.Generator, optional
+        Random generator. Default = None (a fresh generator)
+
+    Returns
+    -------
+    SpikeTrain
+        The spike trains of shape (frames, units)
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    shape = 1.0 / isi_cv ** 2
+    duration = frames / sampling_frequency
+
+    units = []
+    for rate in np.asarray(firing_rates, dtype=np.float64):
+        n_spikes = int(duration * rate * 1.5) + 10
+        intervals = rng.gamma(shape, 1.0 / (rate * shape), n_spikes)
+        # Start at a random phase of the first interval
+        times = np.cumsum(intervals) - rng.uniform(0, intervals[0])
+        times = times[(times >= 0) & (times < duration)]
+        units.append(np.unique((times * sampling_frequency).astype(np.int64)))
+    return SpikeTrain.from_units(units, frames)
+
+
+def generate_hdemg(n_units=10, grid_shape=(8, 8), duration=10.0, sampling_frequency=2048,
+                   firing_rate=(8, 20), isi_cv=0.15, muap_duration=0.015, snr=20, seed=None):
+    """
+    Generate a synthetic hdEMG recording with ground-truth spike trains.
+
+    Parameters
+    ----------
+    n_units : int, optional
+        Number of motor units. Default = 10
+    grid_shape : tuple, optional
+        Electrode grid as (rows, cols). Default = (8, 8)
+    duration : float, optional
+        Recording duration in seconds. Default = 10.0
+    sampling_frequency : float, optional
+        Sampling frequency in Hz. Default = 2048
+    firing_rate : tuple, optional
+        Range (low, high) of the mean firing rates in Hz. Default = (8, 20)
+    isi_cv : float, optional
+        Coefficient of variation of the inter-spike intervals. Default = 0.15
+    muap_duration : float, optional
+        MUAP template duration in seconds. Default = 0.015
+    snr : float, optional
+        Signal-to-noise ratio of the added white noise in dB; np.inf for no noise.
+        Default = 20
+    seed : int, optional
+        Seed for a reproducible recording. Default = None
+
+    Returns
+    -------
+    dict
+        'emg_data' of shape (frames, channels), the ground-truth 'spike_train'
+        (SpikeTrain), the 'muaps' templates, the 'firing_rates', 'sampling_frequency'
+        and 'grid_shape'
+    """
+    rng = np.random.default_rng(seed)
+    frames = int(round(duration * sampling_frequency))
+    firing_rates = rng.uniform(firing_rate[0], firing_rate[1], n_units)
+    muaps = muap_templates(n_units, grid_shape, sampling_frequency, muap_duration, rng)
+    spike_train = gamma_spike_trains(firing_rates, frames, sampling_frequency, isi_cv, rng)
+
+    # Spikes mark the centre of the MUAPs
+    length = muaps.shape[1]
+    emg_data = np.zeros((frames, muaps.shape[2]))
+    for unit in range(n_units):
+        impulses = np.zeros(frames)
+        impulses[spike_train.unit(unit)] = 1.0
+        response = fftconvolve(impulses[:, np.newaxis], muaps[unit], axes=0)
+        emg_data += response[length // 2:length // 2 + frames]
+
+    if not np.isinf(snr):
+        emg_data = awgn(emg_data, snr, seed=int(rng.integers(2 ** 32)))
+
+    return {
+        'emg_data': emg_data,
+        'spike_train': spike_train,
+        'muaps': muaps,
+        'firing_rates': firing_rates,
+        'sampling_frequency': sampling_frequency,
+        'grid_shape': tuple(grid_shape)
+    }
+
+
+def match_units(spike_train, ground_truth, tolerance=1, max_lag=32):
+    """
+    Match decomposed units to ground-truth units by their rate of agreement.
+
+    Decomposed spike times are offset from the true ones by a constant lag (the
+    extension delay and MUAP alignment), which ``rate_of_agreement`` estimates for
+    every pair of units before counting the matching spikes.
+
+    Parameters
+    ----------
+    spike_train : SpikeTrain or numpy.ndarray
+        The decomposed spike trains
+    ground_truth : SpikeTrain or numpy.ndarray
+        The ground-truth spike trains
+    tolerance : int, optional
+        Largest spike time difference in samples counted as a match. Default = 1
+    max_lag : int, optional
+        Largest lag in samples between a decomposed and a true unit. Default = 32
+
+    Returns
+    -------
+    dict
+        'roa': best rate of agreement of every true unit, 'match': index of the
+        matching decomposed unit (-1 without any match) and 'lag': its lag in samples
+    """
+    spike_train = as_spike_train(spike_train)
+    ground_truth = as_spike_train(ground_truth)
+    roa = np.zeros(ground_truth.n_units)
+    match = np.full(ground_truth.n_units, -1, dtype=np.int64)
+    lags = np.zeros(ground_truth.n_units, dtype=np.int64)
+
+    for i, true_spikes in enumerate(ground_truth):
+        for j, spikes in enumerate(spike_train):
+            agreement, lag = rate_of_agreement(spikes, true_spikes, tolerance, max_lag)
+            if agreement > roa[i]:
+                roa[i], match[i], lags[i] = agreement, j, lag
+    return {'roa': roa, 'match': match, 'lag': lags}
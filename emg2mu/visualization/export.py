@@ -0,0 +1,166 @@
+"""
+This module provides the headless export of decomposition figures.
+
+The spike-train raster and the MUAP waveforms of many saved decompositions are
+rendered to image or HTML files without a display. Static formats are drawn with
+the matplotlib backend of the plot functions on the non-interactive Agg canvas, and
+HTML files are written from the plotly figures. Recordings are rendered in a pool of
+worker processes, which import the plotting libraries only once each.
+
+Functions:
+    - export_recording: Render the figures of one saved decomposition
+    - export_figures: Render the figures of many saved decompositions
+"""
+
+import glob
+import multiprocessing
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+PLOT_TYPES = ['spike_train', 'waveforms']
+FIGURE_FORMATS = ['png', 'svg', 'pdf', 'html']
+
+
+def _init_worker():
+    """Select the non-interactive canvas in a worker before pyplot is imported."""
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+def export_recording(results_file, output_dir, plot_types=('spike_train', 'waveforms'), formats=('png',),
+                     sampling_frequency=2048, min_score=0.93, name=None, **plot_kwargs):
+    """
+    Render the figures of one saved decomposition to files.
+
+    The files are named ``{name}_{plot_type}.{format}``.
+
+    Parameters
+    ----------
+    results_file : str
+        Results NPZ file written by ``EMG.save`` or ``save_results``
+    output_dir : str
+        Directory of the figure files
+    plot_types : sequence of str, optional
+        Figures to render, from 'spike_train' and 'waveforms'.
+        Default = ('spike_train', 'waveforms')
+    formats : sequence of str, optional
+        File formats, from 'png', 'svg', 'pdf' and 'html'. Default = ('png',)
+    sampling_frequency : float, optional
+        Sampling frequency of the recording in Hz. Default = 2048
+    min_score : float, optional
+        Minimum silhouette score of the plotted units, when the results have scores.
+        Default = 0.93
+    name : str, optional
+        Prefix of the figure files. Default = None (the results file name without
+        its extension and ``_decomposed`` suffix)
+    **plot_kwargs
+        Further arguments of ``plot_spike_train`` and ``plot_waveforms``
+
+    Returns
+    -------
+    dict
+        'name', the written 'files', the rendering 'time' in seconds and the 'error'
+        (None on success)
+    """
+    import matplotlib.pyplot as plt
+    from ..utils.io import load_results
+    from .plots import plot_spike_train, plot_waveforms
+
+    if name is None:
+        name = os.path.splitext(os.path.basename(results_file))[0]
+        name = name[:-len('_decomposed')] if name.endswith('_decomposed') else name
+    row = {'name': name, 'files': [], 'time': 0.0, 'error': None}
+    start = time.perf_counter()
+    try:
+        results = load_results(results_file)
+        plot_functions = {'spike_train': lambda **kwargs: plot_spike_train(
+                              results['spike_train'], sampling_frequency, **kwargs),
+                          'waveforms': lambda **kwargs: plot_waveforms(
+                              results['source'], results['spike_train'], sampling_frequency, **kwargs)}
+        scores = {'silhouette_scores': results.get('silhouette_score'), 'min_score': min_score}
+
+        for plot_type in plot_types:
+            static = [fmt for fmt in formats if fmt != 'html']
+            if static:
+                fig = plot_functions[plot_type](backend='matplotlib', show=False, **scores, **plot_kwargs)
+                for fmt in static:
+                    file_path = os.path.join(output_dir, f'{name}_{plot_type}.{fmt}')
+                    fig.savefig(file_path, format=fmt)
+                    row['files'].append(file_path)
+                plt.close(fig)
+            if 'html' in formats:
+                fig = plot_functions[plot_type](backend='plotly', show=False, **scores, **plot_kwargs)
+                file_path = os.path.join(output_dir, f'{name}_{plot_type}.html')
+                fig.write_html(file_path, include_plotlyjs='cdn')
+                row['files'].append(file_path)
+    except Exception as e:
+        row['error'] = f"{type(e).__name__}: {e}"
+        traceback.print_exc()
+    row['time'] = time.perf_counter() - start
+    return row
+
+
+def export_figures(results, output_dir, plot_types=('spike_train', 'waveforms'), formats=('png',),
+                   sampling_frequency=2048, min_score=0.93, n_jobs=1, **plot_kwargs):
+    """
+    Render the figures of many saved decompositions to files, in parallel.
+
+    Parameters
+    ----------
+    results : str or list of str
+        Results NPZ files, or a directory whose ``*_decomposed.npz`` files (as written
+        by ``run_batch``) are exported
+    output_dir : str
+        Directory of the figure files
+    plot_types : sequence of str, optional
+        Figures to render, from 'spike_train' and 'waveforms'.
+        Default = ('spike_train', 'waveforms')
+    formats : sequence of str, optional
+        File formats, from 'png', 'svg', 'pdf' and 'html'. Default = ('png',)
+    sampling_frequency : float, optional
+        Sampling frequency of the recordings in Hz. Default = 2048
+    min_score : float, optional
+        Minimum silhouette score of the plotted units. Default = 0.93
+    n_jobs : int, optional
+        Number of recordings rendered concurrently in worker processes; -1 uses all
+        cores. Workers are spawned, so a script using n_jobs > 1 must call it under
+        ``if __name__ == '__main__':``. Default = 1 (in the calling process)
+    **plot_kwargs
+        Further arguments of ``plot_spike_train`` and ``plot_waveforms``
+
+    Returns
+    -------
+    list of dict
+        The ``export_recording`` row of every recording, in input order
+
+    Raises
+    ------
+    ValueError
+        If a plot type or format is unknown
+    """
+    for plot_type in plot_types:
+        if plot_type not in PLOT_TYPES:
+            raise ValueError(f"plot_type must be one of {PLOT_TYPES}, got '{plot_type}'")
+    for fmt in formats:
+        if fmt not in FIGURE_FORMATS:
+            raise ValueError(f"format must be one of {FIGURE_FORMATS}, got '{fmt}'")
+
+    if isinstance(results, (str, os.PathLike)):
+        results = os.fspath(results)
+        results = sorted(glob.glob(os.path.join(results, '*_decomposed.npz'))) if os.path.isdir(results) \
+            else [results]
+    results = [os.fspath(file_path) for file_path in results]
+    os.makedirs(output_dir, exist_ok=True)
+
+    n_jobs = os.cpu_count() if n_jobs == -1 else n_jobs
+    n_jobs = max(1, min(n_jobs, len(results)))
+    args = (output_dir, tuple(plot_types), tuple(formats), sampling_frequency, min_score)
+    if n_jobs == 1:
+        return [export_recording(file_path, *args, **plot_kwargs) for file_path in results]
+    # Spawned workers start without the parent's plotting and torch state
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(n_jobs, mp_context=context, initializer=_init_worker) as pool:
+        futures = [pool.submit(export_recording, file_path, *args, **plot_kwargs) for file_path in results]
+        return [future.result() for future in futures]
@@ -1,11 +1,19 @@
 """
 This module provides visualization functions for EMG signal analysis results.
+
+Functions:
+    - create_spike_colors: Colors of the units from a matplotlib colormap
+    - plot_waveforms: Average waveforms of the motor units
+    - raster_coordinates: NaN-separated line coordinates of a spike raster
+    - plot_spike_train: Raster plot of the spike trains (plotly or matplotlib)
 """
 
 import plotly.graph_objects as go
 import matplotlib.pyplot as plt
 import numpy as np
 from plotly.subplots import make_subplots
+from ..analysis.waveforms import extract_waveforms, waveform_statistics
+from ..core.spike_train import as_spike_train
 
 
 def create_spike_colors(colormap, n_units):
@@ -48,8 +56,8 @@ def plot_waveforms(source, spike_train, sampling_frequency, silhouette_scores=No
     ----------
     source : numpy.ndarray
         The ICA source signals matrix
-    spike_train : numpy.ndarray
-        The spike train data matrix
+    spike_train : SpikeTrain or numpy.ndarray
+        The spike train data
     sampling_frequency : int
         Sampling frequency of the data in Hz
     window_size : float, optional
@@ -66,20 +74,27 @@ def plot_waveforms(source, spike_train, sampling_frequency, silhouette_scores=No
         Silhouette scores for each motor unit
     min_score : float, optional
         Minimum silhouette score for units to include (default = 0.93)
+    backend : str, optional
+        'plotly' or 'matplotlib' (default = 'plotly')
+    show : bool, optional
+        Whether to show the figure (default = True)
 
     Returns
     -------
-    None
+    plotly.graph_objects.Figure or matplotlib.figure.Figure or None
+        The figure with ``show=False``; None once it is shown, so that a notebook cell
+        ending in the call does not render it twice
     """
     # Filter motor units based on silhouette scores if provided
+    spike_train = as_spike_train(spike_train)
     if silhouette_scores is not None:
-        selected_spike_train = spike_train[:, silhouette_scores > min_score]
+        selected_spike_train = spike_train.select(silhouette_scores > min_score)
         selected_source = source[:, silhouette_scores > min_score]
     else:
         selected_spike_train = spike_train
         selected_source = source
 
-    n_units = selected_spike_train.shape[1]
+    n_units = selected_spike_train.n_units
     if n_units == 0:
         raise ValueError("No motor units meet the silhouette score threshold")
 
@@ -92,6 +107,10 @@ def plot_waveforms(source, spike_train, sampling_frequency, silhouette_scores=No
     n_cols = kwargs.get('n_cols', 5)
     subplot_height = kwargs.get('subplot_height', 200)
     subplot_width = kwargs.get('subplot_width', 300)
+    backend = kwargs.get('backend', 'plotly')
+    show = kwargs.get('show', True)
+    if backend not in ['plotly', 'matplotlib']:
+        raise ValueError("backend must be either 'plotly' or 'matplotlib'")
 
     # Calculate window size in samples
     window_samples = int(window_size * sampling_frequency)
@@ -110,6 +129,12 @@ def plot_waveforms(source, spike_train, sampling_frequency, silhouette_scores=No
         score_text = f" (score: {silhouette_scores[i]:.2f})" if silhouette_scores is not None else ""
         subplot_titles.append(f'Motor Unit {i+1}<span style="font-size:10px">{score_text}</span>')
 
+    if backend == 'matplotlib':
+        return _plot_waveforms_matplotlib(selected_source, selected_spike_train, window_samples,
+                                          time_vector, colors, silhouette_scores, n_rows, n_cols,
+                                          plot_individual, confidence_interval, alpha,
+                                          subplot_height, subplot_width, show)
+
     # Create subplot grid
     fig = make_subplots(
         rows=n_rows,
@@ -124,42 +149,34 @@ def plot_waveforms(source, spike_train, sampling_frequency, silhouette_scores=No
     # Process each motor unit
     for i in range(n_units):
         # Find spike timestamps
-        spike_indices = np.where(selected_spike_train[:, i])[0]
+        spike_indices = selected_spike_train.unit(i)
 
         if len(spike_indices) == 0:
             continue
 
-        # Extract waveform segments
-        waveforms = []
-        for idx in spike_indices:
-            if idx - window_samples >= 0 and idx + window_samples + 1 <= len(selected_source):
-                segment = selected_source[idx - window_samples:idx + window_samples + 1, i]
-                waveforms.append(segment)
-
-        if not waveforms:
+        # Segment statistics, and the segments themselves for the overlay
+        stats = waveform_statistics(selected_source[:, i], spike_indices, window_samples)
+        if stats['n'] == 0:
             continue
-
-        waveforms = np.array(waveforms)
-
-        # Calculate mean waveform and confidence intervals
-        mean_waveform = np.mean(waveforms, axis=0)
+        mean_waveform = stats['mean']
         if confidence_interval:
-            ci = 1.96 * np.std(waveforms, axis=0) / np.sqrt(len(waveforms))
-            upper_ci = mean_waveform + ci
-            lower_ci = mean_waveform - ci
+            upper_ci = mean_waveform + stats['ci']
+            lower_ci = mean_waveform - stats['ci']
 
-        # Plot individual spikes if requested
+        # Plot individual spikes if requested, as one NaN-separated trace
         if plot_individual:
-            for waveform in waveforms:
-                fig.add_trace(
-                    go.Scatter(x=time_vector, y=waveform,
+            waveforms = extract_waveforms(selected_source[:, i], spike_indices, window_samples)
+            fig.add_trace(
+                go.Scattergl(x=np.tile(np.append(time_vector, np.nan), len(waveforms)),
+                             y=np.column_stack([waveforms, np.full(len(waveforms), np.nan)]).ravel(),
                              mode='lines',
                              line=dict(color=colors[i], width=1),
                              opacity=alpha,
+                             hoverinfo='skip',
                              showlegend=False),
-                    row=(i // n_cols) + 1,
-                    col=(i % n_cols) + 1
-                )
+                row=(i // n_cols) + 1,
+                col=(i % n_cols) + 1
+            )
 
         # Plot confidence intervals if requested
         if confidence_interval:
@@ -187,7 +204,7 @@ def plot_waveforms(source, spike_train, sampling_frequency, silhouette_scores=No
             go.Scatter(x=time_vector, y=mean_waveform,
                       mode='lines',
                       line=dict(color=colors[i], width=2),
-                      name=f'MU {i+1} (n={len(waveforms)})',
+                      name=f'MU {i+1} (n={stats["n"]})',
                       hovertemplate='Time: %{x:.1f} ms<br>Amplitude: %{y:.3f}<br>%{name}<extra></extra>'),
             row=(i // n_cols) + 1,
             col=(i % n_cols) + 1
@@ -222,17 +239,90 @@ def plot_waveforms(source, spike_train, sampling_frequency, silhouette_scores=No
         zerolinecolor='lightgray'
     )
 
-    fig.show()
+    if show:
+        fig.show()
+        return None
+    return fig
+
+
+def raster_coordinates(spike_train, order=None, spike_height=0.4, sampling_frequency=1.0, x_range=None,
+                       resolution=None):
+    """
+    Line coordinates of a spike raster for all units at once.
+
+    Every spike becomes a vertical segment at its time, centred on the row of its unit,
+    followed by a NaN separator, so that a single line trace draws the whole raster.
+    With ``resolution``, the spikes of a unit that fall into the same of ``resolution``
+    time bins (e.g. the pixel columns of the plot at the current zoom) are drawn once.
+
+    Parameters
+    ----------
+    spike_train : SpikeTrain or numpy.ndarray
+        The spike train data
+    order : array-like, optional
+        Unit shown on every row, bottom to top; the spikes of units not in ``order``
+        are left out. Default = None (unit k on row k)
+    spike_height : float, optional
+        Height of the spikes relative to the row spacing. Default = 0.4
+    sampling_frequency : float, optional
+        Sampling frequency in Hz; the x coordinates are in seconds. Default = 1.0
+        (x coordinates in samples)
+    x_range : tuple, optional
+        Time range (start, end) of the spikes to include, in the units of x.
+        Default = None (all spikes)
+    resolution : int, optional
+        Number of time bins over ``x_range`` (or the recording) to decimate the spikes
+        to. Default = None (no decimation)
+
+    Returns
+    -------
+    x : numpy.ndarray
+        X coordinates, three per spike (bottom, top, NaN)
+    y : numpy.ndarray
+        Y coordinates, three per spike
+    row : numpy.ndarray
+        Row of every spike
+    """
+    spike_train = as_spike_train(spike_train)
+    order = np.arange(spike_train.n_units) if order is None else np.asarray(order)
+    row_of_unit = np.full(spike_train.n_units, -1, dtype=np.int64)
+    row_of_unit[order] = np.arange(len(order))
+
+    times = spike_train.indices / sampling_frequency
+    rows = row_of_unit[spike_train.units]
+    if len(order) < spike_train.n_units:
+        shown = rows >= 0
+        times, rows = times[shown], rows[shown]
+    start, stop = (0.0, spike_train.n_frames / sampling_frequency) if x_range is None else x_range
+    if x_range is not None:
+        inside = (times >= start) & (times <= stop)
+        times, rows = times[inside], rows[inside]
+    if resolution is not None and len(times) > 0:
+        bins = np.floor((times - start) / (stop - start) * resolution).astype(np.int64)
+        _, first = np.unique(rows * (resolution + 1) + bins, return_index=True)
+        times, rows = times[first], rows[first]
+
+    x = np.repeat(times, 3)
+    x[2::3] = np.nan
+    y = np.empty_like(x)
+    y[0::3] = rows - spike_height / 2
+    y[1::3] = rows + spike_height / 2
+    y[2::3] = np.nan
+    return x, y, rows
 
 
 def plot_spike_train(spike_train, sampling_frequency, silhouette_scores=None,
                     min_score=0.93, **kwargs):
     """
-    Plot the spike train of motor units.
+    Plot the spike train of motor units as a raster.
+
+    The raster coordinates of all units are built at once (see
+    ``raster_coordinates``) and drawn as one WebGL line trace per color, or as one
+    matplotlib line per color for headless export.
 
     Parameters
     ----------
-    spike_train : numpy.ndarray
+    spike_train : SpikeTrain or numpy.ndarray
         The spike train data to plot
     sampling_frequency : int
         Sampling frequency of the data in Hz
@@ -254,18 +344,28 @@ def plot_spike_train(spike_train, sampling_frequency, silhouette_scores=None,
         Target plot height in pixels
     units_per_height : int, optional
         Number of units per height unit
+    resolution : int, optional
+        Number of time bins over the x range to decimate the spikes to, e.g. the plot
+        width in pixels (default = None, no decimation)
+    backend : str, optional
+        'plotly' or 'matplotlib' (default = 'plotly')
+    show : bool, optional
+        Whether to show the figure (default = True)
 
     Returns
     -------
-    None
+    plotly.graph_objects.Figure or matplotlib.figure.Figure or None
+        The figure with ``show=False``; None once it is shown, so that a notebook cell
+        ending in the call does not render it twice
     """
+    spike_train = as_spike_train(spike_train)
     if silhouette_scores is not None:
-        selected_spikeTrain = spike_train[:, silhouette_scores > min_score]
+        selected_spikeTrain = spike_train.select(silhouette_scores > min_score)
     else:
         selected_spikeTrain = spike_train
 
-    order = np.argsort(np.sum(selected_spikeTrain, axis=0))[::-1]
-    n_units = selected_spikeTrain.shape[1]
+    order = np.argsort(selected_spikeTrain.counts)[::-1]
+    n_units = selected_spikeTrain.n_units
 
     # Set default parameters
     spike_height = kwargs.get('spike_height', 0.4)
@@ -275,6 +375,11 @@ def plot_spike_train(spike_train, sampling_frequency, silhouette_scores=None,
     x_range = kwargs.get('x_range', None)
     target_height = kwargs.get('target_height', 800)
     units_per_height = kwargs.get('units_per_height', 40)
+    resolution = kwargs.get('resolution', None)
+    backend = kwargs.get('backend', 'plotly')
+    show = kwargs.get('show', True)
+    if backend not in ['plotly', 'matplotlib']:
+        raise ValueError("backend must be either 'plotly' or 'matplotlib'")
 
     # Calculate fixed spacing based on number of MUs
     fixed_spacing = target_height / units_per_height
@@ -292,50 +397,38 @@ def plot_spike_train(spike_train, sampling_frequency, silhouette_scores=None,
     else:
         colors = ["black"] * n_units
 
-    fig = go.Figure()
-
-    # Fixed unit spacing
-    unit_spacing = 1.0
-
-    # Plot each motor unit's spikes
-    for r in range(n_units):
-        spike_indices = np.where(selected_spikeTrain[:, order[r]] == 1)[0]
-        base_y = unit_spacing * r
-
-        # Create vertical lines for each spike
-        if len(spike_indices) > 0:
-            # Create y coordinates for vertical lines
-            y_coords = []
-            x_coords = []
-            for idx in spike_indices:
-                # Add coordinates for vertical line (bottom to top)
-                x_coords.extend([idx, idx, None])
-                y_coords.extend([base_y - spike_height / 2, base_y + spike_height / 2, None])
-
-            fig.add_trace(go.Scatter(
-                x=x_coords,
-                y=y_coords,
-                mode='lines',
-                line=dict(
-                    color=colors[r],
-                    width=spike_width * 100  # Increased width for better visibility
-                ),
-                showlegend=False
-            ))
+    x, y, rows = raster_coordinates(selected_spikeTrain, order, spike_height, sampling_frequency,
+                                    x_range, resolution)
+    duration = selected_spikeTrain.n_frames / sampling_frequency
+    x_limits = [0, duration] if x_range is None else list(x_range)
 
     # Calculate y-axis tick positions for 10% increments
     tick_increment = max(1, n_units // 10)  # At least 1 MU between ticks
     tick_positions = np.arange(0, n_units, tick_increment)
     tick_labels = [str(i) for i in tick_positions]
 
+    if backend == 'matplotlib':
+        return _plot_raster_matplotlib(x, y, rows, colors, spike_width, x_limits, n_units,
+                                       tick_positions, tick_labels, plot_height, show)
+
+    fig = go.Figure()
+    for color, x_color, y_color in _color_groups(x, y, rows, colors):
+        fig.add_trace(go.Scattergl(
+            x=x_color,
+            y=y_color,
+            mode='lines',
+            line=dict(
+                color=color,
+                width=spike_width * 100  # Increased width for better visibility
+            ),
+            hoverinfo='skip',
+            showlegend=False
+        ))
+
     fig.update_layout(
         xaxis=dict(
             title="time (sec)",
-            range=[0, selected_spikeTrain.shape[0]] if x_range is None else
-                  [int(x_range[0] * sampling_frequency), int(x_range[1] * sampling_frequency)],
-            tickvals=np.arange(0, selected_spikeTrain.shape[0] + 1, selected_spikeTrain.shape[0] // 10),
-            ticktext=np.arange(0, int(selected_spikeTrain.shape[0] / sampling_frequency) + 1,
-                               (selected_spikeTrain.shape[0] / sampling_frequency / 10))
+            range=x_limits
         ),
         yaxis=dict(
             title="Motor Unit",
@@ -348,4 +441,100 @@ def plot_spike_train(spike_train, sampling_frequency, silhouette_scores=None,
         plot_bgcolor='white'  # White background
     )
 
-    fig.show()
+    if show:
+        fig.show()
+        return None
+    return fig
+
+
+def _color_groups(x, y, rows, colors):
+    """
+    Split raster coordinates into one NaN-separated line per color.
+
+    Yields
+    ------
+    tuple
+        (color, x, y) of every color with spikes
+    """
+    palette, color_of_row = np.unique(colors, return_inverse=True)
+    spike_color = color_of_row.ravel()[rows]
+    grouped = np.argsort(spike_color, kind='stable')
+    bounds = np.searchsorted(spike_color[grouped], np.arange(len(palette) + 1))
+    x, y = x.reshape(-1, 3)[grouped].ravel(), y.reshape(-1, 3)[grouped].ravel()
+    for color, start, stop in zip(palette, bounds[:-1], bounds[1:]):
+        if start < stop:
+            yield color, x[3 * start:3 * stop], y[3 * start:3 * stop]
+
+
+def _plot_raster_matplotlib(x, y, rows, colors, spike_width, x_limits, n_units, tick_positions,
+                            tick_labels, plot_height, show):
+    """
+    Draw raster coordinates with matplotlib, as one NaN-separated line per color.
+
+    A single path per color renders much faster than a LineCollection of one segment
+    per spike.
+    """
+    fig, ax = plt.subplots(figsize=(10, plot_height / 100))
+    for color, x_color, y_color in _color_groups(x, y, rows, colors):
+        ax.plot(x_color, y_color, color=_matplotlib_color(color), linewidth=spike_width * 100)
+    ax.set_xlim(x_limits)
+    ax.set_ylim(-0.5, n_units + 0.5)
+    ax.set_yticks(tick_positions)
+    ax.set_yticklabels(tick_labels)
+    ax.set_xlabel("time (sec)")
+    ax.set_ylabel("Motor Unit")
+    if show:
+        plt.show()
+        return None
+    return fig
+
+
+def _plot_waveforms_matplotlib(source, spike_train, window_samples, time_vector, colors,
+                               silhouette_scores, n_rows, n_cols, plot_individual,
+                               confidence_interval, alpha, subplot_height, subplot_width, show):
+    """
+    Draw the waveforms of ``plot_waveforms`` with matplotlib, e.g. for headless export.
+
+    The individual spikes of a unit are drawn as one NaN-separated line.
+    """
+    fig, axes = plt.subplots(n_rows, n_cols, sharex=True, sharey=True, squeeze=False,
+                             figsize=(subplot_width * n_cols / 100, subplot_height * n_rows / 100))
+    for i, ax in enumerate(axes.ravel()):
+        if i >= spike_train.n_units:
+            ax.set_axis_off()
+            continue
+        score_text = f" (score: {silhouette_scores[i]:.2f})" if silhouette_scores is not None else ""
+        ax.set_title(f'Motor Unit {i+1}{score_text}', fontsize=8)
+        ax.grid(True, color='lightgray', linewidth=0.5)
+
+        stats = waveform_statistics(source[:, i], spike_train.unit(i), window_samples)
+        if stats['n'] == 0:
+            continue
+        color = _matplotlib_color(colors[i])
+        if plot_individual:
+            waveforms = extract_waveforms(source[:, i], spike_train.unit(i), window_samples)
+            ax.plot(np.tile(np.append(time_vector, np.nan), len(waveforms)),
+                    np.column_stack([waveforms, np.full(len(waveforms), np.nan)]).ravel(),
+                    color=color, linewidth=0.5, alpha=alpha)
+        if confidence_interval:
+            ax.fill_between(time_vector, stats['mean'] - stats['ci'], stats['mean'] + stats['ci'],
+                            color=color, alpha=0.2, linewidth=0)
+        ax.plot(time_vector, stats['mean'], color=color, linewidth=1.5)
+
+    for ax in axes[-1]:
+        ax.set_xlabel('Time (ms)')
+    for ax in axes[:, 0]:
+        ax.set_ylabel('Amplitude')
+    fig.suptitle('Motor Unit Action Potential Waveforms')
+    fig.tight_layout()
+    if show:
+        plt.show()
+        return None
+    return fig
+
+
+def _matplotlib_color(color):
+    """Convert a 'rgb(r,g,b)' color string of ``create_spike_colors`` for matplotlib."""
+    if color.startswith('rgb('):
+        return tuple(int(c) / 255 for c in color[4:-1].split(','))
+    return color